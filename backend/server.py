@@ -1,27 +1,112 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Response, Request
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Response, Request, Query, BackgroundTasks
+from fastapi.responses import FileResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union, get_args, get_origin
 from datetime import datetime, timedelta
 from pathlib import Path
+from PIL import Image, ImageOps, UnidentifiedImageError
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 import aiosqlite
+import asyncio
+import base64
 import bcrypt
+import bisect
+import codecs
+import csv
+import io
+import json
 import os
+import hashlib
+import re
 import secrets
 import shutil
+import tempfile
+import threading
+import time
 import logging
+import mimetypes
+import operator
+import zlib
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # list responses fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # responses are only offered gzip-compressed
+    brotli = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Database setup
-DB_PATH = ROOT_DIR / "clinic.db"
-UPLOADS_DIR = ROOT_DIR / "uploads"
+DB_PATH = Path(os.environ.get('DB_PATH', ROOT_DIR / "clinic.db"))
+UPLOADS_DIR = Path(os.environ.get('UPLOADS_DIR', ROOT_DIR / "uploads"))
 UPLOADS_DIR.mkdir(exist_ok=True)
 
+# Upload limits
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Image derivatives (thumbnails and previews)
+DERIVATIVES_DIR = Path(os.environ.get('DERIVATIVES_DIR', UPLOADS_DIR.parent / "derivatives"))
+DERIVATIVES_MAX_BYTES = int(os.environ.get('DERIVATIVES_MAX_BYTES', 512 * 1024 * 1024))
+DERIVATIVE_SIZES = {"thumb": 256, "medium": 1024}
+
+# Bulk patient import
+MAX_IMPORT_BYTES = int(os.environ.get('MAX_IMPORT_BYTES', 200 * 1024 * 1024))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+
+# Orphaned upload cleanup; an interval of 0 disables the periodic sweep
+ORPHAN_SWEEP_INTERVAL_SECONDS = float(os.environ.get('ORPHAN_SWEEP_INTERVAL_SECONDS', 6 * 3600))
+ORPHAN_GRACE_SECONDS = float(os.environ.get('ORPHAN_GRACE_SECONDS', 3600))
+
+# Browser caching of image downloads
+IMAGE_CACHE_MAX_AGE = int(os.environ.get('IMAGE_CACHE_MAX_AGE', 86400))
+
+# Connection pool tuning
+DB_POOL_READERS = int(os.environ.get('DB_POOL_READERS', 4))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 128 * 1024 * 1024))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 32))
+
+# Clinic working hours for the availability search: comma-separated
+# HH:MM-HH:MM spans (e.g. "09:00-13:00,14:00-18:00") on the listed weekdays
+CLINIC_HOURS = os.environ.get('CLINIC_HOURS', '09:00-17:00')
+CLINIC_WORKING_DAYS = os.environ.get('CLINIC_WORKING_DAYS', 'sat,sun,mon,tue,wed,thu')
+
+# Prometheus scrapers authenticate with "Authorization: Bearer <token>" when
+# this is set; otherwise /api/metrics needs an admin session
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# SQL profiler: set SQL_PROFILER=1 to time every statement and log the ones
+# slower than SLOW_QUERY_MS with their query plan
+SQL_PROFILER = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+SQL_PROFILER_CAPACITY = int(os.environ.get('SQL_PROFILER_CAPACITY', 500))
+
+# Response compression: JSON, CSV and other text bodies of at least
+# COMPRESSION_MIN_BYTES are sent brotli- or gzip-compressed when the client
+# accepts it. Brotli needs the optional Brotli package.
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 4))
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -88,6 +173,27 @@ class PatientResponse(BaseModel):
     balance_jod: float
     created_at: str
 
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportJobResponse(BaseModel):
+    id: str
+    status: str
+    format: str
+    rows_processed: int
+    rows_imported: int
+    rows_failed: int
+    progress: float
+    errors: List[ImportRowError]
+    created_at: str
+    finished_at: Optional[str]
+
+class PatientSuggestion(BaseModel):
+    id: int
+    name: str
+    phone: str
+
 class ProcedureCreate(BaseModel):
     name: str
     price_jod: float
@@ -174,6 +280,32 @@ class PaymentResponse(BaseModel):
     notes: Optional[str]
     created_at: str
 
+class AvailabilitySlot(BaseModel):
+    start: str
+    end: str
+
+class DoctorAvailability(BaseModel):
+    doctor_id: int
+    doctor_name: str
+    date: str
+    slots: List[AvailabilitySlot]
+
+class DashboardStatsResponse(BaseModel):
+    date: str
+    patients: int
+    appointments: int
+    today_appointment_count: int
+    procedures: int
+    users: int
+    today_appointments: List[AppointmentResponse]
+    recent_appointments: List[AppointmentResponse]
+    billed_jod: float
+    paid_jod: float
+    outstanding_jod: float
+    billed_today_jod: float
+    paid_today_jod: float
+    generated_at: str
+
 class ImageResponse(BaseModel):
     id: int
     patient_id: int
@@ -185,9 +317,458 @@ class ImageResponse(BaseModel):
     description: Optional[str]
     upload_date: str
 
+# Request instrumentation
+# MetricsMiddleware gives each HTTP request a RequestStats in a context
+# variable. The connections db_pool hands out add every statement and the
+# time spent executing and fetching it, so per-route query counts expose
+# N+1 patterns. Statements run outside a request (startup, sweeps, import
+# jobs) are not attributed.
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+def record_db_time(started: float, statements: int = 0) -> float:
+    elapsed = time.perf_counter() - started
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += statements
+        stats.db_seconds += elapsed
+    return elapsed
+
+# Slow-query profiler (opt-in via SQL_PROFILER). Statements are grouped by a
+# normalized form with literals and IN lists collapsed; bound values are only
+# ever reported by type.
+SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+SQL_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    sql = SQL_STRING_LITERAL.sub("?", sql)
+    sql = SQL_NUMBER_LITERAL.sub("?", sql)
+    sql = SQL_PLACEHOLDER_LIST.sub("(...)", sql)
+    return " ".join(sql.split())
+
+def redact_parameters(parameters) -> str:
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+
+class StatementProfile:
+    __slots__ = ("statement", "calls", "total", "max", "slow")
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "slow_calls": self.slow,
+        }
+
+class SQLProfiler:
+    """Per-statement timings plus a slow-query log with query plans.
+
+    A statement's time is its execute plus every fetch from its cursor, so
+    lazily stepped SELECTs are charged in full. Once that passes the
+    threshold the statement is logged once with its EXPLAIN QUERY PLAN.
+    The table keeps at most `capacity` statements, dropping the one with the
+    least total time to make room.
+    """
+
+    def __init__(self, enabled: bool = SQL_PROFILER, slow_ms: float = SLOW_QUERY_MS,
+                 capacity: int = SQL_PROFILER_CAPACITY):
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000
+        self.capacity = max(1, capacity)
+        self.reset()
+
+    def reset(self):
+        self.statements = {}
+        self.since = datetime.now().isoformat()
+
+    def record(self, sql: str, elapsed: float, calls: int) -> StatementProfile:
+        statement = normalize_sql(sql)
+        profile = self.statements.get(statement)
+        if profile is None:
+            if len(self.statements) >= self.capacity:
+                coldest = min(self.statements.values(), key=lambda entry: entry.total)
+                del self.statements[coldest.statement]
+            profile = self.statements[statement] = StatementProfile(statement)
+        profile.calls += calls
+        profile.total += elapsed
+        return profile
+
+    async def log_slow(self, conn: aiosqlite.Connection, sql: str, parameters, elapsed: float):
+        try:
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            depth = {0: -1}
+            plan = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, -1) + 1
+                plan.append("  " * depth[node_id] + detail)
+        except (aiosqlite.Error, ValueError) as exc:
+            plan = [f"unavailable: {exc}"]
+        logger.warning(
+            "Slow query (%.1f ms): %s params=%s\n%s",
+            elapsed * 1000, normalize_sql(sql), redact_parameters(parameters), "\n".join(plan)
+        )
+
+    def top(self, limit: int) -> List[dict]:
+        ranked = sorted(self.statements.values(), key=lambda entry: entry.total, reverse=True)
+        return [entry.as_dict() for entry in ranked[:limit]]
+
+sql_profiler = SQLProfiler()
+
+class InstrumentedCursor:
+    def __init__(self, cursor: aiosqlite.Cursor, conn: aiosqlite.Connection, sql: str, parameters):
+        self._cursor = cursor
+        self._conn = conn
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._logged = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def profile(self, elapsed: float, calls: int = 0):
+        if not sql_profiler.enabled:
+            return
+        self._elapsed += elapsed
+        profile = sql_profiler.record(self._sql, elapsed, calls)
+        profile.max = max(profile.max, self._elapsed)
+        if not self._logged and self._elapsed >= sql_profiler.slow_seconds:
+            self._logged = True
+            profile.slow += 1
+            await sql_profiler.log_slow(self._conn, self._sql, self._parameters, self._elapsed)
+
+    async def fetchone(self):
+        started = time.perf_counter()
+        try:
+            row = await self._cursor.fetchone()
+        finally:
+            elapsed = record_db_time(started)
+        await self.profile(elapsed)
+        return row
+
+    async def fetchmany(self, size: Optional[int] = None):
+        started = time.perf_counter()
+        try:
+            rows = await self._cursor.fetchmany(size)
+        finally:
+            elapsed = record_db_time(started)
+        await self.profile(elapsed)
+        return rows
+
+    async def fetchall(self):
+        started = time.perf_counter()
+        try:
+            rows = await self._cursor.fetchall()
+        finally:
+            elapsed = record_db_time(started)
+        await self.profile(elapsed)
+        return rows
+
+class InstrumentedConnection:
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    async def execute(self, sql: str, parameters=None) -> InstrumentedCursor:
+        started = time.perf_counter()
+        try:
+            cursor = await self._conn.execute(sql, parameters)
+        finally:
+            elapsed = record_db_time(started, statements=1)
+        traced = InstrumentedCursor(cursor, self._conn, sql, parameters)
+        await traced.profile(elapsed, calls=1)
+        return traced
+
+    async def executemany(self, sql: str, parameters) -> InstrumentedCursor:
+        started = time.perf_counter()
+        try:
+            cursor = await self._conn.executemany(sql, parameters)
+        finally:
+            elapsed = record_db_time(started, statements=1)
+        # The plan is the same for every row, so explain it with the first one
+        first = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else None
+        traced = InstrumentedCursor(cursor, self._conn, sql, first)
+        await traced.profile(elapsed, calls=1)
+        return traced
+
+# Connection pool
+# SQLite allows a single writer at a time, so all writes are serialized through
+# one connection behind a lock while reads are spread over a small set of
+# reader connections. WAL journaling lets the readers run alongside the writer.
+class DatabasePool:
+    def __init__(self, path: Path, readers: int = DB_POOL_READERS):
+        self.path = path
+        self.size = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+        await conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        await conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    async def open(self):
+        self._writer = await self._connect()
+        # journal_mode is persistent, so setting it once on the writer is enough
+        cursor = await self._writer.execute("PRAGMA journal_mode = WAL")
+        await cursor.close()
+        self._readers = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await self._connect()
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers = []
+        self._readers = None
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def reader(self):
+        conn = await self._readers.get()
+        try:
+            yield InstrumentedConnection(conn)
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def dedicated_reader(self):
+        # A connection of its own for reads that last as long as a client
+        # takes to download them, so they never hold one of the pooled readers
+        conn = await self._connect()
+        try:
+            await conn.execute("PRAGMA query_only = ON")
+            yield InstrumentedConnection(conn)
+        finally:
+            await conn.close()
+
+    @asynccontextmanager
+    async def writer(self):
+        async with self._write_lock:
+            try:
+                yield InstrumentedConnection(self._writer)
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            # Never hand the next caller a connection with an open transaction
+            if self._writer.in_transaction:
+                await self._writer.commit()
+
+db_pool = DatabasePool(DB_PATH)
+
+# Password hasher
+# bcrypt takes hundreds of milliseconds per call, so hashing and verification
+# run on a small dedicated thread pool (bcrypt releases the GIL) instead of the
+# event loop. Callers beyond the queue limit get a 503 rather than piling up.
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(1, workers)
+        self.queue_limit = max(self.workers, queue_limit)
+        self.rounds = rounds
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    async def _run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many password operations in progress, please retry",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _verify(password: str, password_hash: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self._verify, password, password_hash)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
+
+# Patient search text folding
+# Arabic names are spelled with and without hamza forms, taa marbuta and
+# vowel marks, and phones are typed with Arabic-Indic digits and separators.
+# The same folding is applied to indexed text (in SQL, so triggers fire from
+# any connection) and to search input (in Python), so the spellings meet.
+# SQLite caps expression nesting at about 30 calls, which is why names and
+# phones each get only the folds that matter for them.
+NAME_FOLDS = {
+    "\u0622": "\u0627", "\u0623": "\u0627", "\u0625": "\u0627", "\u0671": "\u0627",  # alef forms
+    "\u0629": "\u0647",  # taa marbuta
+    "\u0649": "\u064a",  # alef maqsura
+    "\u0624": "\u0648", "\u0626": "\u064a",  # hamza on waw / yaa
+    "\u0640": "",  # tatweel
+    **{chr(mark): "" for mark in (*range(0x064B, 0x0653), 0x0670)},  # harakat
+}
+PHONE_FOLDS = {
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Extended Arabic-Indic digits
+    **{separator: "" for separator in " -+()."},
+}
+SEARCH_FOLD_TABLE = str.maketrans({**NAME_FOLDS, **{k: v for k, v in PHONE_FOLDS.items() if v}})
+PHONE_FOLD_TABLE = str.maketrans(PHONE_FOLDS)
+
+def fold_search_text(text: Optional[str]) -> str:
+    return (text or "").translate(SEARCH_FOLD_TABLE)
+
+def fold_phone(text: Optional[str]) -> str:
+    return (text or "").translate(PHONE_FOLD_TABLE)
+
+def sql_fold(expr: str, folds: dict) -> str:
+    for source, target in folds.items():
+        expr = f"replace({expr}, '{source}', '{target}')"
+    return expr
+
+def patients_fts_values(row: str) -> str:
+    return (f"{row}.id, {sql_fold(f'{row}.name', NAME_FOLDS)}, {sql_fold(f'{row}.phone', PHONE_FOLDS)}, "
+            f"{sql_fold(f'{row}.email', NAME_FOLDS)}, {sql_fold(f'{row}.notes', NAME_FOLDS)}")
+
+# Schema migrations
+# Applied in order by init_db and recorded in schema_migrations, so each one
+# runs exactly once per database. Append new versions; never edit a shipped one.
+MIGRATIONS = [
+    (1, "Indexes for hot query predicates", [
+        "CREATE INDEX IF NOT EXISTS idx_patients_created ON patients (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, appointment_date, appointment_time, id)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date, appointment_time, id)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id)",
+        "CREATE INDEX IF NOT EXISTS idx_visits_patient_date ON visits (patient_id, visit_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_visits_date ON visits (visit_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_visit_procedures_visit ON visit_procedures (visit_id, procedure_id, quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_visit_procedures_procedure ON visit_procedures (procedure_id)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_patient_date ON payments (patient_id, payment_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_payments_date ON payments (payment_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_images_patient_date ON medical_images (patient_id, upload_date)",
+    ]),
+    (2, "Content hash and size for medical images", [
+        "ALTER TABLE medical_images ADD COLUMN sha256 TEXT",
+        "ALTER TABLE medical_images ADD COLUMN size_bytes INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_medical_images_path ON medical_images (image_path)",
+    ]),
+    (3, "Index staff by role for doctor lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_users_role_name ON users (role, full_name, id)",
+    ]),
+    (4, "Full-text patient search", [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+            name, phone, email, notes,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )""",
+        # Name matches outrank phone, email and notes matches
+        "INSERT INTO patients_fts (patients_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')",
+        f"""CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+            INSERT INTO patients_fts (rowid, name, phone, email, notes) VALUES ({patients_fts_values('new')});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF name, phone, email, notes ON patients BEGIN
+            DELETE FROM patients_fts WHERE rowid = old.id;
+            INSERT INTO patients_fts (rowid, name, phone, email, notes) VALUES ({patients_fts_values('new')});
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+            DELETE FROM patients_fts WHERE rowid = old.id;
+        END""",
+        f"INSERT INTO patients_fts (rowid, name, phone, email, notes) SELECT {patients_fts_values('patients')} FROM patients",
+    ]),
+    (5, "Index medical images by content hash", [
+        "CREATE INDEX IF NOT EXISTS idx_medical_images_sha256 ON medical_images (sha256)",
+    ]),
+    (6, "Index visits by doctor for exports", [
+        "CREATE INDEX IF NOT EXISTS idx_visits_doctor_date ON visits (doctor_id, visit_date, id)",
+    ]),
+]
+
+async def run_migrations(db):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    current = (await cursor.fetchone())[0]
+    
+    if db.in_transaction:
+        await db.commit()
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # sqlite3 only opens transactions implicitly for DML, so without an
+        # explicit BEGIN each CREATE/ALTER would commit on its own and a crash
+        # mid-migration would leave it half applied with no version row
+        await db.execute("BEGIN")
+        try:
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat())
+            )
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+        logger.info("Applied schema migration %d: %s", version, description)
+
 # Database initialization
 async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -295,12 +876,33 @@ async def init_db():
             )
         """)
         
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS patient_ledger (
+                patient_id INTEGER PRIMARY KEY,
+                billed_jod REAL NOT NULL DEFAULT 0,
+                paid_jod REAL NOT NULL DEFAULT 0,
+                balance_jod REAL NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (patient_id) REFERENCES patients(id)
+            )
+        """)
+        
+        # Backfill the ledger for databases created before it existed
+        cursor = await db.execute(
+            "SELECT COUNT(*) FROM patients WHERE id NOT IN (SELECT patient_id FROM patient_ledger)"
+        )
+        missing = (await cursor.fetchone())[0]
+        if missing:
+            await rebuild_patient_ledger(db)
+        
+        await run_migrations(db)
+        
         # Create default admin if not exists
         cursor = await db.execute("SELECT id FROM users WHERE username = ?", ("admin",))
         admin = await cursor.fetchone()
         
         if not admin:
-            password_hash = bcrypt.hashpw("admin".encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            password_hash = await password_hasher.hash("admin")
             await db.execute(
                 "INSERT INTO users (username, password_hash, full_name, role, is_first_login, session_duration_hours, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
                 ("admin", password_hash, "System Administrator", "admin", 1, 8, datetime.now().isoformat())
@@ -308,20 +910,93 @@ async def init_db():
         
         await db.commit()
 
+# In-process caches
+# Small TTL cache with LRU eviction. Entries are dropped when they expire, when
+# the cache is full, or when a write route clears them explicitly.
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Bumped on every invalidation, so a reader that missed can tell
+        # whether its row was invalidated while it was loading it
+        self._generations = {}
+        self._clears = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, key):
+        return self._clears, self._generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        if generation is not None and generation != self.generation(key):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self._clears += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', 30))
+dashboard_cache = TTLCache(maxsize=8, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+# Authenticated user records keyed by session user_id. The routes that change a
+# user invalidate their entry; the TTL bounds staleness across worker processes.
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
 # Session helpers
 async def get_current_user(request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+    
+    # A pop while the row is being read would otherwise be undone by the set
+    # below, caching the pre-update row for a full TTL
+    generation = user_cache.generation(user_id)
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM users WHERE id = ?", (user_id,))
         user = await cursor.fetchone()
         
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
+        user_cache.set(user_id, dict(user), generation)
         return dict(user)
 
 from typing import List
@@ -338,41 +1013,194 @@ def require_role(required_roles: List[str]):
 
     return role_checker
 
+# Pagination helpers
+# List routes page with an opaque keyset cursor over their sort columns (always
+# ending in the row id so the order is stable). The body stays a plain list;
+# the next cursor and optional total count travel in response headers.
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Values are bound straight into the keyset comparison, so only scalars
+    # SQLite can bind are accepted
+    if (not isinstance(values, list) or len(values) != size
+            or any(type(value) not in (str, int, float) for value in values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def date_range_filter(column: str, date_from: Optional[str], date_to: Optional[str]):
+    # Half-open range so plain dates and ISO timestamps compare the same way
+    # and the column's index stays usable
+    clauses = []
+    params = []
+    try:
+        if date_from:
+            clauses.append(f"{column} >= ?")
+            params.append(datetime.strptime(date_from, "%Y-%m-%d").strftime("%Y-%m-%d"))
+        if date_to:
+            clauses.append(f"{column} < ?")
+            params.append((datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+async def count_rows(db, query: str, params: list) -> int:
+    cursor = await db.execute(f"SELECT COUNT(*) FROM ({query})", params)
+    return (await cursor.fetchone())[0]
+
+def paginate_query(query: str, params: list, order_by: List[str], descending: bool,
+                   limit: Optional[int], cursor: Optional[str]) -> str:
+    if cursor:
+        values = decode_cursor(cursor, len(order_by))
+        operator = "<" if descending else ">"
+        placeholders = ", ".join("?" for _ in values)
+        query += f" AND ({', '.join(order_by)}) {operator} ({placeholders})"
+        params.extend(values)
+    
+    direction = " DESC" if descending else ""
+    query += " ORDER BY " + ", ".join(column + direction for column in order_by)
+    
+    if limit is not None:
+        # One extra row tells us whether another page exists
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query
+
+def page_rows(rows: list, key_fields: List[str], limit: Optional[int], response: Response) -> list:
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1][field] for field in key_fields)
+    return rows
+
+# Fast list responses
+# List routes can return thousands of rows, and building a response model per
+# row (which FastAPI then validates and serializes again) costs more than the
+# query. These routes hand their rows to a RowEncoder instead: it picks the
+# model's fields out of each row column by column, coerces them as the model
+# would and encodes the list in one call. The routes keep their
+# response_model, so the OpenAPI schema is unchanged, and the bytes are the
+# same as FastAPI's JSONResponse would send.
+def orjson_float(value: float) -> bool:
+    # Outside this range orjson writes exponents differently from json.dumps
+    # ("1e16" for "1e+16", "0.00001" for "1e-05")
+    return not value or 1e-4 <= abs(value) < 1e16
+
+def encode_json(content, orjson_safe: bool = True) -> bytes:
+    if orjson is not None and orjson_safe:
+        try:
+            return orjson.dumps(content)
+        except TypeError:  # lone surrogates, integers past 64 bits
+            pass
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+class RowEncoder:
+    def __init__(self, model: type):
+        self.names = list(model.model_fields)
+        self.fields = []
+        for name, field in model.model_fields.items():
+            annotation = field.annotation
+            if get_origin(annotation) is Union:
+                annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+            kind = annotation if annotation in (float, bool) else list if get_origin(annotation) is list else None
+            self.fields.append((name, kind))
+
+    def response(self, rows: list, response: Optional[Response] = None, **computed) -> Response:
+        """Encode rows as a JSON list of the model.
+
+        computed maps a field name to per-row values that replace the row's
+        column or supply a field the row doesn't have.
+        """
+        columns = []
+        orjson_safe = True
+        if rows:
+            keys = rows[0].keys()
+            for name, kind in self.fields:
+                if name in computed:
+                    values = computed[name]
+                else:
+                    values = map(operator.itemgetter(keys.index(name)), rows)
+                if kind is float:
+                    values = [None if value is None else float(value) for value in values]
+                    orjson_safe = orjson_safe and all(orjson_float(value) for value in values if value)
+                elif kind is bool:
+                    values = [None if value is None else bool(value) for value in values]
+                elif kind is list:
+                    values = list(values)
+                    orjson_safe = orjson_safe and all(
+                        orjson_float(value)
+                        for entries in values for entry in entries for value in entry.values()
+                        if type(value) is float
+                    )
+                columns.append(values)
+        
+        items = [dict(zip(self.names, values)) for values in zip(*columns)]
+        fast = Response(encode_json(items, orjson_safe), media_type="application/json")
+        if response is not None:
+            # Headers the route set on the injected response (cursor, total count)
+            fast.headers.raw.extend(response.headers.raw)
+        return fast
+
+user_encoder = RowEncoder(UserResponse)
+patient_encoder = RowEncoder(PatientResponse)
+procedure_encoder = RowEncoder(ProcedureResponse)
+appointment_encoder = RowEncoder(AppointmentResponse)
+visit_encoder = RowEncoder(VisitResponse)
+payment_encoder = RowEncoder(PaymentResponse)
+image_encoder = RowEncoder(ImageResponse)
+
 # Auth routes
 @api_router.post("/auth/login")
 async def login(request: Request, login_data: LoginRequest):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM users WHERE username = ?", (login_data.username,))
         user = await cursor.fetchone()
-        
-        if not user or not bcrypt.checkpw(login_data.password.encode('utf-8'), user["password_hash"].encode('utf-8')):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        request.session["user_id"] = user["id"]
-        request.session["role"] = user["role"]
-        
-        return {
-            "user": {
-                "id": user["id"],
-                "username": user["username"],
-                "full_name": user["full_name"],
-                "role": user["role"],
-                "is_first_login": bool(user["is_first_login"]),
-                "session_duration_hours": user["session_duration_hours"]
-            }
+    
+    # Verified after the reader is back in the pool, so a burst of logins
+    # does not hold every reader for the length of a bcrypt call
+    if not user or not await password_hasher.verify(login_data.password, user["password_hash"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    request.session["user_id"] = user["id"]
+    request.session["role"] = user["role"]
+    
+    return {
+        "user": {
+            "id": user["id"],
+            "username": user["username"],
+            "full_name": user["full_name"],
+            "role": user["role"],
+            "is_first_login": bool(user["is_first_login"]),
+            "session_duration_hours": user["session_duration_hours"]
         }
+    }
 
 @api_router.post("/auth/change-password")
 async def change_password(request: Request, password_data: PasswordChangeRequest, current_user: dict = Depends(get_current_user)):
-    password_hash = bcrypt.hashpw(password_data.new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = await password_hasher.hash(password_data.new_password)
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute(
             "UPDATE users SET password_hash = ?, is_first_login = 0 WHERE id = ?",
             (password_hash, current_user["id"])
         )
         await db.commit()
+        user_cache.pop(current_user["id"])
     
     return {"message": "Password changed successfully"}
 
@@ -395,17 +1223,17 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 # User management routes (Admin only)
 @api_router.post("/users", response_model=UserResponse)
 async def create_user(user_data: UserCreate, current_user: dict = Depends(require_role(["admin"]))):
-    password_hash = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = await password_hasher.hash(user_data.password)
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO users (username, password_hash, full_name, role, session_duration_hours, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (user_data.username, password_hash, user_data.full_name, user_data.role, user_data.session_duration_hours, datetime.now().isoformat())
         )
         await db.commit()
+        dashboard_cache.clear()
         user_id = cursor.lastrowid
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("SELECT * FROM users WHERE id = ?", (user_id,))
         user = await cursor.fetchone()
         
@@ -421,24 +1249,20 @@ async def create_user(user_data: UserCreate, current_user: dict = Depends(requir
 
 @api_router.get("/users", response_model=List[UserResponse])
 async def get_users(current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM users ORDER BY created_at DESC")
         users = await cursor.fetchall()
         
-        return [UserResponse(
-            id=user["id"],
-            username=user["username"],
-            full_name=user["full_name"],
-            role=user["role"],
-            session_duration_hours=user["session_duration_hours"],
-            is_first_login=bool(user["is_first_login"]),
-            created_at=user["created_at"]
-        ) for user in users]
+        return user_encoder.response(users)
 
 @api_router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(user_id: int, user_data: UserUpdate, current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+    # Hash before taking the writer so other writes are not held up by bcrypt
+    password_hash = None
+    if user_data.password is not None:
+        password_hash = await password_hasher.hash(user_data.password)
+    
+    async with db_pool.writer() as db:
         updates = []
         params = []
         
@@ -450,8 +1274,7 @@ async def update_user(user_id: int, user_data: UserUpdate, current_user: dict =
             updates.append("session_duration_hours = ?")
             params.append(user_data.session_duration_hours)
         
-        if user_data.password is not None:
-            password_hash = bcrypt.hashpw(user_data.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        if password_hash is not None:
             updates.append("password_hash = ?")
             params.append(password_hash)
         
@@ -459,8 +1282,9 @@ async def update_user(user_id: int, user_data: UserUpdate, current_user: dict =
             params.append(user_id)
             await db.execute(f"UPDATE users SET {', '.join(updates)} WHERE id = ?", params)
             await db.commit()
+            dashboard_cache.clear()
+            user_cache.pop(user_id)
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("SELECT * FROM users WHERE id = ?", (user_id,))
         user = await cursor.fetchone()
         
@@ -479,30 +1303,40 @@ async def delete_user(user_id: int, current_user: dict = Depends(require_role(["
     if user_id == current_user["id"]:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("DELETE FROM users WHERE id = ?", (user_id,))
         await db.commit()
+        dashboard_cache.clear()
+        user_cache.pop(user_id)
     
     return {"message": "User deleted successfully"}
 
 # Patient routes
 @api_router.post("/patients", response_model=PatientResponse)
 async def create_patient(patient_data: PatientCreate, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO patients (name, phone, email, date_of_birth, address, medical_history, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (patient_data.name, patient_data.phone, patient_data.email, patient_data.date_of_birth, 
              patient_data.address, patient_data.medical_history, patient_data.notes, datetime.now().isoformat())
         )
-        await db.commit()
         patient_id = cursor.lastrowid
+        await db.execute(
+            "INSERT INTO patient_ledger (patient_id, billed_jod, paid_jod, balance_jod, updated_at) VALUES (?, 0, 0, 0, ?)",
+            (patient_id, datetime.now().isoformat())
+        )
+        await db.commit()
+        dashboard_cache.clear()
+        patient_index.add(patient_id, patient_data.name, patient_data.phone)
         
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
+        cursor = await db.execute("""
+            SELECT p.*, COALESCE(l.balance_jod, 0.0) as balance_jod
+            FROM patients p
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE p.id = ?
+        """, (patient_id,))
         patient = await cursor.fetchone()
         
-        balance = await calculate_patient_balance(db, patient_id)
-        
         return PatientResponse(
             id=patient["id"],
             name=patient["name"],
@@ -512,47 +1346,217 @@ async def create_patient(patient_data: PatientCreate, current_user: dict = Depen
             address=patient["address"],
             medical_history=patient["medical_history"],
             notes=patient["notes"],
-            balance_jod=balance,
+            balance_jod=round(patient["balance_jod"], 2),
             created_at=patient["created_at"]
         )
 
 @api_router.get("/patients", response_model=List[PatientResponse])
-async def get_patients(current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM patients ORDER BY created_at DESC")
-        patients = await cursor.fetchall()
+async def get_patients(
+    response: Response,
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    async with db_pool.reader() as db:
+        query = """
+            SELECT p.*, COALESCE(l.balance_jod, 0.0) as balance_jod
+            FROM patients p
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE 1=1
+        """
+        params = []
         
-        result = []
-        for patient in patients:
-            balance = await calculate_patient_balance(db, patient["id"])
-            result.append(PatientResponse(
-                id=patient["id"],
-                name=patient["name"],
-                phone=patient["phone"],
-                email=patient["email"],
-                date_of_birth=patient["date_of_birth"],
-                address=patient["address"],
-                medical_history=patient["medical_history"],
-                notes=patient["notes"],
-                balance_jod=balance,
-                created_at=patient["created_at"]
-            ))
+        if q:
+            query += " AND (p.name LIKE ? ESCAPE '\\' OR p.phone LIKE ? ESCAPE '\\' OR p.email LIKE ? ESCAPE '\\')"
+            params.extend([like_pattern(q)] * 3)
+        
+        date_clause, date_params = date_range_filter("p.created_at", date_from, date_to)
+        query += date_clause
+        params.extend(date_params)
         
-        return result
+        if include_total:
+            response.headers["X-Total-Count"] = str(await count_rows(db, query, params))
+        
+        query = paginate_query(query, params, ["p.created_at", "p.id"], True, limit, cursor)
+        
+        db_cursor = await db.execute(query, params)
+        patients = page_rows(await db_cursor.fetchall(), ["created_at", "id"], limit, response)
+        
+        return patient_encoder.response(
+            patients, response, balance_jod=[round(patient["balance_jod"], 2) for patient in patients]
+        )
+
+# Input made only of digits and phone separators is treated as a phone number
+PHONE_QUERY = re.compile(r"[0-9 \-+().]*[0-9][0-9 \-+().]*")
+
+def patient_match_query(text: str) -> Optional[str]:
+    # Every term must match as a prefix; phone-like input is one digit run
+    folded = fold_search_text(text)
+    if PHONE_QUERY.fullmatch(folded):
+        terms = [fold_phone(folded)]
+    else:
+        terms = re.findall(r"[^\W_]+", folded)
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+# Patient typeahead
+# A sorted array of (term, patient_id) pairs over folded name words and
+# normalized phones, searched with bisect. It is loaded at startup and kept
+# current by the patient write routes in this process; other worker
+# processes pick up changes on their next restart.
+def normalize_phone(phone: Optional[str]) -> str:
+    digits = "".join(ch for ch in fold_phone(phone) if ch.isdigit())
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith("962"):
+        digits = "0" + digits[3:]
+    return digits
+
+def name_terms(name: Optional[str]) -> List[str]:
+    return re.findall(r"[^\W_]+", fold_search_text(name).casefold())
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _terms(name: str, phone: str) -> set:
+        terms = set(name_terms(name))
+        phone_term = normalize_phone(phone)
+        if phone_term:
+            terms.add(phone_term)
+        return terms
+
+    def load(self, rows):
+        self._keys = []
+        self._entries = {}
+        self.add_many(rows)
+
+    def add_many(self, rows):
+        # One sort for the whole batch instead of an insort per key
+        keys = []
+        for patient_id, name, phone in rows:
+            self.remove(patient_id)
+            terms = self._terms(name, phone)
+            self._entries[patient_id] = (name, phone, terms)
+            keys.extend((term, patient_id) for term in terms)
+        self._keys.extend(keys)
+        self._keys.sort()
+
+    def add(self, patient_id: int, name: str, phone: str):
+        self.remove(patient_id)
+        terms = self._terms(name, phone)
+        self._entries[patient_id] = (name, phone, terms)
+        for term in terms:
+            bisect.insort(self._keys, (term, patient_id))
+
+    def remove(self, patient_id: int):
+        entry = self._entries.pop(patient_id, None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            index = bisect.bisect_left(self._keys, (term, patient_id))
+            if index < len(self._keys) and self._keys[index] == (term, patient_id):
+                del self._keys[index]
+
+    def _range(self, prefix: str) -> tuple:
+        return (bisect.bisect_left(self._keys, (prefix,)),
+                bisect.bisect_left(self._keys, (prefix + "\U0010ffff",)))
+
+    def suggest(self, query: str, limit: int) -> List[tuple]:
+        if PHONE_QUERY.fullmatch(fold_search_text(query)):
+            terms = [normalize_phone(query)]
+        else:
+            terms = name_terms(query)
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+        
+        # Walk the narrowest term's key range; the other terms filter it
+        ranges = {term: self._range(term) for term in terms}
+        lead = min(ranges, key=lambda term: ranges[term][1] - ranges[term][0])
+        start, stop = ranges[lead]
+        others = [term for term in ranges if term != lead]
+        results = []
+        seen = set()
+        for index in range(start, stop):
+            if len(results) >= limit:
+                break
+            patient_id = self._keys[index][1]
+            if patient_id in seen:
+                continue
+            seen.add(patient_id)
+            name, phone, patient_terms = self._entries[patient_id]
+            if all(any(candidate.startswith(wanted) for candidate in patient_terms) for wanted in others):
+                results.append((patient_id, name, phone))
+        return results
+
+patient_index = PrefixIndex()
+
+async def load_patient_index():
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT id, name, phone FROM patients")
+        patient_index.load(await cursor.fetchall())
+    logger.info("Patient typeahead index loaded (%d patients)", len(patient_index))
+
+@api_router.get("/patients/suggest", response_model=List[PatientSuggestion])
+async def suggest_patients(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    return [
+        PatientSuggestion(id=patient_id, name=name, phone=phone)
+        for patient_id, name, phone in patient_index.suggest(q, limit)
+    ]
+
+@api_router.get("/patients/search", response_model=List[PatientResponse])
+async def search_patients(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    match = patient_match_query(q)
+    if match is None:
+        return []
+    
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT p.*, COALESCE(l.balance_jod, 0.0) as balance_jod
+            FROM patients_fts
+            JOIN patients p ON p.id = patients_fts.rowid
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE patients_fts MATCH ?
+            ORDER BY patients_fts.rank
+            LIMIT ?
+        """, (match, limit))
+        patients = await cursor.fetchall()
+        
+        return patient_encoder.response(
+            patients, balance_jod=[round(patient["balance_jod"], 2) for patient in patients]
+        )
 
 @api_router.get("/patients/{patient_id}", response_model=PatientResponse)
 async def get_patient(patient_id: int, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT p.*, COALESCE(l.balance_jod, 0.0) as balance_jod
+            FROM patients p
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE p.id = ?
+        """, (patient_id,))
         patient = await cursor.fetchone()
         
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        balance = await calculate_patient_balance(db, patient_id)
-        
         return PatientResponse(
             id=patient["id"],
             name=patient["name"],
@@ -562,13 +1566,13 @@ async def get_patient(patient_id: int, current_user: dict = Depends(get_current_
             address=patient["address"],
             medical_history=patient["medical_history"],
             notes=patient["notes"],
-            balance_jod=balance,
+            balance_jod=round(patient["balance_jod"], 2),
             created_at=patient["created_at"]
         )
 
 @api_router.put("/patients/{patient_id}", response_model=PatientResponse)
 async def update_patient(patient_id: int, patient_data: PatientUpdate, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         updates = []
         params = []
         
@@ -598,12 +1602,18 @@ async def update_patient(patient_id: int, patient_data: PatientUpdate, current_u
             params.append(patient_id)
             await db.execute(f"UPDATE patients SET {', '.join(updates)} WHERE id = ?", params)
             await db.commit()
+            dashboard_cache.clear()
         
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
+        cursor = await db.execute("""
+            SELECT p.*, COALESCE(l.balance_jod, 0.0) as balance_jod
+            FROM patients p
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE p.id = ?
+        """, (patient_id,))
         patient = await cursor.fetchone()
         
-        balance = await calculate_patient_balance(db, patient_id)
+        if patient_data.name is not None or patient_data.phone is not None:
+            patient_index.add(patient["id"], patient["name"], patient["phone"])
         
         return PatientResponse(
             id=patient["id"],
@@ -614,67 +1624,397 @@ async def update_patient(patient_id: int, patient_data: PatientUpdate, current_u
             address=patient["address"],
             medical_history=patient["medical_history"],
             notes=patient["notes"],
-            balance_jod=balance,
+            balance_jod=round(patient["balance_jod"], 2),
             created_at=patient["created_at"]
         )
 
 @api_router.delete("/patients/{patient_id}")
-async def delete_patient(patient_id: int, current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Delete related records
-        await db.execute("DELETE FROM appointments WHERE patient_id = ?", (patient_id,))
-        await db.execute("DELETE FROM payments WHERE patient_id = ?", (patient_id,))
-        await db.execute("DELETE FROM medical_images WHERE patient_id = ?", (patient_id,))
-        
-        # Delete visits and their procedures
-        cursor = await db.execute("SELECT id FROM visits WHERE patient_id = ?", (patient_id,))
-        visits = await cursor.fetchall()
-        for visit in visits:
-            await db.execute("DELETE FROM visit_procedures WHERE visit_id = ?", (visit[0],))
-        await db.execute("DELETE FROM visits WHERE patient_id = ?", (patient_id,))
+async def delete_patient(
+    patient_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    async with db_pool.writer() as db:
+        cursor = await db.execute(
+            "SELECT id, image_path, sha256 FROM medical_images WHERE patient_id = ?", (patient_id,)
+        )
+        images = await cursor.fetchall()
+        
+        # Delete related records, one statement per table
+        await db.execute("""
+            DELETE FROM visit_procedures
+            WHERE visit_id IN (SELECT id FROM visits WHERE patient_id = ?)
+        """, (patient_id,))
+        for table in ("visits", "appointments", "payments", "medical_images", "patient_ledger"):
+            await db.execute(f"DELETE FROM {table} WHERE patient_id = ?", (patient_id,))
         
         # Delete patient
         await db.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+        
+        # Derivatives are shared by content hash, so keep those still in use
+        shared = await referenced_hashes(db, [image["sha256"] for image in images if image["sha256"]])
         await db.commit()
+        dashboard_cache.clear()
+        patient_index.remove(patient_id)
+    
+    background_tasks.add_task(
+        remove_patient_files, patient_id, [image for image in images if image["sha256"] not in shared]
+    )
     
     return {"message": "Patient deleted successfully"}
 
-# Helper function to calculate patient balance
-async def calculate_patient_balance(db, patient_id: int) -> float:
-    # Calculate total cost from visits
-    cursor = await db.execute("""
-        SELECT SUM(p.price_jod * vp.quantity) as total_cost
+# Bulk patient import
+# Uploads are copied to a temp file and imported by a background task.
+# Rows are parsed and validated on a worker thread one batch at a time, and
+# each batch is inserted in a single transaction, so other writes interleave
+# between batches and a bad row only costs that row. Jobs live in memory and
+# are polled by id; only the most recent IMPORT_JOBS_KEPT are retained.
+IMPORT_JOBS_KEPT = 50
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_FIELDS = list(PatientCreate.model_fields)
+
+class ImportJob:
+    def __init__(self, job_id: str, path: Path, import_format: str):
+        self.id = job_id
+        self.path = path
+        self.format = import_format
+        self.status = "queued"
+        self.total_bytes = path.stat().st_size
+        self.bytes_read = 0
+        self.rows_processed = 0
+        self.rows_imported = 0
+        self.rows_failed = 0
+        self.errors = []
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.task = None
+
+    def fail_row(self, row: int, error: str):
+        self.rows_failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append(ImportRowError(row=row, error=error))
+
+    def response(self) -> ImportJobResponse:
+        done = self.status in ("completed", "failed")
+        return ImportJobResponse(
+            id=self.id,
+            status=self.status,
+            format=self.format,
+            rows_processed=self.rows_processed,
+            rows_imported=self.rows_imported,
+            rows_failed=self.rows_failed,
+            progress=1.0 if done else round(self.bytes_read / max(self.total_bytes, 1), 4),
+            errors=self.errors,
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+import_jobs = OrderedDict()
+
+def read_import_rows(job: ImportJob, source):
+    # Yields (row_number, dict or error string) while tracking bytes read
+    # Spreadsheet exports often start with a UTF-8 byte order mark
+    if source.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+        source.seek(0)
+    
+    def lines():
+        while True:
+            line = source.readline()
+            if not line:
+                return
+            job.bytes_read = source.tell()
+            yield line.decode("utf-8", errors="replace")
+    
+    if job.format == "csv":
+        reader = csv.reader(lines())
+        header = [column.strip().lower() for column in next(reader, [])]
+        for row_number, values in enumerate(reader, start=2):
+            if any(value.strip() for value in values):
+                yield row_number, dict(zip(header, values))
+    else:
+        for row_number, line in enumerate(lines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield row_number, "Invalid JSON"
+                continue
+            yield row_number, record if isinstance(record, dict) else "Each line must be a JSON object"
+
+def validate_import_row(record) -> PatientCreate:
+    if isinstance(record, str):
+        raise ValueError(record)
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None:
+            values[field] = str(value)
+    for field in ("name", "phone"):
+        if not values.get(field):
+            raise ValueError(f"{field} is required")
+    if values.get("date_of_birth"):
+        try:
+            datetime.strptime(values["date_of_birth"], "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("date_of_birth must be YYYY-MM-DD")
+    return PatientCreate(**values)
+
+def next_import_batch(job: ImportJob, rows) -> List[PatientCreate]:
+    batch = []
+    for row_number, record in rows:
+        job.rows_processed += 1
+        try:
+            batch.append(validate_import_row(record))
+        except ValueError as exc:
+            job.fail_row(row_number, str(exc))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            break
+    return batch
+
+async def insert_patient_batch(batch: List[PatientCreate]) -> List[tuple]:
+    now = datetime.now().isoformat()
+    async with db_pool.writer() as db:
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM patients")
+        last_id = (await cursor.fetchone())[0]
+        await db.executemany(
+            "INSERT INTO patients (name, phone, email, date_of_birth, address, medical_history, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(patient.name, patient.phone, patient.email, patient.date_of_birth, patient.address,
+              patient.medical_history, patient.notes, now) for patient in batch]
+        )
+        # The writer lock keeps other inserts out, so the batch is every id past last_id
+        await db.execute("""
+            INSERT OR IGNORE INTO patient_ledger (patient_id, billed_jod, paid_jod, balance_jod, updated_at)
+            SELECT id, 0, 0, 0, ? FROM patients WHERE id > ?
+        """, (now, last_id))
+        cursor = await db.execute("SELECT id, name, phone FROM patients WHERE id > ?", (last_id,))
+        inserted = await cursor.fetchall()
+        await db.commit()
+    return [(row["id"], row["name"], row["phone"]) for row in inserted]
+
+async def run_patient_import(job: ImportJob):
+    job.status = "running"
+    try:
+        with open(job.path, "rb") as source:
+            rows = read_import_rows(job, source)
+            while True:
+                batch = await asyncio.to_thread(next_import_batch, job, rows)
+                if not batch:
+                    break
+                inserted = await insert_patient_batch(batch)
+                job.rows_imported += len(inserted)
+                patient_index.add_many(inserted)
+                dashboard_cache.clear()
+        job.status = "completed"
+    except asyncio.CancelledError:
+        job.status = "failed"
+        job.errors.append(ImportRowError(row=0, error="Import interrupted by shutdown"))
+        raise
+    except Exception as exc:
+        logger.exception("Patient import %s failed", job.id)
+        job.status = "failed"
+        job.errors.append(ImportRowError(row=0, error=f"Import failed: {exc}"))
+    finally:
+        job.finished_at = datetime.now().isoformat()
+        job.path.unlink(missing_ok=True)
+        logger.info("Patient import %s %s: %d imported, %d failed",
+                    job.id, job.status, job.rows_imported, job.rows_failed)
+
+def save_import_upload(source, target: Path):
+    size = 0
+    try:
+        with open(target, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_IMPORT_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {MAX_IMPORT_BYTES} byte import limit"
+                    )
+                buffer.write(chunk)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+
+@api_router.post("/patients/import", response_model=ImportJobResponse, status_code=202)
+async def import_patients(
+    file: UploadFile = File(...),
+    import_format: Optional[str] = Form(None, alias="format"),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    import_format = import_format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    if import_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    
+    job_id = secrets.token_hex(8)
+    path = Path(tempfile.gettempdir()) / f"patient-import-{job_id}.{import_format}"
+    await asyncio.to_thread(save_import_upload, file.file, path)
+    
+    job = ImportJob(job_id, path, import_format)
+    import_jobs[job_id] = job
+    while len(import_jobs) > IMPORT_JOBS_KEPT:
+        oldest_id = next(iter(import_jobs))
+        if import_jobs[oldest_id].finished_at is None:
+            break
+        import_jobs.pop(oldest_id)
+    job.task = asyncio.create_task(run_patient_import(job))
+    return job.response()
+
+@api_router.get("/patients/import/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(job_id: str, current_user: dict = Depends(require_role(["admin"]))):
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.response()
+
+# Balance helpers
+# Every patient's balance is computed in one grouped pass: procedure lines and
+# payments are unioned into a single stream and summed per patient.
+BALANCE_QUERY = """
+    SELECT patient_id, SUM(total_cost) AS total_cost, SUM(total_paid) AS total_paid
+    FROM (
+        SELECT v.patient_id AS patient_id, p.price_jod * vp.quantity AS total_cost, NULL AS total_paid
         FROM visits v
         JOIN visit_procedures vp ON v.id = vp.visit_id
         JOIN procedures p ON vp.procedure_id = p.id
-        WHERE v.patient_id = ?
-    """, (patient_id,))
-    result = await cursor.fetchone()
-    total_cost = result[0] if result[0] else 0.0
-    
-    # Calculate total payments
-    cursor = await db.execute("""
-        SELECT SUM(amount_jod) as total_paid
+        {visit_filter}
+        UNION ALL
+        SELECT patient_id, NULL, amount_jod
         FROM payments
-        WHERE patient_id = ?
-    """, (patient_id,))
-    result = await cursor.fetchone()
-    total_paid = result[0] if result[0] else 0.0
+        {payment_filter}
+    )
+    GROUP BY patient_id
+"""
+
+async def calculate_patient_balances(db, patient_ids: Optional[List[int]] = None) -> dict:
+    visit_filter = payment_filter = ""
+    params = []
+    if patient_ids is not None:
+        if not patient_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in patient_ids)
+        visit_filter = f"WHERE v.patient_id IN ({placeholders})"
+        payment_filter = f"WHERE patient_id IN ({placeholders})"
+        params = list(patient_ids) * 2
+    
+    cursor = await db.execute(
+        BALANCE_QUERY.format(visit_filter=visit_filter, payment_filter=payment_filter),
+        params
+    )
+    balances = {}
+    for row in await cursor.fetchall():
+        total_cost = row[1] if row[1] else 0.0
+        total_paid = row[2] if row[2] else 0.0
+        balances[row[0]] = round(total_cost - total_paid, 2)
+    
+    return balances
+
+# Patient ledger
+# patient_ledger keeps running billed/paid totals per patient so balance reads
+# are a primary-key lookup. Writers update it in the same transaction as the
+# visit/payment/price change; calculate_patient_balances() stays the slow path
+# used to rebuild and verify it.
+async def rebuild_patient_ledger(db, patient_ids: Optional[List[int]] = None) -> int:
+    visit_filter = payment_filter = patient_filter = ""
+    params = []
+    if patient_ids is not None:
+        if not patient_ids:
+            return 0
+        placeholders = ", ".join("?" for _ in patient_ids)
+        visit_filter = f"WHERE v.patient_id IN ({placeholders})"
+        payment_filter = f"WHERE patient_id IN ({placeholders})"
+        patient_filter = f"WHERE pt.id IN ({placeholders})"
+        params = list(patient_ids)
+        await db.execute(f"DELETE FROM patient_ledger WHERE patient_id IN ({placeholders})", params)
+    else:
+        await db.execute("DELETE FROM patient_ledger")
     
-    return round(total_cost - total_paid, 2)
+    balances = BALANCE_QUERY.format(visit_filter=visit_filter, payment_filter=payment_filter)
+    cursor = await db.execute(f"""
+        INSERT INTO patient_ledger (patient_id, billed_jod, paid_jod, balance_jod, updated_at)
+        SELECT pt.id, COALESCE(b.total_cost, 0.0), COALESCE(b.total_paid, 0.0),
+               COALESCE(b.total_cost, 0.0) - COALESCE(b.total_paid, 0.0), ?
+        FROM patients pt
+        LEFT JOIN ({balances}) b ON b.patient_id = pt.id
+        {patient_filter}
+    """, [datetime.now().isoformat()] + params * 3)
+    return cursor.rowcount
+
+async def ledger_add_visits(db, visit_ids: List[int]):
+    placeholders = ", ".join("?" for _ in visit_ids)
+    await db.execute(f"""
+        INSERT INTO patient_ledger (patient_id, billed_jod, paid_jod, balance_jod, updated_at)
+        SELECT v.patient_id, COALESCE(SUM(p.price_jod * vp.quantity), 0.0), 0.0,
+               COALESCE(SUM(p.price_jod * vp.quantity), 0.0), ?
+        FROM visits v
+        LEFT JOIN visit_procedures vp ON v.id = vp.visit_id
+        LEFT JOIN procedures p ON vp.procedure_id = p.id
+        WHERE v.id IN ({placeholders})
+        GROUP BY v.patient_id
+        ON CONFLICT(patient_id) DO UPDATE SET
+            billed_jod = billed_jod + excluded.billed_jod,
+            balance_jod = billed_jod + excluded.billed_jod - paid_jod,
+            updated_at = excluded.updated_at
+    """, [datetime.now().isoformat(), *visit_ids])
+
+async def ledger_add_payment(db, patient_id: int, amount_jod: float):
+    await db.execute("""
+        INSERT INTO patient_ledger (patient_id, billed_jod, paid_jod, balance_jod, updated_at)
+        VALUES (?, 0.0, ?, -?, ?)
+        ON CONFLICT(patient_id) DO UPDATE SET
+            paid_jod = paid_jod + excluded.paid_jod,
+            balance_jod = billed_jod - (paid_jod + excluded.paid_jod),
+            updated_at = excluded.updated_at
+    """, (patient_id, amount_jod, amount_jod, datetime.now().isoformat()))
+
+async def ledger_refresh_procedure(db, procedure_id: int):
+    # A price change touches every past visit using the procedure, so the
+    # affected patients are recomputed from the slow path rather than patched.
+    cursor = await db.execute("""
+        SELECT DISTINCT v.patient_id
+        FROM visit_procedures vp
+        JOIN visits v ON v.id = vp.visit_id
+        WHERE vp.procedure_id = ?
+    """, (procedure_id,))
+    patient_ids = [row[0] for row in await cursor.fetchall()]
+    await rebuild_patient_ledger(db, patient_ids)
+
+async def verify_patient_ledger(db) -> List[dict]:
+    expected = await calculate_patient_balances(db)
+    cursor = await db.execute("""
+        SELECT pt.id, l.billed_jod, l.paid_jod
+        FROM patients pt
+        LEFT JOIN patient_ledger l ON l.patient_id = pt.id
+    """)
+    mismatches = []
+    for row in await cursor.fetchall():
+        expected_balance = expected.get(row[0], 0.0)
+        ledger_balance = None if row[1] is None else round(row[1] - row[2], 2)
+        if ledger_balance != expected_balance:
+            mismatches.append({
+                "patient_id": row[0],
+                "ledger_balance_jod": ledger_balance,
+                "expected_balance_jod": expected_balance
+            })
+    return mismatches
 
 # Procedure routes
 @api_router.post("/procedures", response_model=ProcedureResponse)
 async def create_procedure(procedure_data: ProcedureCreate, current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO procedures (name, price_jod, description, created_at) VALUES (?, ?, ?, ?)",
             (procedure_data.name, procedure_data.price_jod, procedure_data.description, datetime.now().isoformat())
         )
         await db.commit()
+        dashboard_cache.clear()
         procedure_id = cursor.lastrowid
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("SELECT * FROM procedures WHERE id = ?", (procedure_id,))
         procedure = await cursor.fetchone()
         
@@ -688,22 +2028,15 @@ async def create_procedure(procedure_data: ProcedureCreate, current_user: dict =
 
 @api_router.get("/procedures", response_model=List[ProcedureResponse])
 async def get_procedures(current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM procedures ORDER BY name")
         procedures = await cursor.fetchall()
         
-        return [ProcedureResponse(
-            id=proc["id"],
-            name=proc["name"],
-            price_jod=proc["price_jod"],
-            description=proc["description"],
-            created_at=proc["created_at"]
-        ) for proc in procedures]
+        return procedure_encoder.response(procedures)
 
 @api_router.put("/procedures/{procedure_id}", response_model=ProcedureResponse)
 async def update_procedure(procedure_id: int, procedure_data: ProcedureUpdate, current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         updates = []
         params = []
         
@@ -720,9 +2053,11 @@ async def update_procedure(procedure_id: int, procedure_data: ProcedureUpdate, c
         if updates:
             params.append(procedure_id)
             await db.execute(f"UPDATE procedures SET {', '.join(updates)} WHERE id = ?", params)
+            if procedure_data.price_jod is not None:
+                await ledger_refresh_procedure(db, procedure_id)
             await db.commit()
+            dashboard_cache.clear()
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("SELECT * FROM procedures WHERE id = ?", (procedure_id,))
         procedure = await cursor.fetchone()
         
@@ -736,16 +2071,87 @@ async def update_procedure(procedure_id: int, procedure_data: ProcedureUpdate, c
 
 @api_router.delete("/procedures/{procedure_id}")
 async def delete_procedure(procedure_id: int, current_user: dict = Depends(require_role(["admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("DELETE FROM procedures WHERE id = ?", (procedure_id,))
+        # Lines pointing at a deleted procedure no longer count towards balances
+        await ledger_refresh_procedure(db, procedure_id)
         await db.commit()
+        dashboard_cache.clear()
     
     return {"message": "Procedure deleted successfully"}
 
 # Appointment routes
+# Bookings are half-open [start, end) minute intervals, so back-to-back
+# appointments that only touch do not conflict. A doctor's bookings for one
+# day come off idx_appointments_doctor_date; cancelled ones free their slot.
+NON_BLOCKING_STATUSES = ("cancelled",)
+
+CLOCK_PATTERN = re.compile(r"\s*(\d{1,2}):(\d{2})(?::\d{2})?\s*")
+
+# A day has only 1440 distinct times, so parsing and formatting are memoized
+@lru_cache(maxsize=4096)
+def parse_clock(value: Optional[str]) -> Optional[int]:
+    match = CLOCK_PATTERN.fullmatch(value or "")
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+@lru_cache(maxsize=4096)
+def format_clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def overlapping_intervals(intervals: List[tuple], start: int, end: int) -> List[tuple]:
+    # intervals are (start, end, id) tuples sorted by start; only those that
+    # begin before `end` can reach into [start, end)
+    stop = bisect.bisect_left(intervals, (end,))
+    return [interval for interval in intervals[:stop] if interval[1] > start]
+
+async def find_appointment_conflicts(db, doctor_id: int, appointment_date: str, appointment_time: str,
+                                     duration_minutes: int, exclude_id: Optional[int] = None) -> List[tuple]:
+    start = parse_clock(appointment_time)
+    if start is None:
+        raise HTTPException(status_code=400, detail="appointment_time must be HH:MM")
+    if duration_minutes is None or duration_minutes < 1:
+        raise HTTPException(status_code=400, detail="duration_minutes must be at least 1")
+    
+    placeholders = ", ".join("?" for _ in NON_BLOCKING_STATUSES)
+    cursor = await db.execute(f"""
+        SELECT id, appointment_time, duration_minutes
+        FROM appointments
+        WHERE doctor_id = ? AND appointment_date = ? AND id != ?
+          AND COALESCE(status, 'scheduled') NOT IN ({placeholders})
+        ORDER BY appointment_time, id
+    """, (doctor_id, appointment_date, exclude_id or 0, *NON_BLOCKING_STATUSES))
+    
+    intervals = []
+    for row in await cursor.fetchall():
+        booked = parse_clock(row["appointment_time"])
+        if booked is not None:
+            intervals.append((booked, booked + (row["duration_minutes"] or 30), row["id"]))
+    # Text order only matches clock order for zero-padded times
+    intervals.sort()
+    return overlapping_intervals(intervals, start, start + duration_minutes)
+
+def conflict_error(conflicts: List[tuple]) -> HTTPException:
+    slots = ", ".join(f"{format_clock(start)}-{format_clock(end)} (#{appointment_id})"
+                      for start, end, appointment_id in conflicts)
+    return HTTPException(status_code=409, detail=f"Doctor is already booked at {slots}")
+
 @api_router.post("/appointments", response_model=AppointmentResponse)
-async def create_appointment(appointment_data: AppointmentCreate, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+async def create_appointment(
+    appointment_data: AppointmentCreate,
+    allow_overlap: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    async with db_pool.writer() as db:
+        if not allow_overlap and appointment_data.status not in NON_BLOCKING_STATUSES:
+            conflicts = await find_appointment_conflicts(
+                db, appointment_data.doctor_id, appointment_data.appointment_date,
+                appointment_data.appointment_time, appointment_data.duration_minutes
+            )
+            if conflicts:
+                raise conflict_error(conflicts)
+        
         cursor = await db.execute(
             "INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, duration_minutes, status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (appointment_data.patient_id, appointment_data.doctor_id, appointment_data.appointment_date,
@@ -753,9 +2159,9 @@ async def create_appointment(appointment_data: AppointmentCreate, current_user:
              appointment_data.notes, datetime.now().isoformat())
         )
         await db.commit()
+        dashboard_cache.clear()
         appointment_id = cursor.lastrowid
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("""
             SELECT a.*, p.name as patient_name, u.full_name as doctor_name
             FROM appointments a
@@ -781,12 +2187,18 @@ async def create_appointment(appointment_data: AppointmentCreate, current_user:
 
 @api_router.get("/appointments", response_model=List[AppointmentResponse])
 async def get_appointments(
+    response: Response,
     doctor_id: Optional[int] = None,
     date: Optional[str] = None,
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         
         query = """
             SELECT a.*, p.name as patient_name, u.full_name as doctor_name
@@ -808,28 +2220,49 @@ async def get_appointments(
             query += " AND a.appointment_date = ?"
             params.append(date)
         
-        query += " ORDER BY a.appointment_date, a.appointment_time"
+        if q:
+            query += " AND (p.name LIKE ? ESCAPE '\\' OR a.notes LIKE ? ESCAPE '\\')"
+            params.extend([like_pattern(q)] * 2)
         
-        cursor = await db.execute(query, params)
-        appointments = await cursor.fetchall()
+        date_clause, date_params = date_range_filter("a.appointment_date", date_from, date_to)
+        query += date_clause
+        params.extend(date_params)
         
-        return [AppointmentResponse(
-            id=apt["id"],
-            patient_id=apt["patient_id"],
-            patient_name=apt["patient_name"],
-            doctor_id=apt["doctor_id"],
-            doctor_name=apt["doctor_name"],
-            appointment_date=apt["appointment_date"],
-            appointment_time=apt["appointment_time"],
-            duration_minutes=apt["duration_minutes"],
-            status=apt["status"],
-            notes=apt["notes"],
-            created_at=apt["created_at"]
-        ) for apt in appointments]
+        if include_total:
+            response.headers["X-Total-Count"] = str(await count_rows(db, query, params))
+        
+        query = paginate_query(query, params, ["a.appointment_date", "a.appointment_time", "a.id"], False, limit, cursor)
+        
+        db_cursor = await db.execute(query, params)
+        appointments = page_rows(await db_cursor.fetchall(), ["appointment_date", "appointment_time", "id"], limit, response)
+        
+        return appointment_encoder.response(appointments, response)
 
 @api_router.put("/appointments/{appointment_id}", response_model=AppointmentResponse)
-async def update_appointment(appointment_id: int, appointment_data: AppointmentUpdate, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+async def update_appointment(
+    appointment_id: int,
+    appointment_data: AppointmentUpdate,
+    allow_overlap: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    async with db_pool.writer() as db:
+        cursor = await db.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,))
+        current = await cursor.fetchone()
+        if not current:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        
+        # Re-check only when the booking moves, grows or is reinstated
+        changes = appointment_data.model_dump(exclude_none=True)
+        booking = {**dict(current), **changes}
+        rescheduled = bool(changes.keys() & {"appointment_date", "appointment_time", "duration_minutes", "status"})
+        if rescheduled and not allow_overlap and booking["status"] not in NON_BLOCKING_STATUSES:
+            conflicts = await find_appointment_conflicts(
+                db, booking["doctor_id"], booking["appointment_date"], booking["appointment_time"],
+                booking["duration_minutes"], exclude_id=appointment_id
+            )
+            if conflicts:
+                raise conflict_error(conflicts)
+        
         updates = []
         params = []
         
@@ -853,8 +2286,8 @@ async def update_appointment(appointment_id: int, appointment_data: AppointmentU
             params.append(appointment_id)
             await db.execute(f"UPDATE appointments SET {', '.join(updates)} WHERE id = ?", params)
             await db.commit()
+            dashboard_cache.clear()
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("""
             SELECT a.*, p.name as patient_name, u.full_name as doctor_name
             FROM appointments a
@@ -883,62 +2316,237 @@ async def delete_appointment(appointment_id: int, current_user: dict = Depends(g
     if current_user["role"] not in ["admin", "receptionist"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         await db.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
         await db.commit()
+        dashboard_cache.clear()
     
     return {"message": "Appointment deleted successfully"}
 
+# Availability search
+# Free slots are what is left of each working span once the doctor's
+# bookings are swept out of it in start order. One indexed range query loads
+# every booking in the window, so a month for all doctors stays cheap.
+WEEKDAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+MAX_AVAILABILITY_DAYS = 62
+
+def parse_working_hours(hours: str) -> List[tuple]:
+    spans = []
+    for span in hours.split(","):
+        start, _, end = span.partition("-")
+        start, end = parse_clock(start), parse_clock(end)
+        if start is None or end is None or end <= start:
+            raise ValueError(f"Invalid working hours span: {span!r}")
+        spans.append((start, end))
+    return sorted(spans)
+
+WORKING_SPANS = parse_working_hours(CLINIC_HOURS)
+WORKING_WEEKDAYS = {WEEKDAY_NAMES.index(day.strip().lower()[:3]) for day in CLINIC_WORKING_DAYS.split(",") if day.strip()}
+
+def free_windows(spans: List[tuple], busy: List[tuple]) -> List[tuple]:
+    # spans and busy are (start, end) minute pairs sorted by start; busy
+    # intervals may overlap each other and straddle span boundaries
+    free = []
+    first = 0
+    for span_start, span_end in spans:
+        while first < len(busy) and busy[first][1] <= span_start:
+            first += 1
+        cursor = span_start
+        index = first
+        while index < len(busy) and busy[index][0] < span_end:
+            if busy[index][0] > cursor:
+                free.append((cursor, busy[index][0]))
+            cursor = max(cursor, busy[index][1])
+            index += 1
+        if cursor < span_end:
+            free.append((cursor, span_end))
+    return free
+
+def window_slots(windows: List[tuple], slot_minutes: int) -> List[AvailabilitySlot]:
+    slots = []
+    for start, end in windows:
+        while start + slot_minutes <= end:
+            slots.append(AvailabilitySlot(start=format_clock(start), end=format_clock(start + slot_minutes)))
+            start += slot_minutes
+    return slots
+
+@api_router.get("/availability", response_model=List[DoctorAvailability])
+async def get_availability(
+    date_from: str,
+    date_to: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    slot_minutes: int = Query(30, ge=5, le=480),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d")
+        last_day = datetime.strptime(date_to, "%Y-%m-%d") if date_to else first_day
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    day_count = (last_day - first_day).days + 1
+    if day_count < 1:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    if day_count > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_AVAILABILITY_DAYS} days per request")
+    
+    async with db_pool.reader() as db:
+        doctor_query = "SELECT id, full_name FROM users WHERE role = 'doctor'"
+        doctor_params = []
+        if doctor_id is not None:
+            doctor_query += " AND id = ?"
+            doctor_params.append(doctor_id)
+        cursor = await db.execute(doctor_query + " ORDER BY full_name, id", doctor_params)
+        doctors = await cursor.fetchall()
+        if doctor_id is not None and not doctors:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        
+        date_clause, params = date_range_filter("appointment_date", date_from, last_day.strftime("%Y-%m-%d"))
+        placeholders = ", ".join("?" for _ in NON_BLOCKING_STATUSES)
+        query = f"""
+            SELECT doctor_id, appointment_date, appointment_time, duration_minutes
+            FROM appointments
+            WHERE COALESCE(status, 'scheduled') NOT IN ({placeholders}){date_clause}
+        """
+        params = [*NON_BLOCKING_STATUSES, *params]
+        if doctor_id is not None:
+            query += " AND doctor_id = ?"
+            params.append(doctor_id)
+        cursor = await db.execute(query, params)
+        
+        busy = {}
+        for row in await cursor.fetchall():
+            start = parse_clock(row["appointment_time"])
+            if start is not None:
+                busy.setdefault((row["doctor_id"], row["appointment_date"][:10]), []).append(
+                    (start, start + (row["duration_minutes"] or 30))
+                )
+    
+    for intervals in busy.values():
+        intervals.sort()
+    
+    days = [first_day + timedelta(days=offset) for offset in range(day_count)]
+    result = []
+    for doctor in doctors:
+        for day in days:
+            if day.weekday() not in WORKING_WEEKDAYS:
+                continue
+            date = day.strftime("%Y-%m-%d")
+            windows = free_windows(WORKING_SPANS, busy.get((doctor["id"], date), []))
+            result.append(DoctorAvailability(
+                doctor_id=doctor["id"],
+                doctor_name=doctor["full_name"],
+                date=date,
+                slots=window_slots(windows, slot_minutes)
+            ))
+    
+    return result
+
 # Visit routes
-@api_router.post("/visits", response_model=VisitResponse)
-async def create_visit(visit_data: VisitCreate, current_user: dict = Depends(require_role(["doctor", "admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+# Keeps each IN (...) list well under SQLite's bound-parameter limit
+SQL_IN_CHUNK = 500
+# Upper bound on visits posted to /visits/bulk in one request
+MAX_BULK_VISITS = 200
+
+async def fetch_visit_procedures(db, visit_ids: List[int]) -> dict:
+    procedures_by_visit = {visit_id: [] for visit_id in visit_ids}
+    for start in range(0, len(visit_ids), SQL_IN_CHUNK):
+        chunk = visit_ids[start:start + SQL_IN_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor = await db.execute(f"""
+            SELECT vp.visit_id, vp.quantity, pr.id, pr.name, pr.price_jod
+            FROM visit_procedures vp
+            JOIN procedures pr ON vp.procedure_id = pr.id
+            WHERE vp.visit_id IN ({placeholders})
+            ORDER BY vp.visit_id, vp.id
+        """, chunk)
+        for proc in await cursor.fetchall():
+            procedures_by_visit[proc["visit_id"]].append({
+                "id": proc["id"],
+                "name": proc["name"],
+                "price_jod": proc["price_jod"],
+                "quantity": proc["quantity"]
+            })
+    
+    return procedures_by_visit
+
+async def existing_ids(db, table: str, ids: List[int]) -> set:
+    found = set()
+    for start in range(0, len(ids), SQL_IN_CHUNK):
+        chunk = ids[start:start + SQL_IN_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor = await db.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk)
+        found.update(row["id"] for row in await cursor.fetchall())
+    return found
+
+def visit_procedure_lines(visit_data: VisitCreate) -> List[tuple]:
+    lines = []
+    for proc in visit_data.procedures:
+        try:
+            procedure_id = int(proc["procedure_id"])
+            quantity = int(proc.get("quantity", 1))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Each procedure needs an integer procedure_id and quantity")
+        if quantity < 1:
+            raise HTTPException(status_code=400, detail="Procedure quantity must be at least 1")
+        lines.append((procedure_id, quantity))
+    return lines
+
+async def insert_visits(db, visits: List[VisitCreate]) -> List[int]:
+    # Validates every referenced patient, doctor and procedure with one lookup
+    # per table, then writes the visits, their lines and the ledger inside the
+    # caller's transaction. Nothing is written if any reference is unknown.
+    lines_by_visit = [visit_procedure_lines(visit_data) for visit_data in visits]
+    
+    for table, label, ids in (
+        ("patients", "patient", {visit_data.patient_id for visit_data in visits}),
+        ("users", "doctor", {visit_data.doctor_id for visit_data in visits}),
+        ("procedures", "procedure", {procedure_id for lines in lines_by_visit for procedure_id, _ in lines}),
+    ):
+        missing = sorted(ids - await existing_ids(db, table, sorted(ids)))
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown {label} id(s): {', '.join(str(i) for i in missing)}"
+            )
+    
+    now = datetime.now().isoformat()
+    visit_ids = []
+    rows = []
+    for visit_data, lines in zip(visits, lines_by_visit):
         cursor = await db.execute(
             "INSERT INTO visits (patient_id, doctor_id, visit_date, status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (visit_data.patient_id, visit_data.doctor_id, datetime.now().isoformat(),
-             visit_data.status, visit_data.notes, datetime.now().isoformat())
+            (visit_data.patient_id, visit_data.doctor_id, now, visit_data.status, visit_data.notes, now)
         )
-        await db.commit()
-        visit_id = cursor.lastrowid
-        
-        # Add procedures
-        for proc in visit_data.procedures:
-            await db.execute(
-                "INSERT INTO visit_procedures (visit_id, procedure_id, quantity, created_at) VALUES (?, ?, ?, ?)",
-                (visit_id, proc["procedure_id"], proc.get("quantity", 1), datetime.now().isoformat())
-            )
-        await db.commit()
-        
-        # Fetch visit with details
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("""
-            SELECT v.*, p.name as patient_name, u.full_name as doctor_name
-            FROM visits v
-            JOIN patients p ON v.patient_id = p.id
-            JOIN users u ON v.doctor_id = u.id
-            WHERE v.id = ?
-        """, (visit_id,))
-        visit = await cursor.fetchone()
-        
-        # Fetch procedures
-        cursor = await db.execute("""
-            SELECT vp.quantity, pr.id, pr.name, pr.price_jod
-            FROM visit_procedures vp
-            JOIN procedures pr ON vp.procedure_id = pr.id
-            WHERE vp.visit_id = ?
-        """, (visit_id,))
-        procedures = await cursor.fetchall()
-        
-        procedures_list = [{
-            "id": proc["id"],
-            "name": proc["name"],
-            "price_jod": proc["price_jod"],
-            "quantity": proc["quantity"]
-        } for proc in procedures]
+        visit_ids.append(cursor.lastrowid)
+        rows.extend((cursor.lastrowid, procedure_id, quantity, now) for procedure_id, quantity in lines)
+    
+    await db.executemany(
+        "INSERT INTO visit_procedures (visit_id, procedure_id, quantity, created_at) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    await ledger_add_visits(db, visit_ids)
+    return visit_ids
+
+async def fetch_visits(db, visit_ids: List[int]) -> List[VisitResponse]:
+    placeholders = ", ".join("?" for _ in visit_ids)
+    cursor = await db.execute(f"""
+        SELECT v.*, p.name as patient_name, u.full_name as doctor_name
+        FROM visits v
+        JOIN patients p ON v.patient_id = p.id
+        JOIN users u ON v.doctor_id = u.id
+        WHERE v.id IN ({placeholders})
+    """, visit_ids)
+    visits = {visit["id"]: visit for visit in await cursor.fetchall()}
+    visit_procedures = await fetch_visit_procedures(db, visit_ids)
+    
+    result = []
+    for visit_id in visit_ids:
+        visit = visits[visit_id]
+        procedures_list = visit_procedures[visit_id]
         
         total_cost = sum(p["price_jod"] * p["quantity"] for p in procedures_list)
         
-        return VisitResponse(
+        result.append(VisitResponse(
             id=visit["id"],
             patient_id=visit["patient_id"],
             patient_name=visit["patient_name"],
@@ -950,12 +2558,47 @@ async def create_visit(visit_data: VisitCreate, current_user: dict = Depends(req
             procedures=procedures_list,
             total_cost_jod=total_cost,
             created_at=visit["created_at"]
-        )
+        ))
+    
+    return result
+
+@api_router.post("/visits", response_model=VisitResponse)
+async def create_visit(visit_data: VisitCreate, current_user: dict = Depends(require_role(["doctor", "admin"]))):
+    async with db_pool.writer() as db:
+        visit_ids = await insert_visits(db, [visit_data])
+        await db.commit()
+        dashboard_cache.clear()
+        
+        return (await fetch_visits(db, visit_ids))[0]
+
+@api_router.post("/visits/bulk", response_model=List[VisitResponse])
+async def create_visits_bulk(visits: List[VisitCreate], current_user: dict = Depends(require_role(["doctor", "admin"]))):
+    if not visits:
+        return []
+    if len(visits) > MAX_BULK_VISITS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_VISITS} visits per request")
+    
+    # All visits commit together or not at all
+    async with db_pool.writer() as db:
+        visit_ids = await insert_visits(db, visits)
+        await db.commit()
+        dashboard_cache.clear()
+        
+        return await fetch_visits(db, visit_ids)
 
 @api_router.get("/visits", response_model=List[VisitResponse])
-async def get_visits(patient_id: Optional[int] = None, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_visits(
+    response: Response,
+    patient_id: Optional[int] = None,
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    async with db_pool.reader() as db:
         
         query = """
             SELECT v.*, p.name as patient_name, u.full_name as doctor_name
@@ -970,50 +2613,35 @@ async def get_visits(patient_id: Optional[int] = None, current_user: dict = Depe
             query += " AND v.patient_id = ?"
             params.append(patient_id)
         
-        query += " ORDER BY v.visit_date DESC"
+        if q:
+            query += " AND (p.name LIKE ? ESCAPE '\\' OR v.notes LIKE ? ESCAPE '\\')"
+            params.extend([like_pattern(q)] * 2)
         
-        cursor = await db.execute(query, params)
-        visits = await cursor.fetchall()
-        
-        result = []
-        for visit in visits:
-            # Fetch procedures for this visit
-            cursor = await db.execute("""
-                SELECT vp.quantity, pr.id, pr.name, pr.price_jod
-                FROM visit_procedures vp
-                JOIN procedures pr ON vp.procedure_id = pr.id
-                WHERE vp.visit_id = ?
-            """, (visit["id"],))
-            procedures = await cursor.fetchall()
-            
-            procedures_list = [{
-                "id": proc["id"],
-                "name": proc["name"],
-                "price_jod": proc["price_jod"],
-                "quantity": proc["quantity"]
-            } for proc in procedures]
-            
-            total_cost = sum(p["price_jod"] * p["quantity"] for p in procedures_list)
-            
-            result.append(VisitResponse(
-                id=visit["id"],
-                patient_id=visit["patient_id"],
-                patient_name=visit["patient_name"],
-                doctor_id=visit["doctor_id"],
-                doctor_name=visit["doctor_name"],
-                visit_date=visit["visit_date"],
-                status=visit["status"],
-                notes=visit["notes"],
-                procedures=procedures_list,
-                total_cost_jod=total_cost,
-                created_at=visit["created_at"]
-            ))
+        date_clause, date_params = date_range_filter("v.visit_date", date_from, date_to)
+        query += date_clause
+        params.extend(date_params)
+        
+        if include_total:
+            response.headers["X-Total-Count"] = str(await count_rows(db, query, params))
+        
+        query = paginate_query(query, params, ["v.visit_date", "v.id"], True, limit, cursor)
         
-        return result
+        db_cursor = await db.execute(query, params)
+        visits = page_rows(await db_cursor.fetchall(), ["visit_date", "id"], limit, response)
+        
+        # Fetch procedure lines for every visit in one pass
+        visit_procedures = await fetch_visit_procedures(db, [visit["id"] for visit in visits])
+        
+        procedures = [visit_procedures[visit["id"]] for visit in visits]
+        return visit_encoder.response(
+            visits, response,
+            procedures=procedures,
+            total_cost_jod=[sum(p["price_jod"] * p["quantity"] for p in lines) for lines in procedures]
+        )
 
 @api_router.put("/visits/{visit_id}", response_model=VisitResponse)
 async def update_visit(visit_id: int, visit_data: VisitUpdate, current_user: dict = Depends(require_role(["doctor", "admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         updates = []
         params = []
         
@@ -1030,7 +2658,6 @@ async def update_visit(visit_id: int, visit_data: VisitUpdate, current_user: dic
             await db.commit()
         
         # Fetch updated visit
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("""
             SELECT v.*, p.name as patient_name, u.full_name as doctor_name
             FROM visits v
@@ -1041,20 +2668,7 @@ async def update_visit(visit_id: int, visit_data: VisitUpdate, current_user: dic
         visit = await cursor.fetchone()
         
         # Fetch procedures
-        cursor = await db.execute("""
-            SELECT vp.quantity, pr.id, pr.name, pr.price_jod
-            FROM visit_procedures vp
-            JOIN procedures pr ON vp.procedure_id = pr.id
-            WHERE vp.visit_id = ?
-        """, (visit_id,))
-        procedures = await cursor.fetchall()
-        
-        procedures_list = [{
-            "id": proc["id"],
-            "name": proc["name"],
-            "price_jod": proc["price_jod"],
-            "quantity": proc["quantity"]
-        } for proc in procedures]
+        procedures_list = (await fetch_visit_procedures(db, [visit_id]))[visit_id]
         
         total_cost = sum(p["price_jod"] * p["quantity"] for p in procedures_list)
         
@@ -1078,16 +2692,17 @@ async def create_payment(payment_data: PaymentCreate, current_user: dict = Depen
     if current_user["role"] not in ["receptionist", "admin"]:
         raise HTTPException(status_code=403, detail="Only receptionist and admin can record payments")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute(
             "INSERT INTO payments (patient_id, amount_jod, payment_date, recorded_by, notes, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (payment_data.patient_id, payment_data.amount_jod, datetime.now().isoformat(),
              current_user["id"], payment_data.notes, datetime.now().isoformat())
         )
-        await db.commit()
         payment_id = cursor.lastrowid
+        await ledger_add_payment(db, payment_data.patient_id, payment_data.amount_jod)
+        await db.commit()
+        dashboard_cache.clear()
         
-        db.row_factory = aiosqlite.Row
         cursor = await db.execute("""
             SELECT pm.*, p.name as patient_name, u.full_name as recorded_by_name
             FROM payments pm
@@ -1110,9 +2725,18 @@ async def create_payment(payment_data: PaymentCreate, current_user: dict = Depen
         )
 
 @api_router.get("/payments", response_model=List[PaymentResponse])
-async def get_payments(patient_id: Optional[int] = None, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_payments(
+    response: Response,
+    patient_id: Optional[int] = None,
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    async with db_pool.reader() as db:
         
         query = """
             SELECT pm.*, p.name as patient_name, u.full_name as recorded_by_name
@@ -1127,60 +2751,509 @@ async def get_payments(patient_id: Optional[int] = None, current_user: dict = De
             query += " AND pm.patient_id = ?"
             params.append(patient_id)
         
-        query += " ORDER BY pm.payment_date DESC"
+        if q:
+            query += " AND (p.name LIKE ? ESCAPE '\\' OR pm.notes LIKE ? ESCAPE '\\')"
+            params.extend([like_pattern(q)] * 2)
+        
+        date_clause, date_params = date_range_filter("pm.payment_date", date_from, date_to)
+        query += date_clause
+        params.extend(date_params)
         
+        if include_total:
+            response.headers["X-Total-Count"] = str(await count_rows(db, query, params))
+        
+        query = paginate_query(query, params, ["pm.payment_date", "pm.id"], True, limit, cursor)
+        
+        db_cursor = await db.execute(query, params)
+        payments = page_rows(await db_cursor.fetchall(), ["payment_date", "id"], limit, response)
+        
+        return payment_encoder.response(payments, response)
+
+# Data exports
+# Rows are read in batches from one reader connection, which pins a single
+# WAL snapshot for the whole export, and each batch is encoded and sent
+# before the next is fetched, so memory stays flat however large the table.
+EXPORT_BATCH_SIZE = 1000
+
+EXPORTS = {
+    "payments": {
+        "query": """
+            SELECT pm.id, pm.patient_id, p.name AS patient_name, pm.amount_jod, pm.payment_date,
+                   pm.recorded_by, u.full_name AS recorded_by_name, pm.notes, pm.created_at
+            FROM payments pm
+            JOIN patients p ON pm.patient_id = p.id
+            JOIN users u ON pm.recorded_by = u.id
+            WHERE 1=1
+        """,
+        "date_column": "pm.payment_date",
+        "order_by": "pm.payment_date, pm.id",
+    },
+    "visits": {
+        "query": """
+            SELECT v.id, v.patient_id, p.name AS patient_name, v.doctor_id, u.full_name AS doctor_name,
+                   v.visit_date, v.status, v.notes,
+                   (SELECT group_concat(pr.name || ' x' || vp.quantity, '; ')
+                    FROM visit_procedures vp JOIN procedures pr ON vp.procedure_id = pr.id
+                    WHERE vp.visit_id = v.id) AS procedures,
+                   (SELECT COALESCE(SUM(pr.price_jod * vp.quantity), 0.0)
+                    FROM visit_procedures vp JOIN procedures pr ON vp.procedure_id = pr.id
+                    WHERE vp.visit_id = v.id) AS total_cost_jod,
+                   v.created_at
+            FROM visits v
+            JOIN patients p ON v.patient_id = p.id
+            JOIN users u ON v.doctor_id = u.id
+            WHERE 1=1
+        """,
+        "date_column": "v.visit_date",
+        "order_by": "v.visit_date, v.id",
+        "doctor_column": "v.doctor_id",
+    },
+    "patients": {
+        "query": """
+            SELECT p.id, p.name, p.phone, p.email, p.date_of_birth, p.address, p.medical_history, p.notes,
+                   ROUND(COALESCE(l.balance_jod, 0.0), 2) AS balance_jod, p.created_at
+            FROM patients p
+            LEFT JOIN patient_ledger l ON l.patient_id = p.id
+            WHERE 1=1
+        """,
+        "date_column": "p.created_at",
+        "order_by": "p.created_at, p.id",
+    },
+}
+
+def encode_csv_rows(rows: list, header: Optional[List[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(tuple(row) for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+def encode_ndjson_rows(rows: list) -> bytes:
+    return "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+async def stream_export(query: str, params: list, export_format: str):
+    # Paced by the client's download, so a few slow exports would otherwise
+    # tie up every pooled reader and stall the read routes
+    async with db_pool.dedicated_reader() as db:
         cursor = await db.execute(query, params)
-        payments = await cursor.fetchall()
-        
-        return [PaymentResponse(
-            id=pm["id"],
-            patient_id=pm["patient_id"],
-            patient_name=pm["patient_name"],
-            amount_jod=pm["amount_jod"],
-            payment_date=pm["payment_date"],
-            recorded_by=pm["recorded_by"],
-            recorded_by_name=pm["recorded_by_name"],
-            notes=pm["notes"],
-            created_at=pm["created_at"]
-        ) for pm in payments]
+        if export_format == "csv":
+            # The byte order mark lets spreadsheet apps detect UTF-8 (Arabic names)
+            yield "\ufeff".encode("utf-8") + encode_csv_rows([], [column[0] for column in cursor.description])
+        while True:
+            rows = await cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield encode_csv_rows(rows) if export_format == "csv" else encode_ndjson_rows(rows)
+        await cursor.close()
+
+@api_router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    export_format: str = Query("csv", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {dataset}")
+    if export_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    
+    query = spec["query"]
+    date_clause, params = date_range_filter(spec["date_column"], date_from, date_to)
+    query += date_clause
+    if doctor_id is not None:
+        if "doctor_column" not in spec:
+            raise HTTPException(status_code=400, detail=f"The {dataset} export cannot be filtered by doctor")
+        query += f" AND {spec['doctor_column']} = ?"
+        params.append(doctor_id)
+    query += f" ORDER BY {spec['order_by']}"
+    
+    media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+    filename = f"{dataset}-{datetime.now().strftime('%Y%m%d')}.{export_format}"
+    return StreamingResponse(
+        stream_export(query, params, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # Medical image routes
+# Uploads are streamed to a temp file in the patient's directory on a worker
+# thread, hashed as they are written, then renamed to <sha256>.<ext>. Identical
+# scans of the same patient therefore share one file on disk. The rename and
+# the row insert happen under the writer lock, and delete_image checks for
+# other references and unlinks under it too, so a duplicate upload can never
+# point at a file the delete of its last sibling has just removed.
+def upload_extension(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lstrip(".").lower()
+    if not suffix or len(suffix) > 10 or not re.fullmatch(r"[a-z0-9]+", suffix):
+        return "bin"
+    return suffix
+
+def store_upload(source, patient_dir: Path):
+    patient_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = patient_dir / f".upload-{secrets.token_hex(8)}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit"
+                    )
+                digest.update(chunk)
+                buffer.write(chunk)
+        return temp_path, digest.hexdigest(), size
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+def place_upload(temp_path: Path, file_path: Path) -> bool:
+    # Returns whether the same content was already stored
+    if file_path.exists():
+        temp_path.unlink()
+        return True
+    os.replace(temp_path, file_path)
+    return False
+
+# Derivative cache
+# Downscaled JPEG copies of uploads, keyed by content hash so deduplicated
+# scans share them. They are rendered on a worker thread, either after upload
+# or on first request, and the least recently served ones are evicted once
+# the directory grows past DERIVATIVES_MAX_BYTES.
+class DerivativeCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks = {}
+        # File name -> size, least recently served first. Seeded from the
+        # directory once at startup and kept current from then on, so neither
+        # serving nor eviction has to list or stat the directory. Discards and
+        # sweeps run on worker threads, hence the lock.
+        self._entries = OrderedDict()
+        self._total = 0
+        self._mutex = threading.Lock()
+
+    @staticmethod
+    def key_for(image) -> str:
+        return image["sha256"] or f"image-{image['id']}"
+
+    def path_for(self, image, size: str) -> Path:
+        return self.root / f"{self.key_for(image)}_{size}.jpg"
+
+    def seed(self):
+        entries = []
+        for path in (self.root.glob("*.jpg") if self.root.exists() else []):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        with self._mutex:
+            self._entries.clear()
+            self._total = 0
+            for _, name, size in sorted(entries):
+                self._entries[name] = size
+                self._total += size
+
+    async def get(self, image, size: str) -> Optional[Path]:
+        target = self.path_for(image, size)
+        with self._mutex:
+            if target.name in self._entries:
+                self._entries.move_to_end(target.name)
+                return target
+        
+        lock = self._locks.setdefault(target.name, asyncio.Lock())
+        async with lock:
+            try:
+                if not target.exists():
+                    source = UPLOADS_DIR / image["image_path"]
+                    rendered = await asyncio.to_thread(self._render, source, target, DERIVATIVE_SIZES[size])
+                    if not rendered:
+                        return None
+                await asyncio.to_thread(self._add, target)
+            finally:
+                self._locks.pop(target.name, None)
+        return target
+
+    async def warm(self, image):
+        for size in DERIVATIVE_SIZES:
+            await self.get(image, size)
+
+    def discard(self, image):
+        for size in DERIVATIVE_SIZES:
+            self.remove(self.path_for(image, size))
+
+    def remove(self, path: Path):
+        with self._mutex:
+            self._total -= self._entries.pop(path.name, 0)
+        path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _render(source: Path, target: Path, max_px: int) -> bool:
+        # Files Pillow cannot decode (DICOM, PDF, ...) have no derivatives and
+        # callers fall back to the original
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(f".{target.stem}-{secrets.token_hex(4)}.tmp")
+        try:
+            with Image.open(source) as img:
+                img.draft(None, (max_px, max_px))
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((max_px, max_px))
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                img.save(temp_path, "JPEG", quality=85, optimize=True)
+            os.replace(temp_path, target)
+            return True
+        except (UnidentifiedImageError, OSError, ValueError):
+            return False
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def _add(self, target: Path):
+        # Records a new derivative, then evicts the least recently served
+        # others until the total is back within max_bytes
+        size = target.stat().st_size
+        evicted = []
+        with self._mutex:
+            self._total += size - self._entries.pop(target.name, 0)
+            self._entries[target.name] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                name, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(name)
+        for name in evicted:
+            (self.root / name).unlink(missing_ok=True)
+
+derivative_cache = DerivativeCache(DERIVATIVES_DIR, DERIVATIVES_MAX_BYTES)
+
+# Storage cleanup
+# Deleting a patient removes their upload directory once the delete has
+# committed. A periodic sweep removes whatever else nothing points at:
+# directories of deleted patients, unreferenced uploads, abandoned temp
+# files and derivatives of deleted images. Upload files younger than
+# ORPHAN_GRACE_SECONDS are left alone, since their row may not be committed
+# yet.
+async def referenced_hashes(db, hashes: List[str]) -> set:
+    found = set()
+    hashes = sorted(set(hashes))
+    for start in range(0, len(hashes), SQL_IN_CHUNK):
+        chunk = hashes[start:start + SQL_IN_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor = await db.execute(
+            f"SELECT DISTINCT sha256 FROM medical_images WHERE sha256 IN ({placeholders})", chunk
+        )
+        found.update(row["sha256"] for row in await cursor.fetchall())
+    return found
+
+async def remove_patient_files(patient_id: int, images: list):
+    await asyncio.to_thread(shutil.rmtree, UPLOADS_DIR / str(patient_id), True)
+    for image in images:
+        await asyncio.to_thread(derivative_cache.discard, image)
+
+def sweep_orphan_files(patient_ids: set, max_patient_id: int, image_paths: set,
+                       derivative_keys: set, grace_seconds: float) -> dict:
+    cutoff = time.time() - grace_seconds
+    removed = {"patient_dirs": 0, "files": 0, "derivatives": 0}
+    
+    for patient_dir in (UPLOADS_DIR.iterdir() if UPLOADS_DIR.exists() else []):
+        if not patient_dir.is_dir() or not patient_dir.name.isdigit():
+            continue
+        patient_id = int(patient_dir.name)
+        # Ids are never reused, so a missing id up to the snapshot's highest
+        # belongs to a deleted patient rather than one created since
+        if patient_id not in patient_ids:
+            if patient_id <= max_patient_id:
+                shutil.rmtree(patient_dir, ignore_errors=True)
+                removed["patient_dirs"] += 1
+            continue
+        for path in patient_dir.iterdir():
+            if f"{patient_dir.name}/{path.name}" in image_paths or not path.is_file():
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            path.unlink(missing_ok=True)
+            removed["files"] += 1
+    
+    for path in (derivative_cache.root.glob("*.jpg") if derivative_cache.root.exists() else []):
+        if path.name.rsplit("_", 1)[0] not in derivative_keys:
+            derivative_cache.remove(path)
+            removed["derivatives"] += 1
+    
+    return removed
+
+async def run_orphan_sweep() -> dict:
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT id FROM patients")
+        patient_ids = {row["id"] for row in await cursor.fetchall()}
+        cursor = await db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'patients'")
+        row = await cursor.fetchone()
+        cursor = await db.execute("SELECT id, image_path, sha256 FROM medical_images")
+        images = await cursor.fetchall()
+    
+    image_paths = {image["image_path"] for image in images}
+    derivative_keys = {derivative_cache.key_for(image) for image in images}
+    removed = await asyncio.to_thread(
+        sweep_orphan_files, patient_ids, row["seq"] if row else 0, image_paths, derivative_keys, ORPHAN_GRACE_SECONDS
+    )
+    if any(removed.values()):
+        logger.info("Orphan sweep removed %s", removed)
+    return removed
+
+async def orphan_sweeper():
+    while True:
+        await asyncio.sleep(ORPHAN_SWEEP_INTERVAL_SECONDS)
+        try:
+            await run_orphan_sweep()
+        except Exception:
+            logger.exception("Orphan file sweep failed")
+
+orphan_sweeper_task: Optional[asyncio.Task] = None
+
+# Image HTTP caching
+# The bytes behind an image id never change, so every response carries a
+# strong ETag built from the content hash (or the original's mtime and size
+# for uploads that predate hashing) and may be kept in the browser's private
+# cache. Revalidation answers 304 and single byte ranges answer 206.
+def image_etag(image, size: Optional[str], stat_result: os.stat_result) -> str:
+    tag = image["sha256"] or f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+    if size is not None:
+        tag = f"{tag}-{size}"
+    return f'"{tag}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def parse_byte_range(range_header: Optional[str], file_size: int) -> Optional[tuple]:
+    # Returns the inclusive (start, end) of a single byte range, or None to
+    # send the whole file. Malformed and multi-range headers are ignored.
+    if not range_header:
+        return None
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", range_header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(file_size - int(last), 0), file_size - 1
+        satisfiable = int(last) > 0 and file_size > 0
+    else:
+        start = int(first)
+        end = min(int(last), file_size - 1) if last else file_size - 1
+        if last and int(last) < start:
+            return None
+        satisfiable = start < file_size
+    if not satisfiable:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    return start, end
+
+def read_file_range(path: Path, start: int, end: int):
+    with open(path, "rb") as source:
+        source.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = source.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def image_file_response(request: Request, path: Path, stat_result: os.stat_result, media_type: str, etag: str):
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={IMAGE_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    # A stale If-Range means the client's partial copy is outdated
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_byte_range(request.headers.get("range"), stat_result.st_size)
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        read_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers
+    )
+
 @api_router.post("/images/upload")
 async def upload_image(
+    background_tasks: BackgroundTasks,
     patient_id: int = Form(...),
     image_type: str = Form(...),
     description: str = Form(None),
     file: UploadFile = File(...),
     current_user: dict = Depends(require_role(["doctor", "admin"]))
 ):
-    # Create patient directory
     patient_dir = UPLOADS_DIR / str(patient_id)
-    patient_dir.mkdir(exist_ok=True)
-    
-    # Save file
-    file_extension = file.filename.split(".")[-1]
-    file_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_extension}"
-    file_path = patient_dir / file_name
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    temp_path, sha256, size = await asyncio.to_thread(store_upload, file.file, patient_dir)
+    file_name = f"{sha256}.{upload_extension(file.filename)}"
     
     # Save to database
     relative_path = f"{patient_id}/{file_name}"
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "INSERT INTO medical_images (patient_id, uploaded_by, image_path, image_type, description, upload_date) VALUES (?, ?, ?, ?, ?, ?)",
-            (patient_id, current_user["id"], relative_path, image_type, description, datetime.now().isoformat())
-        )
-        await db.commit()
-        image_id = cursor.lastrowid
+    try:
+        async with db_pool.writer() as db:
+            duplicate = await asyncio.to_thread(place_upload, temp_path, patient_dir / file_name)
+            cursor = await db.execute(
+                "INSERT INTO medical_images (patient_id, uploaded_by, image_path, image_type, description, upload_date, sha256, size_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (patient_id, current_user["id"], relative_path, image_type, description, datetime.now().isoformat(), sha256, size)
+            )
+            await db.commit()
+            image_id = cursor.lastrowid
+    finally:
+        # Only left behind if the upload failed before it was placed
+        temp_path.unlink(missing_ok=True)
     
-    return {"id": image_id, "image_path": relative_path}
+    background_tasks.add_task(
+        derivative_cache.warm,
+        {"id": image_id, "image_path": relative_path, "sha256": sha256}
+    )
+    
+    return {
+        "id": image_id,
+        "image_path": relative_path,
+        "sha256": sha256,
+        "size_bytes": size,
+        "duplicate": duplicate
+    }
 
 @api_router.get("/images/{image_id}")
-async def get_image(image_id: int, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_image(
+    request: Request,
+    image_id: int,
+    size: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if size is not None and size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(DERIVATIVE_SIZES)}")
+    
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM medical_images WHERE id = ?", (image_id,))
         image = await cursor.fetchone()
         
@@ -1188,15 +3261,30 @@ async def get_image(image_id: int, current_user: dict = Depends(get_current_user
             raise HTTPException(status_code=404, detail="Image not found")
         
         file_path = UPLOADS_DIR / image["image_path"]
-        if not file_path.exists():
+        try:
+            file_stat = file_path.stat()
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Image file not found")
-        
-        return FileResponse(file_path)
+    
+    if size is not None:
+        etag = image_etag(image, size, file_stat)
+        # Revalidating a derivative the browser already holds skips the cache
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return image_file_response(request, file_path, file_stat, "image/jpeg", etag)
+        derivative = await derivative_cache.get(image, size)
+        if derivative is not None:
+            try:
+                return image_file_response(request, derivative, derivative.stat(), "image/jpeg", etag)
+            except FileNotFoundError:
+                # Evicted between render and send; serve the original instead
+                pass
+    
+    media_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+    return image_file_response(request, file_path, file_stat, media_type, image_etag(image, None, file_stat))
 
 @api_router.get("/images/patient/{patient_id}", response_model=List[ImageResponse])
 async def get_patient_images(patient_id: int, current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT mi.*, p.name as patient_name, u.full_name as uploaded_by_name
             FROM medical_images mi
@@ -1207,66 +3295,536 @@ async def get_patient_images(patient_id: int, current_user: dict = Depends(get_c
         """, (patient_id,))
         images = await cursor.fetchall()
         
-        return [ImageResponse(
-            id=img["id"],
-            patient_id=img["patient_id"],
-            patient_name=img["patient_name"],
-            uploaded_by=img["uploaded_by"],
-            uploaded_by_name=img["uploaded_by_name"],
-            image_path=img["image_path"],
-            image_type=img["image_type"],
-            description=img["description"],
-            upload_date=img["upload_date"]
-        ) for img in images]
+        return image_encoder.response(images)
 
 @api_router.delete("/images/{image_id}")
 async def delete_image(image_id: int, current_user: dict = Depends(require_role(["doctor", "admin"]))):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.writer() as db:
         cursor = await db.execute("SELECT * FROM medical_images WHERE id = ?", (image_id,))
         image = await cursor.fetchone()
         
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
         
-        # Delete file
-        file_path = UPLOADS_DIR / image["image_path"]
-        if file_path.exists():
-            file_path.unlink()
-        
         # Delete from database
         await db.execute("DELETE FROM medical_images WHERE id = ?", (image_id,))
         await db.commit()
+        
+        # Deduplicated uploads share a file, so keep it while others point at it
+        cursor = await db.execute(
+            "SELECT COUNT(*) FROM medical_images WHERE image_path = ?", (image["image_path"],)
+        )
+        still_referenced = (await cursor.fetchone())[0]
+        
+        # Delete file and its derivatives before an upload of the same scan
+        # can take the lock and decide it is a duplicate
+        if not still_referenced:
+            file_path = UPLOADS_DIR / image["image_path"]
+            await asyncio.to_thread(file_path.unlink, missing_ok=True)
+            await asyncio.to_thread(derivative_cache.discard, image)
     
     return {"message": "Image deleted successfully"}
 
+# Upload size limits
+# FastAPI parses and spools a whole multipart body before the route runs, so
+# the size checks in store_upload and save_import_upload alone would still
+# receive and store an oversized upload in full. This middleware answers 413
+# for a declared Content-Length over the route's limit without reading the
+# body, and cuts off bodies sent without one once they pass it.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def upload_body_limit(path: str) -> Optional[tuple]:
+    # (largest body accepted, 413 detail) for the upload routes
+    if path == "/api/images/upload":
+        return MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES, f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit"
+    if path == "/api/patients/import":
+        return MAX_IMPORT_BYTES + MULTIPART_OVERHEAD_BYTES, f"File exceeds the {MAX_IMPORT_BYTES} byte import limit"
+    return None
+
+class UploadLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = upload_body_limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes, detail = limit
+        declared = Headers(scope=scope).get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+            response = Response(
+                json.dumps({"detail": detail}), status_code=413, media_type="application/json",
+                headers={"Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised while the route parses the body, which re-raises
+                    # HTTPException as it is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Response compression
+# List responses and exports are mostly repeated keys and digits, which brotli
+# and gzip shrink five- to tenfold. Only text-like media types are compressed:
+# the JPEG and PNG files get_image serves are compressed already, and partial
+# (206) responses must keep the byte offsets of the file on disk.
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+}
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    # Picks the coding with the highest q-value; ties go to brotli, the
+    # smaller of the two. "*" stands for any coding not listed by name.
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        name, _, value = params.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    default = weights.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(offered, key=lambda coding: weights.get(coding, default))
+    return best if weights.get(best, default) > 0 else None
+
+class ResponseCompressor:
+    __slots__ = ("_compress", "_finish")
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress, self._finish = compressor.compress, compressor.flush
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        compressed = self._compress(data) if data else b""
+        return compressed + self._finish() if final else compressed
+
+class CompressionMiddleware:
+    """Compresses text-like responses for clients that accept brotli or gzip.
+
+    Bodies below minimum_size, media types that are not text-like, partial
+    content and responses that already set a Content-Encoding are passed
+    through untouched. Streamed responses such as the exports are compressed
+    chunk by chunk as they are sent.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        compressor = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows how large it is
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=list(start_message["headers"]))
+                eligible = (
+                    start_message["status"] not in (204, 206, 304)
+                    and "content-encoding" not in headers
+                    and "content-range" not in headers
+                    and compressible(headers.get("content-type", ""))
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if eligible:
+                    headers.add_vary_header("Accept-Encoding")
+                if eligible and encoding is not None:
+                    compressor = ResponseCompressor(encoding)
+                    body = compressor.compress(body, final=not more_body)
+                    headers["Content-Encoding"] = encoding
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(body))
+                await send({**start_message, "headers": headers.raw})
+                start_message = None
+            elif compressor is not None:
+                body = compressor.compress(body, final=not more_body)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+def metric_labels(names, values) -> str:
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for value in values
+    )
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class RequestMetrics:
+    """Per-route HTTP and database counters rendered in Prometheus text format.
+
+    Routes are labelled by their template ("/api/patients/{patient_id}") so
+    label cardinality stays bounded by the route table.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.responses = Counter()
+        self.latency = {}
+        self.statements = {}
+        self.db_statements = Counter()
+        self.db_seconds = Counter()
+
+    def observe(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        key = (method, route)
+        self.responses[(method, route, status)] += 1
+        if key not in self.latency:
+            self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.statements[key] = Histogram(STATEMENT_BUCKETS)
+        self.latency[key].observe(elapsed)
+        self.statements[key].observe(stats.statements)
+        self.db_statements[key] += stats.statements
+        self.db_seconds[key] += stats.db_seconds
+
+    def render(self) -> str:
+        route_labels = ("method", "route")
+        lines = [
+            "# HELP clinic_http_requests_in_flight Requests currently being served.",
+            "# TYPE clinic_http_requests_in_flight gauge",
+            f"clinic_http_requests_in_flight {self.in_flight}",
+            "# HELP clinic_http_requests_total Responses by route and status code.",
+            "# TYPE clinic_http_requests_total counter",
+        ]
+        for key, count in sorted(self.responses.items()):
+            lines.append(f"clinic_http_requests_total{{{metric_labels(route_labels + ('status',), key)}}} {count}")
+        lines += [
+            "# HELP clinic_http_request_duration_seconds Time until the last response byte was sent.",
+            "# TYPE clinic_http_request_duration_seconds histogram",
+        ]
+        for key in sorted(self.latency):
+            lines += self.latency[key].render("clinic_http_request_duration_seconds", metric_labels(route_labels, key))
+        lines += [
+            "# HELP clinic_db_statements_per_request SQL statements executed per request.",
+            "# TYPE clinic_db_statements_per_request histogram",
+        ]
+        for key in sorted(self.statements):
+            lines += self.statements[key].render("clinic_db_statements_per_request", metric_labels(route_labels, key))
+        lines += [
+            "# HELP clinic_db_statements_total SQL statements executed while serving requests.",
+            "# TYPE clinic_db_statements_total counter",
+        ]
+        for key in sorted(self.db_statements):
+            lines.append(f"clinic_db_statements_total{{{metric_labels(route_labels, key)}}} {self.db_statements[key]}")
+        lines += [
+            "# HELP clinic_db_seconds_total Time spent executing and fetching SQL while serving requests.",
+            "# TYPE clinic_db_seconds_total counter",
+        ]
+        for key in sorted(self.db_seconds):
+            lines.append(f"clinic_db_seconds_total{{{metric_labels(route_labels, key)}}} {self.db_seconds[key]}")
+        lines += [
+            "# HELP clinic_db_pool_idle_readers Reader connections waiting in the pool.",
+            "# TYPE clinic_db_pool_idle_readers gauge",
+            f"clinic_db_pool_idle_readers {db_pool._readers.qsize() if db_pool._readers is not None else 0}",
+            "# HELP clinic_password_hash_pending Password hash or verify calls queued or running.",
+            "# TYPE clinic_password_hash_pending gauge",
+            f"clinic_password_hash_pending {password_hasher.pending}",
+        ]
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts the SQL it runs.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses are timed
+    to their last byte and background tasks, which run after it, are left out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                route = scope.get("route")
+                request_metrics.observe(
+                    scope["method"], route.path if route is not None else "unmatched",
+                    status, time.perf_counter() - started, stats
+                )
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+            await send(message)
+
+        request_metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_metrics.in_flight -= 1
+            record()
+            current_request_stats.reset(token)
+
+async def require_metrics_access(request: Request):
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and secrets.compare_digest(token, METRICS_TOKEN):
+            return
+    current_user = await get_current_user(request)
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+@api_router.get("/metrics", dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    return Response(request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# SQL profiler (Admin only)
+@api_router.get("/admin/sql-profile")
+async def get_sql_profile(
+    limit: int = Query(25, ge=1, le=500),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    return {
+        "enabled": sql_profiler.enabled,
+        "slow_query_ms": sql_profiler.slow_seconds * 1000,
+        "since": sql_profiler.since,
+        "statements": sql_profiler.top(limit),
+    }
+
+@api_router.delete("/admin/sql-profile")
+async def reset_sql_profile(current_user: dict = Depends(require_role(["admin"]))):
+    sql_profiler.reset()
+    return {"message": "SQL profile reset"}
+
+# Storage maintenance (Admin only)
+@api_router.post("/admin/storage/sweep")
+async def sweep_storage(current_user: dict = Depends(require_role(["admin"]))):
+    return await run_orphan_sweep()
+
+# Ledger maintenance (Admin only)
+@api_router.post("/admin/ledger/rebuild")
+async def rebuild_ledger(current_user: dict = Depends(require_role(["admin"]))):
+    async with db_pool.writer() as db:
+        rebuilt = await rebuild_patient_ledger(db)
+        await db.commit()
+        dashboard_cache.clear()
+    
+    return {"message": "Ledger rebuilt successfully", "patients": rebuilt}
+
+@api_router.get("/admin/ledger/verify")
+async def verify_ledger(current_user: dict = Depends(require_role(["admin"]))):
+    async with db_pool.reader() as db:
+        mismatches = await verify_patient_ledger(db)
+    
+    return {"ok": not mismatches, "mismatches": mismatches}
+
+# Dashboard statistics (Admin only)
+@api_router.get("/stats/dashboard", response_model=DashboardStatsResponse)
+async def get_dashboard_stats(date: Optional[str] = None, current_user: dict = Depends(require_role(["admin"]))):
+    day = date or datetime.now().strftime("%Y-%m-%d")
+    cached = dashboard_cache.get(day)
+    if cached is not None:
+        return cached
+    
+    visit_clause, visit_params = date_range_filter("v.visit_date", day, day)
+    payment_clause, payment_params = date_range_filter("payment_date", day, day)
+    async with db_pool.reader() as db:
+        cursor = await db.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM patients) as patients,
+                (SELECT COUNT(*) FROM appointments) as appointments,
+                (SELECT COUNT(*) FROM procedures) as procedures,
+                (SELECT COUNT(*) FROM users) as users,
+                (SELECT COALESCE(SUM(billed_jod), 0.0) FROM patient_ledger) as billed_jod,
+                (SELECT COALESCE(SUM(paid_jod), 0.0) FROM patient_ledger) as paid_jod
+        """)
+        totals = await cursor.fetchone()
+        
+        cursor = await db.execute(f"""
+            SELECT COALESCE(SUM(p.price_jod * vp.quantity), 0.0)
+            FROM visits v
+            JOIN visit_procedures vp ON v.id = vp.visit_id
+            JOIN procedures p ON vp.procedure_id = p.id
+            WHERE 1=1 {visit_clause}
+        """, visit_params)
+        billed_today = (await cursor.fetchone())[0]
+        
+        cursor = await db.execute(f"""
+            SELECT COALESCE(SUM(amount_jod), 0.0)
+            FROM payments
+            WHERE 1=1 {payment_clause}
+        """, payment_params)
+        paid_today = (await cursor.fetchone())[0]
+        
+        appointment_query = """
+            SELECT a.*, p.name as patient_name, u.full_name as doctor_name
+            FROM appointments a
+            JOIN patients p ON a.patient_id = p.id
+            JOIN users u ON a.doctor_id = u.id
+        """
+        cursor = await db.execute(
+            appointment_query + " WHERE a.appointment_date = ? ORDER BY a.appointment_time, a.id",
+            (day,)
+        )
+        today_appointments = await cursor.fetchall()
+        
+        cursor = await db.execute(
+            appointment_query + " ORDER BY a.appointment_date, a.appointment_time, a.id LIMIT 5"
+        )
+        recent_appointments = await cursor.fetchall()
+    
+    def to_response(apt):
+        return AppointmentResponse(
+            id=apt["id"],
+            patient_id=apt["patient_id"],
+            patient_name=apt["patient_name"],
+            doctor_id=apt["doctor_id"],
+            doctor_name=apt["doctor_name"],
+            appointment_date=apt["appointment_date"],
+            appointment_time=apt["appointment_time"],
+            duration_minutes=apt["duration_minutes"],
+            status=apt["status"],
+            notes=apt["notes"],
+            created_at=apt["created_at"]
+        )
+    
+    stats = DashboardStatsResponse(
+        date=day,
+        patients=totals["patients"],
+        appointments=totals["appointments"],
+        today_appointment_count=len(today_appointments),
+        procedures=totals["procedures"],
+        users=totals["users"],
+        today_appointments=[to_response(apt) for apt in today_appointments],
+        recent_appointments=[to_response(apt) for apt in recent_appointments],
+        billed_jod=round(totals["billed_jod"], 2),
+        paid_jod=round(totals["paid_jod"], 2),
+        outstanding_jod=round(totals["billed_jod"] - totals["paid_jod"], 2),
+        billed_today_jod=round(billed_today, 2),
+        paid_today_jod=round(paid_today, 2),
+        generated_at=datetime.now().isoformat()
+    )
+    dashboard_cache.set(day, stats)
+    
+    return stats
+
+# Cache statistics (Admin only)
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(require_role(["admin"]))):
+    return {
+        "users": user_cache.stats(),
+        "dashboard": dashboard_cache.stats()
+    }
+
 # Get doctors list
 @api_router.get("/doctors", response_model=List[UserResponse])
 async def get_doctors(current_user: dict = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM users WHERE role = 'doctor' ORDER BY full_name")
         doctors = await cursor.fetchall()
         
-        return [UserResponse(
-            id=doc["id"],
-            username=doc["username"],
-            full_name=doc["full_name"],
-            role=doc["role"],
-            session_duration_hours=doc["session_duration_hours"],
-            is_first_login=bool(doc["is_first_login"]),
-            created_at=doc["created_at"]
-        ) for doc in doctors]
+        return user_encoder.response(doctors)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so its 413s still carry the CORS and session headers
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 app.add_middleware(
@@ -1275,6 +3833,11 @@ app.add_middleware(
     max_age=None
 )
 
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latency covers compression and the session and CORS layers too
+app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -1283,9 +3846,22 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    global orphan_sweeper_task
+    await db_pool.open()
     await init_db()
-    logger.info("Database initialized")
+    logger.info("Database initialized (pool: 1 writer, %d readers)", db_pool.size)
+    await load_patient_index()
+    await asyncio.to_thread(derivative_cache.seed)
+    if ORPHAN_SWEEP_INTERVAL_SECONDS > 0:
+        orphan_sweeper_task = asyncio.create_task(orphan_sweeper())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if orphan_sweeper_task is not None:
+        orphan_sweeper_task.cancel()
+    for job in import_jobs.values():
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+    await db_pool.close()
+    password_hasher.shutdown()
     logger.info("Application shutting down")
@@ -0,0 +1,610 @@
+"""Throughput and p50/p95/p99 latency of every /api route on synthetic data.
+
+For each scale, builds a clinic with datagen.populate(), starts the app
+in-process and drives each route through httpx's ASGI transport: a few
+warm-up calls, then --requests timed calls one after another. Ids, search
+terms and dates are drawn from the generated data with a fixed seed.
+Routes that delete or consume something (DELETE /patients/{id}, logout,
+...) create their target first, and that setup is not timed. The SQL
+statements each route runs come from the metrics middleware.
+
+Results are written as JSON. With --baseline, the run is compared to an
+earlier results file and the script exits non-zero when a route's p95
+latency or statement count regressed, so it can gate a deployment. Run
+the baseline on the same machine: absolute timings do not transfer.
+
+Each scale runs in its own process, so caches and the typeahead index
+start cold for every dataset.
+
+Usage: python benchmarks/bench_api.py [--scale NAME ...] [--requests N] [--warmup N]
+           [--route SUBSTRING] [--output FILE] [--baseline FILE] [--tolerance FRACTION]
+BCRYPT_ROUNDS defaults to 4 here so login and user routes stay comparable
+with the rest; set it to time production hashing.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_api_")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "clinic.db")
+os.environ["UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["ORPHAN_SWEEP_INTERVAL_SECONDS"] = "0"
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import datagen  # noqa: E402
+import server  # noqa: E402
+
+ADMIN = {"username": "admin", "password": "admin"}
+STAFF = {"username": "bench_reception_1", "password": datagen.PASSWORD}
+DEFAULT_SCALES = ["small", "medium"]
+RESULTS_DIR = BENCH_DIR / "results"
+# Latency changes below this are noise at sub-millisecond timings
+NOISE_FLOOR_MS = 1.0
+
+
+class Scenario(NamedTuple):
+    method: str
+    path: str
+    status: int
+    prepare: object
+
+
+SCENARIOS = []
+
+
+def scenario(method, path, status=200):
+    def register(prepare):
+        SCENARIOS.append(Scenario(method, path, status, prepare))
+        return prepare
+    return register
+
+
+class Bench:
+    def __init__(self, admin, staff, seed):
+        self.admin = admin
+        self.staff = staff
+        self.rng = random.Random(seed)
+        self.counter = itertools.count(1)
+        self.import_job = None
+        self.scan = png_bytes()
+        conn = sqlite3.connect(server.DB_PATH)
+        try:
+            def column(sql):
+                return [row[0] for row in conn.execute(sql)]
+
+            self.patients = column("SELECT id FROM patients")
+            self.doctors = column("SELECT id FROM users WHERE role = 'doctor'")
+            self.receptionists = column("SELECT id FROM users WHERE username LIKE 'bench_reception_%'")
+            self.procedures = conn.execute("SELECT id, name, price_jod FROM procedures").fetchall()
+            self.visits = column("SELECT id FROM visits")
+            self.appointments = column("SELECT id FROM appointments")
+            self.images = column("SELECT id FROM medical_images")
+            self.names = sorted({word for name in column("SELECT name FROM patients") for word in name.split()})
+        finally:
+            conn.close()
+
+    def pick(self, values):
+        return self.rng.choice(values)
+
+    def unique(self, prefix):
+        return f"{prefix} {next(self.counter)}"
+
+    def day(self, spread=30):
+        offset = self.rng.randrange(-spread, spread)
+        return (datagen.REFERENCE_DATE + timedelta(days=offset)).isoformat()
+
+    def patient_body(self):
+        return {"name": self.unique("Bench Patient"), "phone": f"079{self.rng.randrange(10 ** 7):07d}"}
+
+    def appointment_body(self):
+        return {
+            "patient_id": self.pick(self.patients), "doctor_id": self.pick(self.doctors),
+            "appointment_date": self.day(), "appointment_time": self.pick(datagen.SLOT_TIMES),
+        }
+
+    def visit_body(self):
+        return {
+            "patient_id": self.pick(self.patients), "doctor_id": self.pick(self.doctors),
+            "procedures": [{"procedure_id": self.pick(self.procedures)[0], "quantity": 1}],
+        }
+
+    def upload(self):
+        return {
+            "data": {"patient_id": self.pick(self.patients), "image_type": "xray"},
+            "files": {"file": ("scan.png", self.scan, "image/png")},
+        }
+
+    async def create(self, path, **kwargs):
+        response = await self.admin.post(path, **kwargs)
+        assert response.status_code in (200, 202), f"setup POST {path}: {response.status_code} {response.text}"
+        return response.json()
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (40, 80, 120)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def import_csv(bench, rows=20):
+    lines = ["name,phone,email"] + [
+        f"{bench.unique('Imported Patient')},078{bench.rng.randrange(10 ** 7):07d}," for _ in range(rows)
+    ]
+    return {"files": {"file": ("patients.csv", "\n".join(lines).encode("utf-8"), "text/csv")}}
+
+
+# Auth
+@scenario("POST", "/auth/login")
+async def login(bench):
+    return {"url": "/api/auth/login", "json": STAFF, "client": bench.staff}
+
+
+@scenario("POST", "/auth/change-password")
+async def change_password(bench):
+    return {"url": "/api/auth/change-password", "json": {"new_password": STAFF["password"]}, "client": bench.staff}
+
+
+@scenario("POST", "/auth/logout")
+async def logout(bench):
+    await bench.staff.post("/api/auth/login", json=STAFF)
+    return {"url": "/api/auth/logout", "client": bench.staff}
+
+
+@scenario("GET", "/auth/me")
+async def me(bench):
+    return {"url": "/api/auth/me"}
+
+
+# Users
+@scenario("POST", "/users")
+async def create_user(bench):
+    return {"url": "/api/users", "json": {
+        "username": bench.unique("bench_user").replace(" ", "_"), "password": "bench",
+        "full_name": "Bench User", "role": "receptionist",
+    }}
+
+
+@scenario("GET", "/users")
+async def list_users(bench):
+    return {"url": "/api/users"}
+
+
+@scenario("PUT", "/users/{user_id}")
+async def update_user(bench):
+    return {"url": f"/api/users/{bench.pick(bench.receptionists)}", "json": {"full_name": bench.unique("Reception")}}
+
+
+@scenario("DELETE", "/users/{user_id}")
+async def delete_user(bench):
+    user = await bench.create("/api/users", json={
+        "username": bench.unique("bench_gone").replace(" ", "_"), "password": "bench",
+        "full_name": "Leaving User", "role": "receptionist",
+    })
+    return {"url": f"/api/users/{user['id']}"}
+
+
+@scenario("GET", "/doctors")
+async def list_doctors(bench):
+    return {"url": "/api/doctors"}
+
+
+# Patients
+@scenario("POST", "/patients")
+async def create_patient(bench):
+    return {"url": "/api/patients", "json": bench.patient_body()}
+
+
+@scenario("GET", "/patients")
+async def list_patients(bench):
+    return {"url": "/api/patients", "params": {"limit": 50}}
+
+
+@scenario("GET", "/patients/suggest")
+async def suggest_patients(bench):
+    return {"url": "/api/patients/suggest", "params": {"q": bench.pick(bench.names)[:3]}}
+
+
+@scenario("GET", "/patients/search")
+async def search_patients(bench):
+    return {"url": "/api/patients/search", "params": {"q": bench.pick(bench.names)}}
+
+
+@scenario("GET", "/patients/{patient_id}")
+async def get_patient(bench):
+    return {"url": f"/api/patients/{bench.pick(bench.patients)}"}
+
+
+@scenario("PUT", "/patients/{patient_id}")
+async def update_patient(bench):
+    return {"url": f"/api/patients/{bench.pick(bench.patients)}", "json": {"notes": bench.unique("Updated")}}
+
+
+@scenario("DELETE", "/patients/{patient_id}")
+async def delete_patient(bench):
+    patient = await bench.create("/api/patients", json=bench.patient_body())
+    return {"url": f"/api/patients/{patient['id']}"}
+
+
+@scenario("POST", "/patients/import", status=202)
+async def import_patients(bench):
+    return {"url": "/api/patients/import", **import_csv(bench)}
+
+
+@scenario("GET", "/patients/import/{job_id}")
+async def get_import_job(bench):
+    if bench.import_job is None:
+        bench.import_job = (await bench.create("/api/patients/import", **import_csv(bench)))["id"]
+    return {"url": f"/api/patients/import/{bench.import_job}"}
+
+
+# Procedures
+@scenario("POST", "/procedures")
+async def create_procedure(bench):
+    return {"url": "/api/procedures", "json": {"name": bench.unique("Bench Procedure"), "price_jod": 25.0}}
+
+
+@scenario("GET", "/procedures")
+async def list_procedures(bench):
+    return {"url": "/api/procedures"}
+
+
+@scenario("PUT", "/procedures/{procedure_id}")
+async def update_procedure(bench):
+    procedure_id, name, price = bench.pick(bench.procedures)
+    return {"url": f"/api/procedures/{procedure_id}", "json": {"name": name, "price_jod": price}}
+
+
+@scenario("DELETE", "/procedures/{procedure_id}")
+async def delete_procedure(bench):
+    procedure = await bench.create("/api/procedures", json={"name": bench.unique("Retired"), "price_jod": 5.0})
+    return {"url": f"/api/procedures/{procedure['id']}"}
+
+
+# Appointments
+@scenario("POST", "/appointments")
+async def create_appointment(bench):
+    return {"url": "/api/appointments", "params": {"allow_overlap": True}, "json": bench.appointment_body()}
+
+
+@scenario("GET", "/appointments")
+async def list_appointments(bench):
+    return {"url": "/api/appointments", "params": {"date": bench.day()}}
+
+
+@scenario("PUT", "/appointments/{appointment_id}")
+async def update_appointment(bench):
+    return {"url": f"/api/appointments/{bench.pick(bench.appointments)}", "json": {"notes": bench.unique("Moved")}}
+
+
+@scenario("DELETE", "/appointments/{appointment_id}")
+async def delete_appointment(bench):
+    appointment = await bench.create(
+        "/api/appointments", params={"allow_overlap": True}, json=bench.appointment_body()
+    )
+    return {"url": f"/api/appointments/{appointment['id']}"}
+
+
+@scenario("GET", "/availability")
+async def availability(bench):
+    start = bench.day()
+    end = (datetime.fromisoformat(start) + timedelta(days=6)).date().isoformat()
+    return {"url": "/api/availability", "params": {"date_from": start, "date_to": end}}
+
+
+# Visits and payments
+@scenario("POST", "/visits")
+async def create_visit(bench):
+    return {"url": "/api/visits", "json": bench.visit_body()}
+
+
+@scenario("POST", "/visits/bulk")
+async def create_visits_bulk(bench):
+    return {"url": "/api/visits/bulk", "json": [bench.visit_body() for _ in range(10)]}
+
+
+@scenario("GET", "/visits")
+async def list_visits(bench):
+    return {"url": "/api/visits", "params": {"patient_id": bench.pick(bench.patients)}}
+
+
+@scenario("PUT", "/visits/{visit_id}")
+async def update_visit(bench):
+    return {"url": f"/api/visits/{bench.pick(bench.visits)}", "json": {"notes": bench.unique("Reviewed")}}
+
+
+@scenario("POST", "/payments")
+async def create_payment(bench):
+    return {"url": "/api/payments", "json": {"patient_id": bench.pick(bench.patients), "amount_jod": 20.0}}
+
+
+@scenario("GET", "/payments")
+async def list_payments(bench):
+    return {"url": "/api/payments", "params": {"patient_id": bench.pick(bench.patients)}}
+
+
+@scenario("GET", "/export/{dataset}")
+async def export(bench):
+    start = bench.day(300)
+    end = (datetime.fromisoformat(start) + timedelta(days=30)).date().isoformat()
+    return {"url": f"/api/export/{bench.pick(['payments', 'visits', 'patients'])}",
+            "params": {"date_from": start, "date_to": end}}
+
+
+# Images
+@scenario("POST", "/images/upload")
+async def upload_image(bench):
+    return {"url": "/api/images/upload", **bench.upload()}
+
+
+@scenario("GET", "/images/{image_id}")
+async def get_image(bench):
+    size = bench.pick([None, "thumb", "medium"])
+    return {"url": f"/api/images/{bench.pick(bench.images)}", "params": {"size": size} if size else {}}
+
+
+@scenario("GET", "/images/patient/{patient_id}")
+async def patient_images(bench):
+    return {"url": f"/api/images/patient/{bench.pick(bench.patients)}"}
+
+
+@scenario("DELETE", "/images/{image_id}")
+async def delete_image(bench):
+    image = await bench.create("/api/images/upload", **bench.upload())
+    return {"url": f"/api/images/{image['id']}"}
+
+
+# Admin and reporting
+@scenario("GET", "/stats/dashboard")
+async def dashboard(bench):
+    return {"url": "/api/stats/dashboard", "params": {"date": bench.day(300)}}
+
+
+@scenario("GET", "/metrics")
+async def metrics(bench):
+    return {"url": "/api/metrics"}
+
+
+@scenario("GET", "/admin/sql-profile")
+async def sql_profile(bench):
+    return {"url": "/api/admin/sql-profile"}
+
+
+@scenario("DELETE", "/admin/sql-profile")
+async def reset_sql_profile(bench):
+    return {"url": "/api/admin/sql-profile"}
+
+
+@scenario("POST", "/admin/storage/sweep")
+async def storage_sweep(bench):
+    return {"url": "/api/admin/storage/sweep"}
+
+
+@scenario("POST", "/admin/ledger/rebuild")
+async def ledger_rebuild(bench):
+    return {"url": "/api/admin/ledger/rebuild"}
+
+
+@scenario("GET", "/admin/ledger/verify")
+async def ledger_verify(bench):
+    return {"url": "/api/admin/ledger/verify"}
+
+
+@scenario("GET", "/admin/cache/stats")
+async def cache_stats(bench):
+    return {"url": "/api/admin/cache/stats"}
+
+
+def api_routes():
+    return sorted(
+        (method, route.path)
+        for route in server.app.routes
+        if route.path.startswith("/api/")
+        for method in getattr(route, "methods", ())
+        if method != "HEAD"
+    )
+
+
+def percentile(quantiles, pct):
+    return quantiles[pct - 1] * 1000
+
+
+def summarize(item, samples, errors, statements):
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "method": item.method,
+        "route": f"/api{item.path}",
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / sum(samples), 1),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(quantiles, 50), 3),
+        "p95_ms": round(percentile(quantiles, 95), 3),
+        "p99_ms": round(percentile(quantiles, 99), 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        "statements_per_request": statements,
+    }
+
+
+async def run_route(bench, item, requests, warmup):
+    key = (item.method, f"/api{item.path}")
+    samples, errors, first_error = [], 0, None
+    for attempt in range(warmup + requests):
+        if attempt == warmup:
+            histogram = server.request_metrics.statements.get(key)
+            before = (histogram.total, histogram.count) if histogram else (0, 0)
+        kwargs = await item.prepare(bench)
+        client = kwargs.pop("client", bench.admin)
+        start = time.perf_counter()
+        response = await client.request(item.method, **kwargs)
+        elapsed = time.perf_counter() - start
+        if attempt >= warmup:
+            samples.append(elapsed)
+        if response.status_code != item.status:
+            errors += 1
+            first_error = first_error or f"{response.status_code} {response.text[:200]}"
+    if first_error:
+        print(f"  {item.method} /api{item.path}: {errors} unexpected responses, first: {first_error}")
+
+    histogram = server.request_metrics.statements.get(key)
+    statements = None
+    if histogram is not None and histogram.count > before[1]:
+        statements = round((histogram.total - before[0]) / (histogram.count - before[1]), 2)
+    return summarize(item, samples, errors, statements)
+
+
+def make_client():
+    transport = httpx.ASGITransport(app=server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def run_scale(name, args):
+    start = time.perf_counter()
+    # The first startup creates the schema and admin account; the second
+    # backfills the ledger and loads the typeahead index from the new data
+    await server.startup_event()
+    await server.shutdown_event()
+    dataset = datagen.populate(server.DB_PATH, server.UPLOADS_DIR, datagen.SCALES[name], args.seed)
+    await server.startup_event()
+    setup_seconds = round(time.perf_counter() - start, 2)
+    print(f"{name}: " + ", ".join(f"{count} {table}" for table, count in dataset.items())
+          + f" (setup {setup_seconds} s)")
+
+    try:
+        async with make_client() as admin, make_client() as staff:
+            for client, credentials in ((admin, ADMIN), (staff, STAFF)):
+                response = await client.post("/api/auth/login", json=credentials)
+                assert response.status_code == 200, response.text
+            bench = Bench(admin, staff, args.seed)
+
+            selected = [item for item in SCENARIOS if args.route in f"{item.method} /api{item.path}"]
+            routes = []
+            print(f"{'route':<42} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql':>6}")
+            for item in selected:
+                result = await run_route(bench, item, args.requests, args.warmup)
+                routes.append(result)
+                statements = "-" if result["statements_per_request"] is None else result["statements_per_request"]
+                print(f"{result['method'] + ' ' + result['route']:<42} {result['throughput_rps']:>9.1f} "
+                      f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {statements:>6}")
+    finally:
+        await server.shutdown_event()
+
+    covered = {(item.method, f"/api{item.path}") for item in SCENARIOS}
+    uncovered = [f"{method} {path}" for method, path in api_routes() if (method, path) not in covered]
+    if uncovered:
+        print(f"{name}: no scenario for " + ", ".join(uncovered))
+    return {"dataset": dataset, "setup_seconds": setup_seconds, "routes": routes, "uncovered": uncovered}
+
+
+def run_scales_in_subprocesses(args):
+    scales = {}
+    for name in args.scale:
+        output = Path(WORK_DIR) / f"{name}.json"
+        command = [
+            sys.executable, __file__, "--scale", name, "--requests", str(args.requests),
+            "--warmup", str(args.warmup), "--seed", str(args.seed), "--route", args.route,
+            "--output", str(output),
+        ]
+        subprocess.run(command, check=True)
+        scales.update(json.loads(output.read_text())["scales"])
+    return scales
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, scale in results["scales"].items():
+        previous = {(route["method"], route["route"]): route
+                    for route in baseline.get("scales", {}).get(name, {}).get("routes", [])}
+        for route in scale["routes"]:
+            old = previous.get((route["method"], route["route"]))
+            if old is None:
+                continue
+            label = f"{name} {route['method']} {route['route']}"
+            if (route["p95_ms"] > old["p95_ms"] * (1 + tolerance)
+                    and route["p95_ms"] - old["p95_ms"] > NOISE_FLOOR_MS):
+                found.append(f"{label}: p95 {old['p95_ms']:.2f} -> {route['p95_ms']:.2f} ms")
+            if (route["statements_per_request"] or 0) > (old["statements_per_request"] or 0) + 0.5:
+                found.append(f"{label}: SQL statements {old['statements_per_request']} "
+                             f"-> {route['statements_per_request']}")
+    return found
+
+
+def main(args):
+    # Per-request and migration logging would swamp the table
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.WARNING)
+    if len(args.scale) == 1:
+        scales = {args.scale[0]: asyncio.run(run_scale(args.scale[0], args))}
+    else:
+        scales = run_scales_in_subprocesses(args)
+
+    results = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "settings": {
+            "requests": args.requests, "warmup": args.warmup, "seed": args.seed,
+            "bcrypt_rounds": server.BCRYPT_ROUNDS, "db_pool_readers": server.DB_POOL_READERS,
+        },
+        "scales": scales,
+    }
+    output = args.output or RESULTS_DIR / f"bench_api-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", nargs="+", choices=datagen.SCALES, default=DEFAULT_SCALES)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--route", default="", help="only routes whose 'METHOD /api/path' contains this")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown, as a fraction")
+    try:
+        status = main(parser.parse_args())
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+    sys.exit(status)
@@ -0,0 +1,150 @@
+"""Bytes on the wire and CPU cost of response compression.
+
+Builds a clinic with datagen.populate() and requests the large list
+routes, two exports and an image through httpx's ASGI transport, once per
+Accept-Encoding: identity, gzip and (when the Brotli package is installed)
+br. For each it prints the body size as sent, the compression ratio and
+the process CPU time per request, whose difference from the identity row
+is what compression costs the server. Bodies are read raw, so the client
+never spends time decoding them.
+
+A second table compresses the identity bodies directly at several gzip
+levels and brotli qualities, to show what GZIP_LEVEL and BROTLI_QUALITY
+trade between size and CPU.
+
+Usage: python benchmarks/bench_compression.py [--scale NAME] [--requests N] [--seed N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_compression_")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "clinic.db")
+os.environ["UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["ORPHAN_SWEEP_INTERVAL_SECONDS"] = "0"
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import datagen  # noqa: E402
+import server  # noqa: E402
+
+ADMIN = {"username": "admin", "password": "admin"}
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def routes(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        patient_id = conn.execute(
+            "SELECT patient_id FROM payments GROUP BY patient_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        image_id = conn.execute("SELECT id FROM medical_images LIMIT 1").fetchone()[0]
+    finally:
+        conn.close()
+    return [
+        ("patients", "/api/patients", {}),
+        ("appointments", "/api/appointments", {}),
+        ("payments", "/api/payments", {}),
+        ("visits (one patient)", "/api/visits", {"patient_id": patient_id}),
+        ("export payments.csv", "/api/export/payments", {}),
+        ("export visits.ndjson", "/api/export/visits", {"format": "ndjson"}),
+        ("image (png)", f"/api/images/{image_id}", {}),
+    ]
+
+
+async def measure(client, path, params, encoding, requests):
+    sizes, cpu, wall = set(), [], []
+    for _ in range(requests):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        async with client.stream("GET", path, params=params, headers={"Accept-Encoding": encoding}) as response:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+        assert response.status_code == 200, f"{path}: {response.status_code}"
+        sizes.add(len(body))
+    return {
+        "encoding": response.headers.get("content-encoding", "identity"),
+        "bytes": max(sizes),
+        "cpu_ms": statistics.median(cpu) * 1000,
+        "wall_ms": statistics.median(wall) * 1000,
+        "body": body,
+    }
+
+
+def level_table(bodies):
+    print(f"\n{'direct compression':<22} {'setting':<12} {'bytes':>12} {'ratio':>7} {'ms':>9} {'MB/s':>8}")
+    settings = [("gzip", level) for level in GZIP_LEVELS]
+    if server.brotli is not None:
+        settings += [("br", quality) for quality in BROTLI_QUALITIES]
+    for label, body in bodies.items():
+        for coding, level in settings:
+            start = time.process_time()
+            if coding == "gzip":
+                compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                size = len(compressor.compress(body) + compressor.flush())
+            else:
+                size = len(server.brotli.compress(body, quality=level))
+            seconds = time.process_time() - start
+            print(f"{label:<22} {coding + ' ' + str(level):<12} {size:>12,} {len(body) / size:>7.1f} "
+                  f"{seconds * 1000:>9.2f} {len(body) / max(seconds, 1e-9) / 1e6:>8.1f}")
+
+
+async def run(args):
+    await server.startup_event()
+    await server.shutdown_event()
+    dataset = datagen.populate(server.DB_PATH, server.UPLOADS_DIR, datagen.SCALES[args.scale], args.seed)
+    await server.startup_event()
+    print(f"{args.scale}: " + ", ".join(f"{count} {table}" for table, count in dataset.items()))
+    print(f"gzip level {server.GZIP_LEVEL}, brotli quality {server.BROTLI_QUALITY}"
+          + ("" if server.brotli is not None else " (Brotli not installed)")
+          + f", threshold {server.COMPRESSION_MIN_BYTES} bytes\n")
+
+    encodings = ["identity", "gzip"] + (["br"] if server.brotli is not None else [])
+    bodies = {}
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/login", json=ADMIN)
+            assert response.status_code == 200, response.text
+            print(f"{'route':<22} {'sent as':<9} {'bytes':>12} {'ratio':>7} {'cpu ms':>9} {'+cpu ms':>9} {'wall ms':>9}")
+            for label, path, params in routes(server.DB_PATH):
+                plain = None
+                for encoding in encodings:
+                    await measure(client, path, params, encoding, 1)
+                    result = await measure(client, path, params, encoding, args.requests)
+                    plain = plain or result
+                    print(f"{label:<22} {result['encoding']:<9} {result['bytes']:>12,} "
+                          f"{plain['bytes'] / result['bytes']:>7.1f} {result['cpu_ms']:>9.2f} "
+                          f"{result['cpu_ms'] - plain['cpu_ms']:>+9.2f} {result['wall_ms']:>9.2f}")
+                if not path.startswith("/api/images/"):
+                    bodies[label] = plain["body"]
+    finally:
+        await server.shutdown_event()
+    level_table(bodies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=datagen.SCALES, default="small")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    # Migration and per-request logging would swamp the tables
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.WARNING)
+    try:
+        asyncio.run(run(parser.parse_args()))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,130 @@
+"""Latency of cheap routes while many logins run concurrently.
+
+Probes GET /api/auth/me and GET /api/procedures back to back, first on an
+idle server and then while a storm of concurrent POST /api/auth/login
+requests runs, and prints p50/p99 for both phases. The first only touches
+the user cache; the second needs a pooled reader connection. With --inline, bcrypt runs on the event loop as it used to,
+for comparison.
+
+Usage: python benchmarks/bench_login_load.py [--logins N] [--concurrency C] [--inline]
+Set BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_LIMIT to try
+other settings.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_login_")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "clinic.db")
+os.environ["UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+CREDENTIALS = {"username": "admin", "password": "admin"}
+IDLE_PROBES = 200
+PROBE_INTERVAL = 0.002
+# /auth/me is answered from the user cache; /procedures needs a pooled
+# reader, so it also stalls if logins hold the readers
+PROBE_PATHS = ("/api/auth/me", "/api/procedures")
+
+
+class InlineHasher(server.PasswordHasher):
+    # Runs bcrypt directly on the event loop, like the handlers used to
+    async def _run(self, func, *args):
+        return func(*args)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, samples):
+    print(f"{label:<12} n={len(samples):<5} p50={percentile(samples, 50) * 1000:8.2f} ms "
+          f"p99={percentile(samples, 99) * 1000:8.2f} ms max={max(samples) * 1000:8.2f} ms")
+
+
+def make_client():
+    transport = httpx.ASGITransport(app=server.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+async def probe(client, path, samples, stop=None, count=None):
+    due = time.perf_counter()
+    while (stop is None or not stop.is_set()) and (count is None or len(samples) < count):
+        response = await client.get(path)
+        finished = time.perf_counter()
+        assert response.status_code == 200
+        # Measured from when the probe was due, so time spent waiting on a
+        # blocked event loop counts towards its latency
+        samples.append(finished - due)
+        # A cached /auth/me never suspends, so yield to the login tasks
+        await asyncio.sleep(PROBE_INTERVAL)
+        due = finished + PROBE_INTERVAL
+
+
+async def login_storm(logins, concurrency, outcomes):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            async with make_client() as client:
+                response = await client.post("/api/auth/login", json=CREDENTIALS)
+                outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+
+
+async def main(args):
+    if args.inline:
+        server.password_hasher = InlineHasher()
+
+    await server.startup_event()
+    try:
+        async with make_client() as client:
+            response = await client.post("/api/auth/login", json=CREDENTIALS)
+            assert response.status_code == 200
+
+            idle = {path: [] for path in PROBE_PATHS}
+            for path in PROBE_PATHS:
+                await probe(client, path, idle[path], count=IDLE_PROBES)
+
+            loaded = {path: [] for path in PROBE_PATHS}
+            outcomes = {}
+            stop = asyncio.Event()
+            probers = [asyncio.create_task(probe(client, path, loaded[path], stop=stop)) for path in PROBE_PATHS]
+            start = time.perf_counter()
+            await login_storm(args.logins, args.concurrency, outcomes)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await asyncio.gather(*probers)
+
+        mode = "inline" if args.inline else f"pool ({server.password_hasher.workers} workers)"
+        print(f"bcrypt rounds={server.password_hasher.rounds} mode={mode}")
+        print(f"{args.logins} logins in {elapsed:.2f} s, status counts {outcomes}")
+        for path in PROBE_PATHS:
+            print(path)
+            report("  idle", idle[path])
+            report("  under load", loaded[path])
+    finally:
+        await server.shutdown_event()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--inline", action="store_true")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,114 @@
+"""Query count and latency of GET /api/visits against visit count.
+
+Seeds a throwaway database with one patient holding N visits (three
+procedure lines each), then times the visits listing for that patient and
+counts the SQL statements it issues (including the session user lookup).
+The per-visit lookups the route used to run are replayed directly against
+SQLite alongside it for comparison.
+
+Usage: python benchmarks/bench_visits.py [N ...]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_visits_")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "clinic.db")
+os.environ["UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+REPEATS = 5
+
+
+def seed(db_path, visits):
+    now = "2026-01-01T09:00:00"
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM visit_procedures")
+    conn.execute("DELETE FROM visits")
+    conn.execute("DELETE FROM patients")
+    conn.execute("DELETE FROM procedures")
+    conn.execute(
+        "INSERT INTO patients (id, name, phone, created_at) VALUES (1, 'Bench Patient', '0790000000', ?)",
+        (now,)
+    )
+    conn.executemany(
+        "INSERT INTO procedures (id, name, price_jod, created_at) VALUES (?, ?, ?, ?)",
+        [(i, f"Procedure {i}", 10.0 * i, now) for i in range(1, 4)]
+    )
+    conn.executemany(
+        "INSERT INTO visits (id, patient_id, doctor_id, visit_date, status, created_at) VALUES (?, 1, 1, ?, 'completed', ?)",
+        [(i, now, now) for i in range(1, visits + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO visit_procedures (visit_id, procedure_id, quantity, created_at) VALUES (?, ?, 1, ?)",
+        [(v, p, now) for v in range(1, visits + 1) for p in range(1, 4)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def per_visit_baseline(db_path):
+    # The lookup pattern get_visits used before procedure lines were batched
+    conn = sqlite3.connect(db_path)
+    statements = 1
+    visit_ids = [row[0] for row in conn.execute("SELECT id FROM visits WHERE patient_id = 1")]
+    for visit_id in visit_ids:
+        conn.execute("""
+            SELECT vp.quantity, pr.id, pr.name, pr.price_jod
+            FROM visit_procedures vp
+            JOIN procedures pr ON vp.procedure_id = pr.id
+            WHERE vp.visit_id = ?
+        """, (visit_id,)).fetchall()
+        statements += 1
+    conn.close()
+    return statements
+
+
+def main(sizes):
+    statements = []
+
+    def trace(sql):
+        statements.append(sql)
+
+    with TestClient(server.app) as client:
+        client.post("/api/auth/login", json={"username": "admin", "password": "admin"})
+        for conn in server.db_pool._all_readers:
+            client.portal.call(conn.set_trace_callback, trace)
+
+        print(f"{'visits':>8} {'queries':>8} {'ms':>10} {'old queries':>12} {'old lookup ms':>14}")
+        for size in sizes:
+            seed(server.DB_PATH, size)
+
+            timings = []
+            for _ in range(REPEATS):
+                statements.clear()
+                start = time.perf_counter()
+                response = client.get("/api/visits", params={"patient_id": 1})
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200 and len(response.json()) == size
+            queries = len(statements)
+
+            baseline = []
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                old_queries = per_visit_baseline(server.DB_PATH)
+                baseline.append(time.perf_counter() - start)
+
+            print(f"{size:>8} {queries:>8} {min(timings) * 1000:>10.2f} "
+                  f"{old_queries:>12} {min(baseline) * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    try:
+        main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,282 @@
+"""Synthetic clinic data at several scales for benchmarks and load tests.
+
+populate() fills a database that already has the server's schema (run the
+app's startup once to create it) with doctors, receptionists, a procedure
+catalogue and, per patient, visits with procedure lines, payments,
+appointments and medical image metadata. Image rows point at real PNG
+files, hard-linked into each patient's upload directory, so image routes,
+deletes and storage sweeps see what they would in production. The output
+only depends on the scale and the seed.
+
+The patient ledger is left empty. init_db() backfills it on the next
+startup, the same way it does for a database restored from an old backup.
+
+Usage: python benchmarks/datagen.py [--scale small|medium|large] [--seed N] OUTPUT_DIR
+writes OUTPUT_DIR/clinic.db and OUTPUT_DIR/uploads.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+import bcrypt
+from PIL import Image
+
+
+class Scale(NamedTuple):
+    patients: int
+    doctors: int
+    receptionists: int
+    procedures: int
+    visits_per_patient: float
+    lines_per_visit: float
+    payments_per_patient: float
+    appointments_per_patient: float
+    images_per_patient: float
+
+
+SCALES = {
+    "tiny": Scale(50, 2, 1, 10, 3, 1.5, 2, 1, 0.5),
+    "small": Scale(1_000, 4, 2, 30, 4, 1.8, 3, 2, 1),
+    "medium": Scale(10_000, 10, 4, 60, 5, 2, 4, 2, 1.5),
+    "large": Scale(50_000, 25, 8, 120, 6, 2, 5, 3, 2),
+}
+
+# Activity spans the year before REFERENCE_DATE; appointments run a month past it
+REFERENCE_DATE = date(2026, 3, 1)
+HISTORY_DAYS = 365
+BOOKING_DAYS = 30
+PASSWORD = "bench"
+SCAN_VARIANTS = 8
+
+FIRST_NAMES = [
+    "Mohammad", "Ahmad", "Omar", "Ali", "Yousef", "Khaled", "Ibrahim", "Hasan", "Zaid", "Tariq",
+    "Fatima", "Mariam", "Lina", "Rania", "Noor", "Huda", "Sara", "Dana", "Aya", "Leen",
+    "محمد", "أحمد", "عمر", "علي", "يوسف", "فاطمة", "مريم", "لينا", "نور", "هدى",
+]
+LAST_NAMES = [
+    "Al-Ahmad", "Haddad", "Zaidan", "Khalil", "Nasser", "Saleh", "Odeh", "Masri", "Qasem", "Shami",
+    "الأحمد", "حداد", "زيدان", "خليل", "ناصر", "صالح", "عودة", "المصري", "قاسم", "الشامي",
+]
+CITIES = ["Amman", "Irbid", "Zarqa", "Salt", "Madaba", "Aqaba", "Jerash", "Karak"]
+HISTORY = [None, None, None, "Diabetes", "Hypertension", "Asthma", "Allergic to penicillin"]
+PROCEDURE_NAMES = [
+    "Checkup", "Cleaning", "Filling", "Root canal", "Extraction", "Crown", "Whitening",
+    "X-ray", "Implant", "Bridge", "Scaling", "Veneer", "Braces adjustment", "Night guard",
+]
+IMAGE_TYPES = ["xray", "panoramic", "intraoral", "photo"]
+VISIT_STATUSES = ["completed"] * 8 + ["in_progress"]
+APPOINTMENT_STATUSES = ["scheduled"] * 6 + ["completed"] * 3 + ["cancelled"]
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}" for hour in range(9, 17) for minute in (0, 30)]
+
+
+def poisson(rng, mean):
+    # Poisson-distributed count, so some patients have many records and some none
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def scan_files():
+    scans = []
+    for variant in range(SCAN_VARIANTS):
+        image = Image.new("L", (256, 256))
+        image.putdata([(x * (variant + 1) + y * 3) % 256 for y in range(256) for x in range(256)])
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        content = buffer.getvalue()
+        scans.append((hashlib.sha256(content).hexdigest(), content))
+    return scans
+
+
+def link_scan(uploads_dir, patient_id, sha256, content, sources):
+    patient_dir = uploads_dir / str(patient_id)
+    patient_dir.mkdir(parents=True, exist_ok=True)
+    target = patient_dir / f"{sha256}.png"
+    if target.exists():
+        return
+    source = sources.get(sha256)
+    if source is not None:
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    target.write_bytes(content)
+    sources[sha256] = target
+
+
+def populate(db_path, uploads_dir, scale, seed=0):
+    """Add a synthetic clinic to an initialized database and return row counts."""
+    rng = random.Random(seed)
+    uploads_dir = Path(uploads_dir)
+    created = f"{REFERENCE_DATE - timedelta(days=HISTORY_DAYS)}T08:00:00"
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        (admin_id,) = conn.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1").fetchone()
+
+        def add_users(role, prefix, count):
+            ids = []
+            for number in range(1, count + 1):
+                cursor = conn.execute(
+                    "INSERT INTO users (username, password_hash, full_name, role, is_first_login, created_at) "
+                    "VALUES (?, ?, ?, ?, 0, ?)",
+                    (f"{prefix}{number}", password_hash,
+                     f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", role, created)
+                )
+                ids.append(cursor.lastrowid)
+            return ids
+
+        doctor_ids = add_users("doctor", "bench_doctor_", scale.doctors)
+        staff_ids = [admin_id] + add_users("receptionist", "bench_reception_", scale.receptionists)
+
+        procedures = []
+        for number in range(scale.procedures):
+            name = PROCEDURE_NAMES[number % len(PROCEDURE_NAMES)]
+            if number >= len(PROCEDURE_NAMES):
+                name = f"{name} ({number // len(PROCEDURE_NAMES) + 1})"
+            price = float(rng.choice([10, 15, 20, 25, 40, 60, 90, 150, 300]))
+            cursor = conn.execute(
+                "INSERT INTO procedures (name, price_jod, created_at) VALUES (?, ?, ?)", (name, price, created)
+            )
+            procedures.append(cursor.lastrowid)
+
+        (first_patient,) = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM patients").fetchone()
+        patients = []
+        for offset in range(scale.patients):
+            born = date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 80))
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            patients.append((
+                first_patient + offset, f"{first} {last}",
+                f"07{rng.choice('789')}{rng.randrange(10 ** 7):07d}",
+                f"patient{first_patient + offset}@example.com" if rng.random() < 0.3 else None,
+                born.isoformat(), rng.choice(CITIES), rng.choice(HISTORY),
+                None if rng.random() < 0.8 else "Prefers morning appointments",
+                f"{REFERENCE_DATE - timedelta(days=rng.randrange(HISTORY_DAYS))}T10:00:00",
+            ))
+        conn.executemany(
+            "INSERT INTO patients (id, name, phone, email, date_of_birth, address, medical_history, notes, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            patients
+        )
+
+        (next_visit,) = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM visits").fetchone()
+        scans = scan_files()
+        scan_sources = {}
+        visits, lines, payments, appointments, images = [], [], [], [], []
+        booked = set()
+        for patient_id, *_ in patients:
+            for _ in range(poisson(rng, scale.visits_per_patient)):
+                day = REFERENCE_DATE - timedelta(days=rng.randrange(1, HISTORY_DAYS))
+                stamp = f"{day}T{rng.choice(SLOT_TIMES)}:00"
+                visits.append((next_visit, patient_id, rng.choice(doctor_ids), stamp,
+                               rng.choice(VISIT_STATUSES), None, stamp))
+                line_count = min(len(procedures), max(1, poisson(rng, scale.lines_per_visit)))
+                for procedure_id in rng.sample(procedures, line_count):
+                    lines.append((next_visit, procedure_id, 1 if rng.random() < 0.9 else 2, stamp))
+                next_visit += 1
+            for _ in range(poisson(rng, scale.payments_per_patient)):
+                day = REFERENCE_DATE - timedelta(days=rng.randrange(1, HISTORY_DAYS))
+                stamp = f"{day}T{rng.choice(SLOT_TIMES)}:00"
+                payments.append((patient_id, float(rng.choice([5, 10, 20, 25, 50, 100])), stamp,
+                                 rng.choice(staff_ids), None, stamp))
+            for _ in range(poisson(rng, scale.appointments_per_patient)):
+                day = REFERENCE_DATE + timedelta(days=rng.randrange(-HISTORY_DAYS // 4, BOOKING_DAYS))
+                doctor_id, slot = rng.choice(doctor_ids), rng.choice(SLOT_TIMES)
+                if (doctor_id, day, slot) in booked:
+                    continue
+                booked.add((doctor_id, day, slot))
+                appointments.append((patient_id, doctor_id, day.isoformat(), slot, 30,
+                                     rng.choice(APPOINTMENT_STATUSES), None, created))
+            for _ in range(poisson(rng, scale.images_per_patient)):
+                sha256, content = rng.choice(scans)
+                link_scan(uploads_dir, patient_id, sha256, content, scan_sources)
+                day = REFERENCE_DATE - timedelta(days=rng.randrange(1, HISTORY_DAYS))
+                images.append((patient_id, rng.choice(doctor_ids), f"{patient_id}/{sha256}.png",
+                               rng.choice(IMAGE_TYPES), None, f"{day}T12:00:00", sha256, len(content)))
+
+        conn.executemany(
+            "INSERT INTO visits (id, patient_id, doctor_id, visit_date, status, notes, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            visits
+        )
+        conn.executemany(
+            "INSERT INTO visit_procedures (visit_id, procedure_id, quantity, created_at) VALUES (?, ?, ?, ?)",
+            lines
+        )
+        conn.executemany(
+            "INSERT INTO payments (patient_id, amount_jod, payment_date, recorded_by, notes, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            payments
+        )
+        conn.executemany(
+            "INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, "
+            "duration_minutes, status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            appointments
+        )
+        conn.executemany(
+            "INSERT INTO medical_images (patient_id, uploaded_by, image_path, image_type, description, "
+            "upload_date, sha256, size_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            images
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {
+        "doctors": len(doctor_ids), "receptionists": len(staff_ids) - 1, "procedures": len(procedures),
+        "patients": len(patients), "visits": len(visits), "visit_procedures": len(lines),
+        "payments": len(payments), "appointments": len(appointments), "images": len(images),
+    }
+
+
+async def init_schema():
+    import server
+
+    await server.db_pool.open()
+    try:
+        await server.init_db()
+    finally:
+        await server.db_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    db_path = args.output / "clinic.db"
+    if db_path.exists():
+        parser.error(f"{db_path} already exists")
+    # server.py reads its paths at import time
+    os.environ["DB_PATH"] = str(db_path)
+    os.environ["UPLOADS_DIR"] = str(args.output / "uploads")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+    start = time.perf_counter()
+    asyncio.run(init_schema())
+    counts = populate(db_path, args.output / "uploads", SCALES[args.scale], args.seed)
+    print(f"{args.scale} clinic in {time.perf_counter() - start:.1f} s: "
+          + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    print(f"Staff logins: bench_doctor_1.. and bench_reception_1.. with password {PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
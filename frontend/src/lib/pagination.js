@@ -0,0 +1,18 @@
+import axios from 'axios';
+
+export const PAGE_SIZE = 50;
+
+// One page of a keyset-paginated list route. The body is the rows; the cursor
+// for the next page and the optional total count come back as headers.
+export async function fetchPage(url, params = {}) {
+  const response = await axios.get(url, {
+    params: { limit: PAGE_SIZE, ...params },
+    withCredentials: true
+  });
+  const total = response.headers['x-total-count'];
+  return {
+    items: response.data,
+    nextCursor: response.headers['x-next-cursor'] || null,
+    total: total === undefined ? null : parseInt(total, 10)
+  };
+}
@@ -49,7 +49,7 @@ const AdminAppointments = () => {
       resetForm();
       loadData();
     } catch (error) {
-      toast.error('Operation failed');
+      toast.error(error.response?.data?.detail || 'Operation failed');
     }
   };
 
@@ -23,25 +23,21 @@ const AdminDashboard = () => {
 
   const loadDashboardData = async () => {
     try {
-      const [patients, appointments, procedures, users] = await Promise.all([
-        axios.get(`${API}/patients`, { withCredentials: true }),
-        axios.get(`${API}/appointments`, { withCredentials: true }),
-        axios.get(`${API}/procedures`, { withCredentials: true }),
-        axios.get(`${API}/users`, { withCredentials: true }),
-      ]);
-
       const today = new Date().toISOString().split('T')[0];
-      const todayAppts = appointments.data.filter(a => a.appointment_date === today);
+      const { data } = await axios.get(`${API}/stats/dashboard`, {
+        params: { date: today },
+        withCredentials: true,
+      });
 
       setStats({
-        patients: patients.data.length,
-        appointments: appointments.data.length,
-        todayAppointments: todayAppts.length,
-        procedures: procedures.data.length,
-        users: users.data.length,
+        patients: data.patients,
+        appointments: data.appointments,
+        todayAppointments: data.today_appointment_count,
+        procedures: data.procedures,
+        users: data.users,
       });
 
-      setRecentAppointments(appointments.data.slice(0, 5));
+      setRecentAppointments(data.recent_appointments);
     } catch (error) {
       console.error('Failed to load dashboard data:', error);
     } finally {
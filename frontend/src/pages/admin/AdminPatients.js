@@ -4,15 +4,18 @@ import axios from 'axios';
 import { Plus, Search, Edit, Trash2, Eye } from 'lucide-react';
 import { toast } from 'sonner';
 import { useNavigate } from 'react-router-dom';
+import { fetchPage } from '../../lib/pagination';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const AdminPatients = () => {
   const [patients, setPatients] = useState([]);
-  const [filteredPatients, setFilteredPatients] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalCount, setTotalCount] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [showModal, setShowModal] = useState(false);
   const [editingPatient, setEditingPatient] = useState(null);
   const navigate = useNavigate();
@@ -27,23 +30,20 @@ const AdminPatients = () => {
     notes: ''
   });
 
+  // Searching happens on the server, a moment after the user stops typing
   useEffect(() => {
-    loadPatients();
-  }, []);
+    const timer = setTimeout(() => loadPatients(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
-  useEffect(() => {
-    const filtered = patients.filter(p => 
-      p.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      p.phone.includes(searchTerm)
-    );
-    setFilteredPatients(filtered);
-  }, [searchTerm, patients]);
+  const patientQuery = () => ({ q: searchTerm.trim() || undefined });
 
   const loadPatients = async () => {
     try {
-      const response = await axios.get(`${API}/patients`, { withCredentials: true });
-      setPatients(response.data);
-      setFilteredPatients(response.data);
+      const page = await fetchPage(`${API}/patients`, { ...patientQuery(), include_total: true });
+      setPatients(page.items);
+      setNextCursor(page.nextCursor);
+      setTotalCount(page.total);
     } catch (error) {
       toast.error('Failed to load patients');
     } finally {
@@ -51,6 +51,19 @@ const AdminPatients = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(`${API}/patients`, { ...patientQuery(), cursor: nextCursor });
+      setPatients((loaded) => [...loaded, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      toast.error('Failed to load patients');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
@@ -158,14 +171,14 @@ const AdminPatients = () => {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-slate-200">
-                {filteredPatients.length === 0 ? (
+                {patients.length === 0 ? (
                   <tr>
                     <td colSpan="5" className="px-6 py-8 text-center text-slate-600">
                       No patients found
                     </td>
                   </tr>
                 ) : (
-                  filteredPatients.map((patient) => (
+                  patients.map((patient) => (
                     <tr key={patient.id} className="hover:bg-slate-50 transition-colors">
                       <td className="px-6 py-4 whitespace-nowrap">
                         <div className="font-medium text-slate-900">{patient.name}</div>
@@ -211,6 +224,21 @@ const AdminPatients = () => {
               </tbody>
             </table>
           </div>
+          <div className="flex items-center justify-between px-6 py-4 border-t border-slate-200 text-sm text-slate-600">
+            <span data-testid="patients-count">
+              Showing {patients.length}{totalCount !== null ? ` of ${totalCount}` : ''} patients
+            </span>
+            {nextCursor && (
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                data-testid="load-more-patients-btn"
+                className="btn-secondary"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
+          </div>
         </div>
       </div>
 
@@ -3,20 +3,32 @@ import DashboardLayout from '../../components/DashboardLayout';
 import axios from 'axios';
 import { DollarSign } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchPage } from '../../lib/pagination';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const AdminPayments = () => {
   const [payments, setPayments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalCount, setTotalCount] = useState(null);
+  const [totalAmount, setTotalAmount] = useState(0);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => { loadPayments(); }, []);
 
   const loadPayments = async () => {
     try {
-      const response = await axios.get(`${API}/payments`, { withCredentials: true });
-      setPayments(response.data);
+      // Only the newest page is fetched, so the all-time total comes from the ledger
+      const [page, statsRes] = await Promise.all([
+        fetchPage(`${API}/payments`, { include_total: true }),
+        axios.get(`${API}/stats/dashboard`, { withCredentials: true })
+      ]);
+      setPayments(page.items);
+      setNextCursor(page.nextCursor);
+      setTotalCount(page.total);
+      setTotalAmount(statsRes.data.paid_jod);
     } catch (error) {
       toast.error('Failed to load payments');
     } finally {
@@ -24,9 +36,20 @@ const AdminPayments = () => {
     }
   };
 
-  if (loading) return <DashboardLayout title="Payments"><div className="flex items-center justify-center h-64"><div className="animate-spin rounded-full h-12 w-12 border-b-2 border-teal-700"></div></div></DashboardLayout>;
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(`${API}/payments`, { cursor: nextCursor });
+      setPayments((loaded) => [...loaded, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      toast.error('Failed to load payments');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
-  const totalAmount = payments.reduce((sum, p) => sum + p.amount_jod, 0);
+  if (loading) return <DashboardLayout title="Payments"><div className="flex items-center justify-center h-64"><div className="animate-spin rounded-full h-12 w-12 border-b-2 border-teal-700"></div></div></DashboardLayout>;
 
   return (
     <DashboardLayout title="Payment History">
@@ -67,6 +90,16 @@ const AdminPayments = () => {
               )}
             </tbody>
           </table>
+          <div className="flex items-center justify-between px-6 py-4 border-t border-slate-200 text-sm text-slate-600">
+            <span data-testid="payments-count">
+              Showing {payments.length}{totalCount !== null ? ` of ${totalCount}` : ''} payments
+            </span>
+            {nextCursor && (
+              <button onClick={loadMore} disabled={loadingMore} data-testid="load-more-payments-btn" className="btn-secondary">
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
+          </div>
         </div>
       </div>
     </DashboardLayout>
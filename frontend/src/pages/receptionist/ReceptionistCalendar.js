@@ -3,29 +3,50 @@ import DashboardLayout from '../../components/DashboardLayout';
 import axios from 'axios';
 import { Plus } from 'lucide-react';
 import { toast } from 'sonner';
+import { fetchPage } from '../../lib/pagination';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
 const ReceptionistCalendar = () => {
   const [appointments, setAppointments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [patients, setPatients] = useState([]);
+  const [patientSearch, setPatientSearch] = useState('');
   const [doctors, setDoctors] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [showModal, setShowModal] = useState(false);
   const [formData, setFormData] = useState({ patient_id: '', doctor_id: '', appointment_date: '', appointment_time: '', duration_minutes: 30, notes: '' });
 
   useEffect(() => { loadData(); }, []);
 
+  // The patient picker asks the typeahead index instead of loading every patient
+  useEffect(() => {
+    const q = patientSearch.trim();
+    if (!q) { setPatients([]); return undefined; }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/patients/suggest`, { params: { q }, withCredentials: true });
+        setPatients(response.data);
+      } catch (error) {
+        toast.error('Failed to search patients');
+      }
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [patientSearch]);
+
+  // Upcoming appointments, soonest first, a page at a time
+  const appointmentQuery = () => ({ date_from: new Date().toISOString().split('T')[0] });
+
   const loadData = async () => {
     try {
-      const [aptsRes, patientsRes, doctorsRes] = await Promise.all([
-        axios.get(`${API}/appointments`, { withCredentials: true }),
-        axios.get(`${API}/patients`, { withCredentials: true }),
+      const [page, doctorsRes] = await Promise.all([
+        fetchPage(`${API}/appointments`, appointmentQuery()),
         axios.get(`${API}/doctors`, { withCredentials: true })
       ]);
-      setAppointments(aptsRes.data);
-      setPatients(patientsRes.data);
+      setAppointments(page.items);
+      setNextCursor(page.nextCursor);
       setDoctors(doctorsRes.data);
     } catch (error) {
       toast.error('Failed to load data');
@@ -34,16 +55,34 @@ const ReceptionistCalendar = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(`${API}/appointments`, { ...appointmentQuery(), cursor: nextCursor });
+      setAppointments((loaded) => [...loaded, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      toast.error('Failed to load data');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const resetForm = () => {
+    setFormData({ patient_id: '', doctor_id: '', appointment_date: '', appointment_time: '', duration_minutes: 30, notes: '' });
+    setPatientSearch('');
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
       await axios.post(`${API}/appointments`, { ...formData, status: 'scheduled' }, { withCredentials: true });
       toast.success('Appointment scheduled');
       setShowModal(false);
-      setFormData({ patient_id: '', doctor_id: '', appointment_date: '', appointment_time: '', duration_minutes: 30, notes: '' });
+      resetForm();
       loadData();
     } catch (error) {
-      toast.error('Failed to schedule');
+      toast.error(error.response?.data?.detail || 'Failed to schedule');
     }
   };
 
@@ -79,6 +118,11 @@ const ReceptionistCalendar = () => {
           </div>
         ))}
         {Object.keys(groupedByDate).length === 0 && <p className="text-slate-600 text-center py-12">No appointments scheduled</p>}
+        {nextCursor && (
+          <div className="flex justify-center">
+            <button onClick={loadMore} disabled={loadingMore} data-testid="load-more-apts-btn" className="btn-secondary">{loadingMore ? 'Loading...' : 'Load more'}</button>
+          </div>
+        )}
       </div>
 
       {showModal && (
@@ -86,7 +130,7 @@ const ReceptionistCalendar = () => {
           <div className="bg-white rounded-xl max-w-md w-full">
             <div className="p-6 border-b border-slate-200"><h2 className="text-2xl font-bold">Schedule Appointment</h2></div>
             <form onSubmit={handleSubmit} className="p-6 space-y-4">
-              <div><label className="block text-sm font-medium text-slate-700 mb-2">Patient *</label><select data-testid="rec-apt-patient-select" value={formData.patient_id} onChange={(e) => setFormData({...formData, patient_id: parseInt(e.target.value)})} className="input-field" required><option value="">Select Patient</option>{patients.map(p => <option key={p.id} value={p.id}>{p.name}</option>)}</select></div>
+              <div><label className="block text-sm font-medium text-slate-700 mb-2">Patient *</label><input type="text" data-testid="rec-apt-patient-search" placeholder="Search by name or phone..." value={patientSearch} onChange={(e) => setPatientSearch(e.target.value)} className="input-field mb-2" /><select data-testid="rec-apt-patient-select" value={formData.patient_id} onChange={(e) => setFormData({...formData, patient_id: parseInt(e.target.value)})} className="input-field" required><option value="">Select Patient</option>{patients.map(p => <option key={p.id} value={p.id}>{p.name} ({p.phone})</option>)}</select></div>
               <div><label className="block text-sm font-medium text-slate-700 mb-2">Doctor *</label><select data-testid="rec-apt-doctor-select" value={formData.doctor_id} onChange={(e) => setFormData({...formData, doctor_id: parseInt(e.target.value)})} className="input-field" required><option value="">Select Doctor</option>{doctors.map(d => <option key={d.id} value={d.id}>{d.full_name}</option>)}</select></div>
               <div><label className="block text-sm font-medium text-slate-700 mb-2">Date *</label><input type="date" data-testid="rec-apt-date-input" value={formData.appointment_date} onChange={(e) => setFormData({...formData, appointment_date: e.target.value})} className="input-field" required /></div>
               <div><label className="block text-sm font-medium text-slate-700 mb-2">Time *</label><input type="time" data-testid="rec-apt-time-input" value={formData.appointment_time} onChange={(e) => setFormData({...formData, appointment_time: e.target.value})} className="input-field" required /></div>
@@ -94,7 +138,7 @@ const ReceptionistCalendar = () => {
               <div><label className="block text-sm font-medium text-slate-700 mb-2">Notes</label><textarea value={formData.notes} onChange={(e) => setFormData({...formData, notes: e.target.value})} className="input-field" rows="2" /></div>
               <div className="flex gap-3 pt-4">
                 <button type="submit" data-testid="save-rec-apt-btn" className="btn-primary flex-1">Schedule</button>
-                <button type="button" onClick={() => { setShowModal(false); setFormData({ patient_id: '', doctor_id: '', appointment_date: '', appointment_time: '', duration_minutes: 30, notes: '' }); }} className="btn-secondary flex-1">Cancel</button>
+                <button type="button" onClick={() => { setShowModal(false); resetForm(); }} className="btn-secondary flex-1">Cancel</button>
               </div>
             </form>
           </div>
@@ -335,7 +335,7 @@ const PatientDetail = () => {
                 images.map((img) => (
                   <div key={img.id} className="relative group">
                     <img
-                      src={`${API}/images/${img.id}`}
+                      src={`${API}/images/${img.id}?size=thumb`}
                       alt={img.description}
                       className="w-full h-48 object-cover rounded-lg border border-slate-200"
                     />
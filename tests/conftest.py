@@ -0,0 +1,53 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# server.py reads its paths at import time, so point it at a scratch
+# directory before any test module imports it
+WORK_DIR = tempfile.mkdtemp(prefix="clinic_tests_")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "clinic.db")
+os.environ["UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as test_client:
+        response = test_client.post("/api/auth/login", json={"username": "admin", "password": "admin"})
+        assert response.status_code == 200
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def seeded(client):
+    doctor = client.post("/api/users", json={
+        "username": "dr_seed", "password": "secret", "full_name": "Dr Seed", "role": "doctor"
+    }).json()
+    patient = client.post("/api/patients", json={"name": "Seed Patient", "phone": "0790000001"}).json()
+    procedure = client.post("/api/procedures", json={"name": "Filling", "price_jod": 40.0}).json()
+    visit = client.post("/api/visits", json={
+        "patient_id": patient["id"], "doctor_id": doctor["id"],
+        "procedures": [{"procedure_id": procedure["id"], "quantity": 1}]
+    }).json()
+    appointment = client.post("/api/appointments", json={
+        "patient_id": patient["id"], "doctor_id": doctor["id"],
+        "appointment_date": "2026-03-02", "appointment_time": "09:00"
+    }).json()
+    payment = client.post("/api/payments", json={"patient_id": patient["id"], "amount_jod": 15.0}).json()
+    return {
+        "doctor": doctor, "patient": patient, "procedure": procedure,
+        "visit": visit, "appointment": appointment, "payment": payment
+    }
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+import server
+
+DAY = "2026-04-06"
+
+
+def _brute_force(intervals, start, end):
+    return [interval for interval in intervals if interval[0] < end and start < interval[1]]
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_overlapping_intervals_matches_brute_force(seed):
+    rng = random.Random(seed)
+    intervals = sorted(
+        (start, start + rng.randint(1, 120), appointment_id)
+        for appointment_id, start in enumerate(rng.randrange(0, 24 * 60) for _ in range(rng.randint(0, 40)))
+    )
+    for _ in range(50):
+        start = rng.randrange(0, 24 * 60)
+        end = start + rng.randint(1, 120)
+        assert server.overlapping_intervals(intervals, start, end) == _brute_force(intervals, start, end)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_edge_touching_intervals_never_conflict(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        start = rng.randrange(60, 23 * 60)
+        end = start + rng.randint(1, 60)
+        before = (start - rng.randint(1, 60), start, 1)
+        after = (end, end + rng.randint(1, 60), 2)
+        intervals = sorted([before, after])
+        assert server.overlapping_intervals(intervals, start, end) == []
+        # Stretching by one minute either way makes it touch-and-overlap
+        assert server.overlapping_intervals(intervals, start - 1, end) == [before]
+        assert server.overlapping_intervals(intervals, start, end + 1) == [after]
+
+
+def test_contained_and_containing_intervals_conflict():
+    intervals = [(540, 600, 1)]
+    assert server.overlapping_intervals(intervals, 550, 560) == intervals
+    assert server.overlapping_intervals(intervals, 500, 700) == intervals
+    assert server.overlapping_intervals(intervals, 540, 600) == intervals
+
+
+@pytest.fixture()
+def book(client, seeded):
+    created = []
+
+    def _book(time, duration=30, **extra):
+        params = {"allow_overlap": "true"} if extra.pop("allow_overlap", False) else {}
+        response = client.post("/api/appointments", params=params, json={
+            "patient_id": seeded["patient"]["id"], "doctor_id": seeded["doctor"]["id"],
+            "appointment_date": DAY, "appointment_time": time, "duration_minutes": duration, **extra
+        })
+        if response.status_code == 200:
+            created.append(response.json()["id"])
+        return response
+
+    yield _book
+    for appointment_id in created:
+        client.delete(f"/api/appointments/{appointment_id}")
+
+
+def test_create_rejects_overlap_but_allows_touching(book):
+    assert book("10:00", 30).status_code == 200
+    assert book("10:30", 30).status_code == 200
+    assert book("09:30", 30).status_code == 200
+
+    clash = book("10:15", 10)
+    assert clash.status_code == 409
+    assert "10:00-10:30" in clash.json()["detail"]
+    assert book("10:15", 10, allow_overlap=True).status_code == 200
+
+
+def test_cancelled_appointments_do_not_block(client, book):
+    cancelled = book("14:00", 60).json()
+    client.put(f"/api/appointments/{cancelled['id']}", json={"status": "cancelled"})
+    assert book("14:30", 30).status_code == 200
+
+    # Reinstating the cancelled booking now clashes
+    reinstate = client.put(f"/api/appointments/{cancelled['id']}", json={"status": "scheduled"})
+    assert reinstate.status_code == 409
+
+
+def test_update_checks_against_other_bookings_only(client, book):
+    first = book("16:00", 30).json()
+    book("16:30", 30)
+
+    assert client.put(f"/api/appointments/{first['id']}", json={"duration_minutes": 30}).status_code == 200
+    assert client.put(f"/api/appointments/{first['id']}", json={"duration_minutes": 45}).status_code == 409
+    assert client.put(f"/api/appointments/{first['id']}", json={"notes": "moved"}).status_code == 200
+
+
+def test_rejects_malformed_time(book):
+    assert book("25:00").status_code == 400
+    assert book("10:00", 0).status_code == 400
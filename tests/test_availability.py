@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+import server
+
+DAY = "2026-04-07"  # a Tuesday
+
+
+def _free_minutes(spans, busy):
+    taken = {minute for start, end in busy for minute in range(start, end)}
+    return {minute for start, end in spans for minute in range(start, end)} - taken
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_free_windows_match_minute_grid(seed):
+    rng = random.Random(seed)
+    spans = [(540, 780), (840, 1080)]
+    busy = sorted(
+        (start, start + rng.randint(5, 90))
+        for start in (rng.randrange(480, 1100) for _ in range(rng.randint(0, 15)))
+    )
+    windows = server.free_windows(spans, busy)
+    assert {minute for start, end in windows for minute in range(start, end)} == _free_minutes(spans, busy)
+    # Windows are disjoint, ordered and never empty
+    assert all(start < end for start, end in windows)
+    assert all(a[1] <= b[0] for a, b in zip(windows, windows[1:]))
+
+
+def test_window_slots_only_whole_slots():
+    slots = server.window_slots([(540, 615)], 30)
+    assert [(slot.start, slot.end) for slot in slots] == [("09:00", "09:30"), ("09:30", "10:00")]
+
+
+def test_parse_working_hours_rejects_inverted_span():
+    with pytest.raises(ValueError):
+        server.parse_working_hours("17:00-09:00")
+
+
+def test_availability_excludes_booked_time(client, seeded):
+    doctor_id = seeded["doctor"]["id"]
+    booked = client.post("/api/appointments", json={
+        "patient_id": seeded["patient"]["id"], "doctor_id": doctor_id,
+        "appointment_date": DAY, "appointment_time": "10:00", "duration_minutes": 45
+    }).json()
+    try:
+        response = client.get("/api/availability", params={
+            "date_from": DAY, "doctor_id": doctor_id, "slot_minutes": 30
+        })
+        assert response.status_code == 200, response.text
+        (day,) = response.json()
+        starts = [slot["start"] for slot in day["slots"]]
+        assert "09:30" in starts and "10:45" in starts
+        assert "10:00" not in starts and "10:30" not in starts
+    finally:
+        client.delete(f"/api/appointments/{booked['id']}")
+
+
+def test_availability_skips_non_working_days(client, seeded):
+    response = client.get("/api/availability", params={
+        "date_from": "2026-04-06", "date_to": "2026-04-12", "doctor_id": seeded["doctor"]["id"]
+    })
+    assert response.status_code == 200
+    assert "2026-04-10" not in {day["date"] for day in response.json()}  # Friday
+    assert len(response.json()) == 6
+
+
+@pytest.mark.parametrize("params", [
+    {"date_from": "2026-04-10", "date_to": "2026-04-01"},
+    {"date_from": "2026-01-01", "date_to": "2026-12-31"},
+    {"date_from": "April"},
+])
+def test_availability_rejects_bad_ranges(client, params):
+    assert client.get("/api/availability", params=params).status_code == 400
@@ -0,0 +1,90 @@
+import gzip
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import server
+
+
+def _raw(client, path, encoding, **headers):
+    # The test client decodes bodies on its own; read what went over the wire
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding, **headers}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate", "gzip"),
+    ("GZIP", "gzip"),
+    ("identity", None),
+    ("", None),
+    ("gzip;q=0", None),
+    ("*", "br" if server.brotli else "gzip"),
+    ("*, gzip;q=0", "br" if server.brotli else None),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br, gzip;q=0.5", "br" if server.brotli else "gzip"),
+    ("gzip;q=nonsense", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert server.negotiate_encoding(header) == expected
+
+
+def test_large_json_is_gzipped(client):
+    plain, identity = _raw(client, "/openapi.json", "identity")
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    response, body = _raw(client, "/openapi.json", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-length"] == str(len(body))
+    assert len(body) < len(identity) / 3
+    assert gzip.decompress(body) == identity
+
+
+def test_small_responses_are_sent_as_is(client):
+    response, body = _raw(client, "/api/auth/me", "gzip")
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert body.startswith(b"{")
+
+
+def test_streamed_export_is_compressed_in_chunks(client, seeded):
+    for index in range(20):
+        client.post("/api/payments", json={"patient_id": seeded["patient"]["id"], "amount_jod": 1.0 + index})
+    _, identity = _raw(client, "/api/export/payments", "identity")
+    response, body = _raw(client, "/api/export/payments", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.headers["content-disposition"].startswith("attachment;")
+    assert gzip.decompress(body) == identity
+
+
+def test_images_are_not_recompressed(client, seeded):
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(buffer, "PNG")
+    image = client.post(
+        "/api/images/upload",
+        data={"patient_id": seeded["patient"]["id"], "image_type": "xray"},
+        files={"file": ("scan.png", buffer.getvalue(), "image/png")},
+    ).json()
+
+    response, body = _raw(client, f"/api/images/{image['id']}", "gzip, br")
+    assert response.headers["content-type"] == "image/png"
+    assert "content-encoding" not in response.headers
+    assert body == buffer.getvalue()
+
+    response, body = _raw(client, f"/api/images/{image['id']}", "gzip", Range="bytes=0-1999")
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert body == buffer.getvalue()[:2000]
+
+
+def test_brotli_when_available(client):
+    brotli = pytest.importorskip("brotli")
+    _, identity = _raw(client, "/openapi.json", "identity")
+    response, body = _raw(client, "/openapi.json", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == identity
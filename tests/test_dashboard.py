@@ -0,0 +1,69 @@
+import sqlite3
+from datetime import datetime
+
+import server
+
+
+def _expected(day):
+    # Recomputed from the base tables rather than the ledger the route reads
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        def scalar(sql, params=()):
+            return conn.execute(sql, params).fetchone()[0]
+
+        billed = """
+            SELECT COALESCE(SUM(p.price_jod * vp.quantity), 0.0)
+            FROM visits v
+            JOIN visit_procedures vp ON v.id = vp.visit_id
+            JOIN procedures p ON vp.procedure_id = p.id
+        """
+        paid = "SELECT COALESCE(SUM(amount_jod), 0.0) FROM payments"
+        return {
+            "patients": scalar("SELECT COUNT(*) FROM patients"),
+            "appointments": scalar("SELECT COUNT(*) FROM appointments"),
+            "procedures": scalar("SELECT COUNT(*) FROM procedures"),
+            "users": scalar("SELECT COUNT(*) FROM users"),
+            "billed_jod": round(scalar(billed), 2),
+            "paid_jod": round(scalar(paid), 2),
+            "billed_today_jod": round(scalar(billed + " WHERE substr(v.visit_date, 1, 10) = ?", (day,)), 2),
+            "paid_today_jod": round(scalar(paid + " WHERE substr(payment_date, 1, 10) = ?", (day,)), 2),
+        }
+    finally:
+        conn.close()
+
+
+def test_dashboard_totals_match_the_data(client, seeded):
+    day = datetime.now().strftime("%Y-%m-%d")
+    server.dashboard_cache.clear()
+    stats = client.get("/api/stats/dashboard", params={"date": day}).json()
+    expected = _expected(day)
+    assert {key: stats[key] for key in expected} == expected
+    assert stats["outstanding_jod"] == round(expected["billed_jod"] - expected["paid_jod"], 2)
+    # The seeded visit and payment were made today
+    assert stats["billed_today_jod"] >= seeded["procedure"]["price_jod"]
+    assert stats["paid_today_jod"] >= seeded["payment"]["amount_jod"]
+
+
+def test_dashboard_appointments_for_the_day(client, seeded):
+    stats = client.get("/api/stats/dashboard", params={"date": seeded["appointment"]["appointment_date"]}).json()
+    assert seeded["appointment"]["id"] in [row["id"] for row in stats["today_appointments"]]
+    assert stats["today_appointment_count"] == len(stats["today_appointments"])
+
+
+def test_writes_replace_the_cached_dashboard(client):
+    day = datetime.now().strftime("%Y-%m-%d")
+    first = client.get("/api/stats/dashboard", params={"date": day}).json()
+    # Served from the cache while nothing changes
+    assert client.get("/api/stats/dashboard", params={"date": day}).json()["generated_at"] == first["generated_at"]
+
+    patient = client.post("/api/patients", json={"name": "Dashboard Patient", "phone": "0795555555"}).json()
+    try:
+        after_patient = client.get("/api/stats/dashboard", params={"date": day}).json()
+        assert after_patient["patients"] == first["patients"] + 1
+
+        client.post("/api/payments", json={"patient_id": patient["id"], "amount_jod": 2.5})
+        after_payment = client.get("/api/stats/dashboard", params={"date": day}).json()
+        assert after_payment["paid_jod"] == round(first["paid_jod"] + 2.5, 2)
+        assert after_payment["paid_today_jod"] == round(first["paid_today_jod"] + 2.5, 2)
+    finally:
+        client.delete(f"/api/patients/{patient['id']}")
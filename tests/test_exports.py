@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+
+import pytest
+
+import server
+
+
+def _csv(response):
+    assert response.status_code == 200, response.text
+    text = response.content.decode("utf-8")
+    assert text.startswith("\ufeff")
+    return list(csv.DictReader(io.StringIO(text[1:])))
+
+
+def _ndjson(response):
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_payments_csv_matches_list_route(client, seeded):
+    response = client.get("/api/export/payments")
+    assert response.headers["content-disposition"].startswith('attachment; filename="payments-')
+    rows = _csv(response)
+    listed = client.get("/api/payments").json()
+    assert sorted(int(row["id"]) for row in rows) == sorted(payment["id"] for payment in listed)
+    row = next(row for row in rows if int(row["id"]) == seeded["payment"]["id"])
+    assert row["patient_name"] == "Seed Patient"
+    assert float(row["amount_jod"]) == 15.0
+
+
+def test_visits_ndjson_includes_procedures_and_total(client, seeded):
+    rows = _ndjson(client.get("/api/export/visits", params={"format": "ndjson"}))
+    visit = next(row for row in rows if row["id"] == seeded["visit"]["id"])
+    assert visit["procedures"] == "Filling x1"
+    assert visit["total_cost_jod"] == 40.0
+    assert visit["doctor_name"] == "Dr Seed"
+
+
+def test_visits_filtered_by_doctor_and_date(client, seeded):
+    doctor_id = seeded["doctor"]["id"]
+    rows = _ndjson(client.get("/api/export/visits", params={"format": "ndjson", "doctor_id": doctor_id}))
+    assert rows and all(row["doctor_id"] == doctor_id for row in rows)
+    assert _ndjson(client.get("/api/export/visits", params={
+        "format": "ndjson", "doctor_id": doctor_id, "date_to": "2000-01-01"
+    })) == []
+
+
+def test_empty_csv_still_has_header(client):
+    rows = client.get("/api/export/payments", params={"date_to": "2000-01-01"}).content.decode("utf-8")
+    assert rows.lstrip("\ufeff").splitlines()[0].startswith("id,patient_id,patient_name")
+
+
+def test_patients_export_keeps_arabic_text(client):
+    patient = client.post("/api/patients", json={"name": "سلمى", "phone": "0790000008"}).json()
+    try:
+        rows = _csv(client.get("/api/export/patients"))
+        assert any(row["name"] == "سلمى" for row in rows)
+    finally:
+        client.delete(f"/api/patients/{patient['id']}")
+
+
+@pytest.mark.parametrize("path,params,status", [
+    ("/api/export/users", {}, 404),
+    ("/api/export/payments", {"format": "xlsx"}, 400),
+    ("/api/export/payments", {"doctor_id": 1}, 400),
+    ("/api/export/payments", {"date_from": "May"}, 400),
+])
+def test_export_rejects_bad_requests(client, path, params, status):
+    assert client.get(path, params=params).status_code == status
+
+
+def test_open_export_leaves_the_reader_pool_alone(client, seeded):
+    spec = server.EXPORTS["payments"]
+    exports = [server.stream_export(spec["query"], [], "csv") for _ in range(server.db_pool.size + 1)]
+    try:
+        # More downloads in progress than there are pooled readers
+        for export in exports:
+            assert client.portal.call(export.__anext__).startswith("\ufeff".encode("utf-8"))
+        assert client.portal.call(server.db_pool._readers.qsize) == server.db_pool.size
+        assert client.get("/api/procedures").status_code == 200
+    finally:
+        for export in exports:
+            client.portal.call(export.aclose)
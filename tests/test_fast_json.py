@@ -0,0 +1,131 @@
+import io
+import json
+
+import pytest
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+import server
+
+LIST_ROUTES = [
+    ("/api/patients", server.PatientResponse),
+    ("/api/patients/search?q=seed", server.PatientResponse),
+    ("/api/appointments", server.AppointmentResponse),
+    ("/api/visits", server.VisitResponse),
+    ("/api/payments", server.PaymentResponse),
+    ("/api/procedures", server.ProcedureResponse),
+    ("/api/users", server.UserResponse),
+    ("/api/doctors", server.UserResponse),
+]
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _model_bytes(model, items):
+    # What FastAPI sends when the route returns response models
+    return JSONResponse([model(**item).model_dump(mode="json") for item in items]).body
+
+
+@pytest.mark.parametrize("path,model", LIST_ROUTES)
+def test_list_routes_match_model_serialization(client, seeded, path, model):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    items = response.json()
+    assert items
+    assert response.content == _model_bytes(model, items)
+
+
+def test_patient_images_match_model_serialization(client, seeded):
+    client.post(
+        "/api/images/upload",
+        data={"patient_id": seeded["patient"]["id"], "image_type": "xray"},
+        files={"file": ("scan.png", _png(), "image/png")},
+    )
+    response = client.get(f"/api/images/patient/{seeded['patient']['id']}")
+    assert response.json()
+    assert response.content == _model_bytes(server.ImageResponse, response.json())
+
+
+def test_pagination_headers_survive(client, seeded):
+    client.post("/api/payments", json={"patient_id": seeded["patient"]["id"], "amount_jod": 1.0})
+    response = client.get("/api/payments", params={"limit": 1, "include_total": True})
+    assert response.headers["x-next-cursor"]
+    assert int(response.headers["x-total-count"]) >= 2
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+def test_floats_orjson_writes_differently_fall_back(client):
+    patient = client.post("/api/patients", json={"name": "Tiny Payer", "phone": "0790000009"}).json()
+    try:
+        client.post("/api/payments", json={"patient_id": patient["id"], "amount_jod": 0.00001})
+        response = client.get("/api/payments", params={"patient_id": patient["id"]})
+        assert b'"amount_jod":1e-05' in response.content
+        assert response.content == _model_bytes(server.PaymentResponse, response.json())
+    finally:
+        client.delete(f"/api/patients/{patient['id']}")
+
+
+def test_nested_procedure_floats_fall_back(client, seeded):
+    patient = client.post("/api/patients", json={"name": "Tiny Procedure", "phone": "0790000010"}).json()
+    tiny = client.post("/api/procedures", json={"name": "Tiny", "price_jod": 0.00005}).json()
+    try:
+        created = client.post("/api/visits", json={
+            "patient_id": patient["id"], "doctor_id": seeded["doctor"]["id"],
+            "procedures": [{"procedure_id": tiny["id"], "quantity": 1},
+                           {"procedure_id": seeded["procedure"]["id"], "quantity": 1}],
+        })
+        # total_cost_jod alone would pass as orjson-safe
+        assert server.orjson_float(created.json()["total_cost_jod"])
+        response = client.get("/api/visits", params={"patient_id": patient["id"]})
+        assert b'"price_jod":5e-05' in response.content
+        assert response.content == _model_bytes(server.VisitResponse, response.json())
+        assert response.content == b"[" + created.content + b"]"
+    finally:
+        client.delete(f"/api/patients/{patient['id']}")
+        client.delete(f"/api/procedures/{tiny['id']}")
+
+
+@pytest.mark.parametrize("content", [
+    [{"amount": 1e16, "small": 2.5e-05, "text": "سلمى   \x01 \"q\""}],
+    [2 ** 70],
+])
+def test_encode_json_matches_stdlib(content):
+    expected = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+    safe = all(server.orjson_float(value) for item in content if isinstance(item, dict)
+               for value in item.values() if isinstance(value, float))
+    assert server.encode_json(content, safe) == expected.encode("utf-8")
+
+
+def test_stdlib_fallback_without_orjson(client, seeded, monkeypatch):
+    expected = client.get("/api/appointments").content
+    monkeypatch.setattr(server, "orjson", None)
+    assert client.get("/api/appointments").content == expected
+
+
+def test_openapi_keeps_response_models(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    for path, model in [("/api/payments", "PaymentResponse"), ("/api/visits", "VisitResponse")]:
+        schema = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert schema["type"] == "array"
+        assert schema["items"] == {"$ref": f"#/components/schemas/{model}"}
+
+
+def test_row_encoder_coerces_like_the_model():
+    class Row(dict):
+        def keys(self):
+            return list(super().keys())
+
+        def __getitem__(self, key):
+            return list(self.values())[key] if isinstance(key, int) else super().__getitem__(key)
+
+    rows = [Row(id=1, username="u", full_name="U", role="admin", session_duration_hours=8,
+                is_first_login=1, created_at="2026-01-01", password_hash="secret")]
+    body = server.user_encoder.response(rows).body
+    assert body == _model_bytes(server.UserResponse, [dict(rows[0])])
+    assert b"secret" not in body
+    assert server.user_encoder.response([]).body == b"[]"
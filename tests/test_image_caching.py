@@ -0,0 +1,115 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import server
+
+
+@pytest.fixture(scope="module")
+def image(client, seeded):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 30, 30)).save(buffer, "PNG")
+    response = client.post(
+        "/api/images/upload",
+        data={"patient_id": seeded["patient"]["id"], "image_type": "xray"},
+        files={"file": ("scan.png", buffer.getvalue(), "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    return {**response.json(), "content": buffer.getvalue()}
+
+
+def test_strong_etag_and_private_caching(client, image):
+    response = client.get(f"/api/images/{image['id']}")
+    assert response.status_code == 200
+    assert response.content == image["content"]
+    assert response.headers["etag"] == f'"{image["sha256"]}"'
+    assert response.headers["cache-control"].startswith("private")
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("size", [None, "thumb"])
+def test_if_none_match_returns_304(client, image, size):
+    params = {"size": size} if size else {}
+    first = client.get(f"/api/images/{image['id']}", params=params)
+    etag = first.headers["etag"]
+
+    revalidated = client.get(f"/api/images/{image['id']}", params=params, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    changed = client.get(f"/api/images/{image['id']}", params=params, headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+def test_derivative_etag_differs_from_original(client, image):
+    original = client.get(f"/api/images/{image['id']}").headers["etag"]
+    thumb = client.get(f"/api/images/{image['id']}", params={"size": "thumb"}).headers["etag"]
+    assert original != thumb
+
+
+@pytest.mark.parametrize("header,start,end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=10-", 10, None),
+    ("bytes=-16", -16, None),
+    ("bytes=5-999999999", 5, None),
+])
+def test_byte_ranges(client, image, header, start, end):
+    content = image["content"]
+    expected = content[start:] if end is None else content[start:end + 1]
+    response = client.get(f"/api/images/{image['id']}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == expected
+    first = start % len(content)
+    assert response.headers["content-range"] == f"bytes {first}-{first + len(expected) - 1}/{len(content)}"
+
+
+def test_unsatisfiable_range(client, image):
+    size = len(image["content"])
+    response = client.get(f"/api/images/{image['id']}", headers={"Range": f"bytes={size}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{size}"
+
+
+def test_stale_if_range_sends_whole_file(client, image):
+    response = client.get(
+        f"/api/images/{image['id']}", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+    )
+    assert response.status_code == 200
+    assert response.content == image["content"]
+
+
+def test_least_recently_served_derivative_is_evicted(client, seeded, image, tmp_path):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (30, 30, 200)).save(buffer, "PNG")
+    other = client.post(
+        "/api/images/upload",
+        data={"patient_id": seeded["patient"]["id"], "image_type": "xray"},
+        files={"file": ("other.png", buffer.getvalue(), "image/png")},
+    ).json()
+    first, second, third = entries = [(image, "thumb"), (image, "medium"), (other, "thumb")]
+
+    # Learn the rendered sizes with a cache that never evicts
+    scratch = server.DerivativeCache(tmp_path / "scratch", 1 << 30)
+    sizes = [client.portal.call(scratch.get, *entry).stat().st_size for entry in entries]
+
+    cache = server.DerivativeCache(tmp_path / "cache", sizes[0] + sizes[2])
+    client.portal.call(cache.get, *first)
+    client.portal.call(cache.get, *second)
+    # Serving the first again makes the second the least recently served
+    client.portal.call(cache.get, *first)
+    client.portal.call(cache.get, *third)
+    assert sorted(path.name for path in cache.root.iterdir()) == sorted(
+        cache.path_for(*entry).name for entry in (first, third)
+    )
+
+    # A fresh cache seeds its total and order from the directory, oldest first
+    os.utime(cache.path_for(*first), (1, 1))
+    reseeded = server.DerivativeCache(cache.root, cache.max_bytes)
+    reseeded.seed()
+    assert reseeded._total == sizes[0] + sizes[2]
+    client.portal.call(reseeded.get, *second)
+    assert not cache.path_for(*first).exists()
+    client.delete(f"/api/images/{other['id']}")
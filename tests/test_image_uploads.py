@@ -0,0 +1,126 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.fixture()
+def patient(client):
+    patient = client.post("/api/patients", json={"name": "Upload Patient", "phone": "0794444444"}).json()
+    yield patient
+    client.delete(f"/api/patients/{patient['id']}")
+
+
+def _upload(client, patient, content, name="scan.bin"):
+    return client.post(
+        "/api/images/upload",
+        data={"patient_id": patient["id"], "image_type": "xray"},
+        files={"file": (name, content, "application/octet-stream")},
+    )
+
+
+def _stored_files(patient):
+    patient_dir = server.UPLOADS_DIR / str(patient["id"])
+    return sorted(path.name for path in patient_dir.iterdir()) if patient_dir.exists() else []
+
+
+def test_oversized_upload_is_rejected_without_leftovers(client, patient, monkeypatch):
+    monkeypatch.setattr(server, "MAX_UPLOAD_BYTES", 1000)
+    response = _upload(client, patient, os.urandom(1001))
+    assert response.status_code == 413
+    assert _stored_files(patient) == []
+    assert client.get(f"/api/images/patient/{patient['id']}").json() == []
+
+    assert _upload(client, patient, os.urandom(1000)).status_code == 200
+
+
+def test_identical_uploads_share_one_file(client, patient):
+    content = os.urandom(4096)
+    first = _upload(client, patient, content).json()
+    second = _upload(client, patient, content).json()
+    assert (first["duplicate"], second["duplicate"]) == (False, True)
+    assert first["image_path"] == second["image_path"]
+    assert first["sha256"] == second["sha256"]
+    assert _stored_files(patient) == [first["image_path"].split("/")[1]]
+
+    # The file outlives the first row and goes with the last
+    assert client.delete(f"/api/images/{first['id']}").status_code == 200
+    assert client.get(f"/api/images/{second['id']}").content == content
+    assert client.delete(f"/api/images/{second['id']}").status_code == 200
+    assert _stored_files(patient) == []
+
+    again = _upload(client, patient, content).json()
+    assert again["duplicate"] is False
+    assert client.get(f"/api/images/{again['id']}").content == content
+
+
+def test_duplicate_upload_racing_the_last_delete(client, patient):
+    content = os.urandom(4096)
+
+    async def race():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as session:
+            await session.post("/api/auth/login", json={"username": "admin", "password": "admin"})
+            files = {"file": ("scan.bin", content, "application/octet-stream")}
+            data = {"patient_id": patient["id"], "image_type": "xray"}
+            image = (await session.post("/api/images/upload", data=data, files=files)).json()
+            for _ in range(20):
+                upload, _ = await asyncio.gather(
+                    session.post("/api/images/upload", data=data, files=files),
+                    session.delete(f"/api/images/{image['id']}"),
+                )
+                image = upload.json()
+
+    client.portal.call(race)
+    images = client.get(f"/api/images/patient/{patient['id']}").json()
+    assert len(images) == 1
+    assert client.get(f"/api/images/{images[0]['id']}").content == content
+
+
+def _send_raw_upload(client, path, chunk_count, declared_length=None):
+    # Drives the app at the ASGI level, so the test sees how much of the body
+    # was actually pulled from the client
+    prefix = (b'--bound\r\nContent-Disposition: form-data; name="file"; filename="big.csv"\r\n'
+              b"Content-Type: application/octet-stream\r\n\r\n")
+    chunks = [prefix] + [b"x" * 65536] * chunk_count
+    pulled, sent = [], []
+
+    async def receive():
+        if len(pulled) == len(chunks):
+            return {"type": "http.disconnect"}
+        pulled.append(chunks[len(pulled)])
+        return {"type": "http.request", "body": pulled[-1], "more_body": len(pulled) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=bound")]
+    if declared_length is not None:
+        headers.append((b"content-length", str(declared_length).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    client.portal.call(server.app, scope, receive, send)
+    status = next(message["status"] for message in sent if message["type"] == "http.response.start")
+    return status, len(pulled), len(chunks)
+
+
+@pytest.mark.parametrize("path,setting", [
+    ("/api/images/upload", "MAX_UPLOAD_BYTES"),
+    ("/api/patients/import", "MAX_IMPORT_BYTES"),
+])
+def test_oversized_bodies_are_not_read_in_full(client, monkeypatch, path, setting):
+    monkeypatch.setattr(server, setting, 100_000)
+    # A declared length over the limit is refused before any of the body is read
+    status, pulled, _ = _send_raw_upload(client, path, 40, declared_length=40 * 65536)
+    assert (status, pulled) == (413, 0)
+
+    # Without a declared length, reading stops shortly after the limit
+    status, pulled, total = _send_raw_upload(client, path, 40)
+    assert status == 413
+    assert pulled * 65536 <= 100_000 + server.MULTIPART_OVERHEAD_BYTES + 2 * 65536 < total * 65536
@@ -0,0 +1,100 @@
+import random
+import sqlite3
+
+import server
+
+
+def _ledger_rows():
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        return dict(conn.execute("SELECT patient_id, balance_jod FROM patient_ledger"))
+    finally:
+        conn.close()
+
+
+def _expected_balances(client, patient_ids):
+    async def calculate():
+        async with server.db_pool.reader() as db:
+            return await server.calculate_patient_balances(db, patient_ids)
+
+    return client.portal.call(calculate)
+
+
+def _verify(client):
+    response = client.get("/api/admin/ledger/verify")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_ledger_follows_mixed_writes(client, seeded):
+    rng = random.Random(3)
+    doctor_id = seeded["doctor"]["id"]
+
+    def new_patient():
+        return client.post("/api/patients", json={"name": "Ledger Patient", "phone": "0791111111"}).json()["id"]
+
+    def new_procedure():
+        price = rng.choice([7.5, 12.25, 40.0, 99.99])
+        return client.post("/api/procedures", json={"name": "Ledger Procedure", "price_jod": price}).json()["id"]
+
+    def visit_body():
+        return {
+            "patient_id": rng.choice(patients), "doctor_id": doctor_id,
+            "procedures": [{"procedure_id": rng.choice(procedures), "quantity": rng.randint(1, 3)}
+                           for _ in range(rng.randint(0, 3))],
+        }
+
+    patients = [new_patient() for _ in range(4)]
+    procedures = [new_procedure() for _ in range(4)]
+    deleted = []
+    for _ in range(80):
+        action = rng.choices(["visit", "bulk", "payment", "price", "drop_procedure", "drop_patient"],
+                             weights=[5, 2, 5, 2, 1, 1])[0]
+        if action == "visit":
+            assert client.post("/api/visits", json=visit_body()).status_code == 200
+        elif action == "bulk":
+            bulk = [visit_body() for _ in range(rng.randint(1, 4))]
+            assert client.post("/api/visits/bulk", json=bulk).status_code == 200
+        elif action == "payment":
+            amount = rng.choice([5.0, 10.5, 33.33])
+            response = client.post("/api/payments", json={"patient_id": rng.choice(patients), "amount_jod": amount})
+            assert response.status_code == 200
+        elif action == "price":
+            response = client.put(f"/api/procedures/{rng.choice(procedures)}",
+                                  json={"price_jod": rng.choice([1.0, 15.5, 60.0])})
+            assert response.status_code == 200
+        elif action == "drop_procedure":
+            procedure_id = procedures.pop(rng.randrange(len(procedures)))
+            assert client.delete(f"/api/procedures/{procedure_id}").status_code == 200
+            procedures.append(new_procedure())
+        else:
+            patient_id = patients.pop(rng.randrange(len(patients)))
+            assert client.delete(f"/api/patients/{patient_id}").status_code == 200
+            deleted.append(patient_id)
+            patients.append(new_patient())
+
+    assert _verify(client) == {"ok": True, "mismatches": []}
+    expected = _expected_balances(client, patients)
+    for patient_id in patients:
+        balance = client.get(f"/api/patients/{patient_id}").json()["balance_jod"]
+        assert balance == expected.get(patient_id, 0.0)
+    assert deleted and not set(deleted) & set(_ledger_rows())
+
+
+def test_rebuild_repairs_a_drifted_ledger(client, seeded):
+    patient_id = seeded["patient"]["id"]
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        conn.execute("UPDATE patient_ledger SET billed_jod = billed_jod + 1 WHERE patient_id = ?", (patient_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    report = _verify(client)
+    assert report["ok"] is False
+    assert [mismatch["patient_id"] for mismatch in report["mismatches"]] == [patient_id]
+
+    response = client.post("/api/admin/ledger/rebuild")
+    assert response.status_code == 200
+    assert response.json()["patients"] >= 1
+    assert _verify(client) == {"ok": True, "mismatches": []}
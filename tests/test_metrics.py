@@ -0,0 +1,78 @@
+import re
+
+from fastapi.testclient import TestClient
+
+import server
+
+
+def _metrics(client):
+    response = client.get("/api/metrics")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text
+
+
+def _sample(text, name, **labels):
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(selector)}\}} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_requests_are_counted_by_route_template(client, seeded):
+    route = "/api/patients/{patient_id}"
+    before = _metrics(client)
+    client.get(f"/api/patients/{seeded['patient']['id']}")
+    client.get("/api/patients/999999")
+    after = _metrics(client)
+
+    labels = {"method": "GET", "route": route}
+    assert _sample(after, "clinic_http_requests_total", **labels, status=200) \
+        - _sample(before, "clinic_http_requests_total", **labels, status=200) == 1
+    assert _sample(after, "clinic_http_requests_total", **labels, status=404) \
+        - _sample(before, "clinic_http_requests_total", **labels, status=404) == 1
+    assert _sample(after, "clinic_http_request_duration_seconds_count", **labels) \
+        - _sample(before, "clinic_http_request_duration_seconds_count", **labels) == 2
+    assert _sample(after, "clinic_db_statements_total", **labels) \
+        > _sample(before, "clinic_db_statements_total", **labels)
+    assert f'/api/patients/{seeded["patient"]["id"]}"' not in after
+
+
+def test_statement_histogram_counts_queries_per_request(client, seeded):
+    labels = {"method": "GET", "route": "/api/patients"}
+    before = _metrics(client)
+    client.get("/api/patients")
+    after = _metrics(client)
+    statements = _sample(after, "clinic_db_statements_per_request_sum", **labels) \
+        - _sample(before, "clinic_db_statements_per_request_sum", **labels)
+    assert 1 <= statements <= 5
+
+
+def test_unmatched_paths_share_one_label(client):
+    client.get("/api/does-not-exist")
+    assert _sample(_metrics(client), "clinic_http_requests_total", method="GET", route="unmatched", status=404) >= 1
+
+
+def test_label_values_are_escaped():
+    assert server.metric_labels(("route",), ('a"b\\c\n',)) == 'route="a\\"b\\\\c\\n"'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = server.Histogram((1, 5))
+    for value in (0.5, 3, 3, 9):
+        histogram.observe(value)
+    assert histogram.render("h", "") == [
+        'h_bucket{le="1"} 1', 'h_bucket{le="5"} 3', 'h_bucket{le="+Inf"} 4', "h_sum 15.5", "h_count 4"
+    ]
+
+
+def test_metrics_require_admin_or_token(client, seeded, monkeypatch):
+    anonymous = TestClient(server.app)
+    assert anonymous.get("/api/metrics").status_code == 401
+
+    doctor = TestClient(server.app)
+    doctor.post("/api/auth/login", json={"username": "dr_seed", "password": "secret"})
+    assert doctor.get("/api/metrics").status_code == 403
+
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-me")
+    assert anonymous.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert anonymous.get("/api/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
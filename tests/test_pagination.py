@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+
+import server
+
+
+def _pages(client, path, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture()
+def same_day_payments(client):
+    # Payments sharing one timestamp, so only the id can order them
+    patient = client.post("/api/patients", json={"name": "Paging Patient", "phone": "0792222222"}).json()
+    ids = [
+        client.post("/api/payments", json={"patient_id": patient["id"], "amount_jod": float(amount)}).json()["id"]
+        for amount in range(1, 8)
+    ]
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        conn.execute("UPDATE payments SET payment_date = '2026-02-02T10:00:00' WHERE patient_id = ?", (patient["id"],))
+        conn.commit()
+    finally:
+        conn.close()
+    yield patient, ids
+    client.delete(f"/api/patients/{patient['id']}")
+
+
+def test_cursor_round_trip_breaks_date_ties_by_id(client, same_day_payments):
+    patient, ids = same_day_payments
+    pages = _pages(client, "/api/payments", patient_id=patient["id"], limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [payment["id"] for page in pages for payment in page] == sorted(ids, reverse=True)
+    assert pages[0] + pages[1] + pages[2] == client.get("/api/payments", params={"patient_id": patient["id"]}).json()
+
+
+def test_last_full_page_has_no_cursor(client, same_day_payments):
+    patient, ids = same_day_payments
+    response = client.get("/api/payments", params={"patient_id": patient["id"], "limit": len(ids)})
+    assert len(response.json()) == len(ids)
+    assert "x-next-cursor" not in response.headers
+
+
+def test_total_count_ignores_the_page(client, same_day_payments):
+    patient, ids = same_day_payments
+    response = client.get("/api/payments", params={"patient_id": patient["id"], "limit": 2, "include_total": True})
+    assert response.headers["x-total-count"] == str(len(ids))
+    assert "x-total-count" not in client.get("/api/payments", params={"limit": 2}).headers
+
+
+def test_appointments_page_forward_within_a_date_range(client, seeded):
+    created = [
+        client.post("/api/appointments", json={
+            "patient_id": seeded["patient"]["id"], "doctor_id": seeded["doctor"]["id"],
+            "appointment_date": day, "appointment_time": time,
+        }).json()["id"]
+        for day in ("2031-05-01", "2031-05-02") for time in ("09:00", "10:00", "11:00")
+    ]
+    try:
+        pages = _pages(client, "/api/appointments", date_from="2031-05-01", date_to="2031-05-02", limit=4)
+        rows = [row for page in pages for row in page]
+        assert [row["id"] for row in rows] == created
+        assert [(row["appointment_date"], row["appointment_time"]) for row in rows] == sorted(
+            (row["appointment_date"], row["appointment_time"]) for row in rows
+        )
+        only_first_day = client.get("/api/appointments", params={"date_from": "2031-05-01", "date_to": "2031-05-01"})
+        assert [row["id"] for row in only_first_day.json()] == created[:3]
+    finally:
+        for appointment_id in created:
+            client.delete(f"/api/appointments/{appointment_id}")
+
+
+def test_patient_search_pages_on_the_server(client):
+    created = [
+        client.post("/api/patients", json={"name": f"Pagesearch {index}", "phone": f"07933333{index:02d}"}).json()["id"]
+        for index in range(5)
+    ]
+    try:
+        pages = _pages(client, "/api/patients", q="pagesearch", limit=2)
+        assert sorted(row["id"] for page in pages for row in page) == created
+        response = client.get("/api/patients", params={"q": "pagesearch", "limit": 2, "include_total": True})
+        assert response.headers["x-total-count"] == "5"
+    finally:
+        for patient_id in created:
+            client.delete(f"/api/patients/{patient_id}")
+
+
+@pytest.mark.parametrize("path", ["/api/patients", "/api/appointments", "/api/visits", "/api/payments"])
+@pytest.mark.parametrize("params,status", [
+    ({"cursor": "not a cursor!"}, 400),
+    ({"cursor": server.encode_cursor(["2026-01-01"] * 9)}, 400),
+    ({"cursor": server.encode_cursor([{"a": 1}, 1])}, 400),
+    ({"cursor": server.encode_cursor([[1], 2])}, 400),
+    ({"cursor": server.encode_cursor([None, 2])}, 400),
+    ({"date_from": "01/02/2026"}, 400),
+    ({"date_to": "2026-13-01"}, 400),
+    ({"limit": 0}, 422),
+    ({"limit": server.MAX_PAGE_SIZE + 1}, 422),
+])
+def test_bad_paging_parameters_are_rejected(client, path, params, status):
+    assert client.get(path, params=params).status_code == status
@@ -0,0 +1,108 @@
+import io
+import os
+import sqlite3
+import time
+
+from PIL import Image
+
+import server
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _upload(client, patient_id, content):
+    response = client.post(
+        "/api/images/upload",
+        data={"patient_id": patient_id, "image_type": "xray"},
+        files={"file": ("scan.png", content, "image/png")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _rows(table, column, value):
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_delete_patient_removes_rows_and_files(client, seeded):
+    patient = client.post("/api/patients", json={"name": "Cascade Patient", "phone": "0790000003"}).json()
+    visit = client.post("/api/visits", json={
+        "patient_id": patient["id"], "doctor_id": seeded["doctor"]["id"],
+        "procedures": [{"procedure_id": seeded["procedure"]["id"], "quantity": 2}]
+    }).json()
+    client.post("/api/appointments", json={
+        "patient_id": patient["id"], "doctor_id": seeded["doctor"]["id"],
+        "appointment_date": "2026-05-04", "appointment_time": "11:00"
+    })
+    client.post("/api/payments", json={"patient_id": patient["id"], "amount_jod": 5.0})
+    image = _upload(client, patient["id"], _png((10, 20, 30)))
+    client.get(f"/api/images/{image['id']}", params={"size": "thumb"})
+    patient_dir = server.UPLOADS_DIR / str(patient["id"])
+    thumb = server.derivative_cache.path_for(image, "thumb")
+    assert patient_dir.exists() and thumb.exists()
+
+    assert client.delete(f"/api/patients/{patient['id']}").status_code == 200
+
+    assert _rows("visit_procedures", "visit_id", visit["id"]) == 0
+    for table in ("visits", "appointments", "payments", "medical_images", "patient_ledger"):
+        assert _rows(table, "patient_id", patient["id"]) == 0, table
+    assert _rows("patients", "id", patient["id"]) == 0
+    assert not patient_dir.exists()
+    assert not thumb.exists()
+
+
+def test_delete_patient_keeps_derivatives_shared_by_content(client):
+    content = _png((90, 90, 90))
+    keep = client.post("/api/patients", json={"name": "Keeps Scan", "phone": "0790000004"}).json()
+    drop = client.post("/api/patients", json={"name": "Drops Scan", "phone": "0790000005"}).json()
+    image = _upload(client, keep["id"], content)
+    _upload(client, drop["id"], content)
+    client.get(f"/api/images/{image['id']}", params={"size": "thumb"})
+
+    client.delete(f"/api/patients/{drop['id']}")
+    assert server.derivative_cache.path_for(image, "thumb").exists()
+    assert client.get(f"/api/images/{image['id']}").status_code == 200
+    client.delete(f"/api/patients/{keep['id']}")
+
+
+def test_sweep_removes_only_old_orphans(client):
+    patient = client.post("/api/patients", json={"name": "Sweep Patient", "phone": "0790000006"}).json()
+    image = _upload(client, patient["id"], _png((1, 2, 3)))
+    patient_dir = server.UPLOADS_DIR / str(patient["id"])
+
+    old = time.time() - server.ORPHAN_GRACE_SECONDS - 60
+    stale = patient_dir / "stale.png"
+    stale.write_bytes(b"x")
+    os.utime(stale, (old, old))
+    fresh = patient_dir / ".upload-inflight.tmp"
+    fresh.write_bytes(b"x")
+
+    gone = client.post("/api/patients", json={"name": "Gone Patient", "phone": "0790000007"}).json()
+    client.delete(f"/api/patients/{gone['id']}")
+    leftover_dir = server.UPLOADS_DIR / str(gone["id"])
+    leftover_dir.mkdir(parents=True)
+    future_dir = server.UPLOADS_DIR / str(gone["id"] + 1000)
+    future_dir.mkdir(parents=True)
+
+    server.derivative_cache.root.mkdir(parents=True, exist_ok=True)
+    orphan_derivative = server.derivative_cache.root / f"{'0' * 64}_thumb.jpg"
+    orphan_derivative.write_bytes(b"x")
+
+    response = client.post("/api/admin/storage/sweep")
+    assert response.status_code == 200
+    assert response.json() == {"patient_dirs": 1, "files": 1, "derivatives": 1}
+    assert not stale.exists() and fresh.exists()
+    assert (server.UPLOADS_DIR / image["image_path"]).exists()
+    assert not leftover_dir.exists() and future_dir.exists()
+    assert not orphan_derivative.exists()
+
+    future_dir.rmdir()
+    client.delete(f"/api/patients/{patient['id']}")
@@ -0,0 +1,84 @@
+import json
+import time
+
+import pytest
+
+import server
+
+
+def _wait(client, job):
+    deadline = time.monotonic() + 10
+    while job["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.02)
+        job = client.get(f"/api/patients/import/{job['id']}").json()
+    return job
+
+
+def _import(client, filename, content, **data):
+    response = client.post("/api/patients/import", data=data, files={"file": (filename, content)})
+    assert response.status_code == 202, response.text
+    return _wait(client, response.json())
+
+
+@pytest.fixture()
+def small_batches(monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_BATCH_SIZE", 2)
+
+
+def test_csv_import_reports_row_errors(client, small_batches):
+    content = "\ufeff" + "\n".join([
+        "Name,Phone,Email,Date_of_Birth,Notes",
+        "Imported One,0791000001,one@example.com,1990-01-31,",
+        "Imported Two,0791000002,,,\"multi\nline note\"",
+        ",0791000003,,,missing name",
+        "Imported Four,0791000004,,31/01/1990,bad date",
+        "Imported Five,0791000005,,,",
+        "",
+    ])
+    job = _import(client, "legacy.csv", content.encode("utf-8"))
+
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
+    assert (job["rows_processed"], job["rows_imported"], job["rows_failed"]) == (5, 3, 2)
+    assert job["errors"] == [
+        {"row": 4, "error": "name is required"},
+        {"row": 5, "error": "date_of_birth must be YYYY-MM-DD"},
+    ]
+
+    found = client.get("/api/patients/search", params={"q": "imported"}).json()
+    by_name = {patient["name"]: patient for patient in found}
+    assert set(by_name) == {"Imported One", "Imported Two", "Imported Five"}
+    assert by_name["Imported Two"]["notes"] == "multi\nline note"
+    assert by_name["Imported One"]["balance_jod"] == 0.0
+    assert client.get("/api/patients/suggest", params={"q": "0791000005"}).json()[0]["name"] == "Imported Five"
+
+    for patient in found:
+        client.delete(f"/api/patients/{patient['id']}")
+
+
+def test_ndjson_import(client, small_batches):
+    lines = [
+        json.dumps({"name": "Json Patient", "phone": "0792000001", "address": "Amman"}),
+        "{not json",
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"name": "Json Second", "phone": 792000002}),
+    ]
+    job = _import(client, "legacy.ndjson", "\n".join(lines).encode("utf-8"))
+
+    assert job["status"] == "completed"
+    assert job["rows_imported"] == 2
+    assert [error["row"] for error in job["errors"]] == [2, 3]
+
+    found = client.get("/api/patients/search", params={"q": "json"}).json()
+    assert {patient["phone"] for patient in found} == {"0792000001", "792000002"}
+    for patient in found:
+        client.delete(f"/api/patients/{patient['id']}")
+
+
+def test_import_rejects_unknown_format_and_job(client):
+    response = client.post(
+        "/api/patients/import", data={"format": "xlsx"}, files={"file": ("legacy.xlsx", b"x")}
+    )
+    assert response.status_code == 400
+    assert client.get("/api/patients/import/nope").status_code == 404
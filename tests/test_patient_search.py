@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import server
+
+
+@pytest.fixture(scope="module")
+def patients(client):
+    created = [
+        client.post("/api/patients", json=body).json()
+        for body in (
+            {"name": "مُحَمَّد الأحمد", "phone": "079-555-1234"},
+            {"name": "فاطمة إبراهيم", "phone": "0785550000", "notes": "allergic to penicillin"},
+            {"name": "Zaid Haddad", "phone": "0771112222", "email": "zaid@example.com"},
+            {"name": "Lina Zaidan", "phone": "0773334444", "notes": "referred by Dr Zaid"},
+        )
+    ]
+    yield created
+    for patient in created:
+        client.delete(f"/api/patients/{patient['id']}")
+
+
+def _search(client, q, **params):
+    response = client.get("/api/patients/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [patient["name"] for patient in response.json()]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("محمد", "مُحَمَّد الأحمد"),  # vowel marks ignored
+    ("الاحمد", "مُحَمَّد الأحمد"),  # hamza on alef folded
+    ("فاطمه", "فاطمة إبراهيم"),  # taa marbuta folded
+    ("ابراه", "فاطمة إبراهيم"),  # prefix match
+    ("٠٧٩٥٥٥", "مُحَمَّد الأحمد"),  # Arabic-Indic digits, separators ignored
+    ("079-555-12", "مُحَمَّد الأحمد"),
+    ("penic", "فاطمة إبراهيم"),
+    ("zaid@exa", "Zaid Haddad"),
+])
+def test_search_folds_spelling_variants(client, patients, query, expected):
+    assert expected in _search(client, query)
+
+
+def test_name_matches_rank_above_notes(client, patients):
+    names = _search(client, "zaid")
+    assert names.index("Zaid Haddad") < names.index("Lina Zaidan")
+
+
+def test_index_follows_updates_and_deletes(client, patients):
+    patient = patients[2]
+    client.put(f"/api/patients/{patient['id']}", json={"name": "Omar Haddad"})
+    assert "Omar Haddad" in _search(client, "omar")
+    assert "Zaid Haddad" not in _search(client, "zaid")
+
+    extra = client.post("/api/patients", json={"name": "Temporary Person", "phone": "0700000000"}).json()
+    assert _search(client, "tempor") == ["Temporary Person"]
+    client.delete(f"/api/patients/{extra['id']}")
+    assert _search(client, "tempor") == []
+
+
+def test_empty_or_punctuation_query_returns_nothing(client, patients):
+    assert _search(client, "  ") == []
+    assert _search(client, '"*') == []
+
+
+@pytest.mark.parametrize("text,folds,fold", [
+    ("أَحْمَد إسماعيل مؤمن", server.NAME_FOLDS, server.fold_search_text),
+    ("+962 (٧٩) ۵۵۵-12.34", server.PHONE_FOLDS, server.fold_phone),
+])
+def test_python_fold_matches_sql_fold(text, folds, fold):
+    conn = sqlite3.connect(":memory:")
+    try:
+        (folded,) = conn.execute(f"SELECT {server.sql_fold('?', folds)}", (text,)).fetchone()
+    finally:
+        conn.close()
+    assert folded == fold(text)
@@ -0,0 +1,71 @@
+import pytest
+
+import server
+
+
+def test_prefix_index_matches_words_and_phones():
+    index = server.PrefixIndex()
+    index.load([
+        (1, "Mohammad Al-Ahmad", "079 555 1234"),
+        (2, "مُحَمَّد إبراهيم", "+962 78 555 0000"),
+        (3, "Ahmad Zaidan", "0771112222"),
+    ])
+    assert [row[0] for row in index.suggest("ahm", 10)] == [1, 3]
+    assert [row[0] for row in index.suggest("moh ahm", 10)] == [1]
+    assert [row[0] for row in index.suggest("محمد ابر", 10)] == [2]
+    assert [row[0] for row in index.suggest("0785", 10)] == [2]  # country code folded
+    assert [row[0] for row in index.suggest("٠٧٩-٥٥٥", 10)] == [1]
+    assert index.suggest("ahm", 1) == [(1, "Mohammad Al-Ahmad", "079 555 1234")]
+    assert index.suggest("  ", 10) == []
+
+
+def test_prefix_index_incremental_updates():
+    index = server.PrefixIndex()
+    index.load([])
+    index.add(7, "Lina Haddad", "0790000007")
+    assert index.suggest("lin", 5) == [(7, "Lina Haddad", "0790000007")]
+
+    index.add(7, "Lana Haddad", "0790000007")
+    assert index.suggest("lin", 5) == []
+    assert [row[0] for row in index.suggest("lan", 5)] == [7]
+
+    index.remove(7)
+    assert index.suggest("had", 5) == []
+    assert len(index) == 0
+    index.remove(7)
+
+
+@pytest.fixture()
+def suggest(client):
+    def _suggest(q, **params):
+        response = client.get("/api/patients/suggest", params={"q": q, **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _suggest
+
+
+def test_suggest_route_follows_patient_writes(client, suggest):
+    patient = client.post("/api/patients", json={"name": "Typeahead Tester", "phone": "0791230000"}).json()
+    try:
+        assert suggest("typeah") == [{"id": patient["id"], "name": "Typeahead Tester", "phone": "0791230000"}]
+        assert suggest("0791230")[0]["id"] == patient["id"]
+
+        client.put(f"/api/patients/{patient['id']}", json={"name": "Renamed Tester"})
+        assert suggest("typeah") == []
+        assert suggest("renam")[0]["id"] == patient["id"]
+    finally:
+        client.delete(f"/api/patients/{patient['id']}")
+    assert suggest("renam") == []
+
+
+def test_suggest_does_not_query_database(client, suggest):
+    statements = []
+    for conn in server.db_pool._all_readers:
+        client.portal.call(conn.set_trace_callback, statements.append)
+    try:
+        suggest("seed")
+    finally:
+        for conn in server.db_pool._all_readers:
+            client.portal.call(conn.set_trace_callback, None)
+    # Only the session's user lookup may touch SQLite, and it is cached
+    assert not [sql for sql in statements if "patients" in sql]
@@ -0,0 +1,138 @@
+import asyncio
+import re
+import sqlite3
+
+import aiosqlite
+import pytest
+
+import server
+
+# Hot read routes and the parameters that exercise their indexed predicates.
+# Unfiltered listings may walk an index in sort order (the third field);
+# everything else must be an index SEARCH or a full-text MATCH. Nothing may
+# sort in a temp b-tree.
+HOT_ROUTES = [
+    ("/api/patients", {}, True),
+    ("/api/patients", {"limit": 10, "cursor": server.encode_cursor(["2999-01-01", 10 ** 9])}, False),
+    ("/api/patients/{patient}", {}, False),
+    ("/api/appointments", {}, True),
+    ("/api/appointments", {"doctor_id": "{doctor}"}, False),
+    ("/api/appointments", {"doctor_id": "{doctor}", "date": "2026-03-02"}, False),
+    ("/api/appointments", {"date_from": "2026-03-01", "date_to": "2026-03-31", "limit": 10}, False),
+    ("/api/visits", {"patient_id": "{patient}"}, False),
+    ("/api/visits", {"limit": 10}, True),
+    ("/api/payments", {"patient_id": "{patient}"}, False),
+    ("/api/payments", {"date_from": "2026-01-01", "limit": 10}, False),
+    ("/api/images/patient/{patient}", {}, False),
+    ("/api/availability", {"date_from": "2026-03-01", "date_to": "2026-03-31"}, False),
+    ("/api/availability", {"date_from": "2026-03-01", "doctor_id": "{doctor}"}, False),
+    ("/api/patients/search", {"q": "seed"}, False),
+    ("/api/export/payments", {}, True),
+    ("/api/export/payments", {"date_from": "2026-01-01", "date_to": "2026-01-31"}, False),
+    ("/api/export/visits", {"format": "ndjson"}, True),
+    ("/api/export/visits", {"doctor_id": "{doctor}", "date_from": "2026-01-01"}, False),
+    ("/api/export/patients", {}, True),
+]
+
+INDEX_WALK = re.compile(r"^SCAN \w+ USING (COVERING )?INDEX ")
+# FTS5 reports a MATCH lookup as a virtual table scan whose plan starts with M
+FULL_TEXT_MATCH = re.compile(r"^SCAN \w+ VIRTUAL TABLE INDEX \d+:M")
+# FTS5's own bookkeeping reads of its shadow tables show up in the trace too
+FTS_SHADOW_TABLE = re.compile(r"_fts_(config|data|idx|content|docsize)\b")
+
+
+def _fill(value, seeded):
+    if not isinstance(value, str):
+        return value
+    return value.format(patient=seeded["patient"]["id"], doctor=seeded["doctor"]["id"])
+
+
+def _route_statements(client, path, params, monkeypatch):
+    statements = []
+    connect = server.db_pool._connect
+
+    async def traced_connect():
+        # Exports read on a connection of their own, opened per request
+        conn = await connect()
+        await conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(server.db_pool, "_connect", traced_connect)
+    for conn in server.db_pool._all_readers:
+        client.portal.call(conn.set_trace_callback, statements.append)
+    try:
+        response = client.get(path, params=params)
+    finally:
+        for conn in server.db_pool._all_readers:
+            client.portal.call(conn.set_trace_callback, None)
+    assert response.status_code == 200, response.text
+    return [
+        sql for sql in statements
+        if sql.lstrip().upper().startswith("SELECT") and not FTS_SHADOW_TABLE.search(sql)
+    ]
+
+
+def _plan(sql):
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    finally:
+        conn.close()
+
+
+def test_migrations_recorded(client):
+    conn = sqlite3.connect(server.DB_PATH)
+    try:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    finally:
+        conn.close()
+    assert versions == [version for version, _, _ in server.MIGRATIONS]
+
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    add_column = "ALTER TABLE medical_images ADD COLUMN sha256 TEXT"
+
+    async def migrate():
+        async with aiosqlite.connect(tmp_path / "clinic.db") as db:
+            await db.execute("CREATE TABLE IF NOT EXISTS medical_images (id INTEGER PRIMARY KEY)")
+            await server.run_migrations(db)
+
+    def state():
+        conn = sqlite3.connect(tmp_path / "clinic.db")
+        try:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(medical_images)")]
+            versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations")]
+        finally:
+            conn.close()
+        return columns, versions
+
+    monkeypatch.setattr(server, "MIGRATIONS", [(1, "Half", [add_column, "CREATE INDEX idx_x ON missing (x)"])])
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(migrate())
+    assert state() == (["id"], [])
+
+    # The next start applies it cleanly instead of failing on a duplicate column
+    monkeypatch.setattr(server, "MIGRATIONS", [(1, "Whole", [add_column])])
+    asyncio.run(migrate())
+    assert state() == (["id", "sha256"], [1])
+
+
+@pytest.mark.parametrize("path,params,index_walk", HOT_ROUTES)
+def test_hot_route_uses_indexes(client, seeded, path, params, index_walk, monkeypatch):
+    path = _fill(path, seeded)
+    params = {key: _fill(value, seeded) for key, value in params.items()}
+
+    statements = _route_statements(client, path, params, monkeypatch)
+    assert statements
+
+    for sql in statements:
+        plan = _plan(sql)
+        scans = [
+            step for step in plan
+            if step.startswith("SCAN ")
+            and not FULL_TEXT_MATCH.match(step)
+            and not (index_walk and INDEX_WALK.match(step))
+        ]
+        sorts = [step for step in plan if step.startswith("USE TEMP B-TREE FOR ORDER BY")]
+        assert not scans, f"{path} {params} scans a table:\n{sql}\n{plan}"
+        assert not sorts, f"{path} {params} sorts without an index:\n{sql}\n{plan}"
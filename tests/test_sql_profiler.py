@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+
+import server
+
+
+@pytest.fixture()
+def profiler(monkeypatch):
+    monkeypatch.setattr(server.sql_profiler, "enabled", True)
+    monkeypatch.setattr(server.sql_profiler, "slow_seconds", 0.0)
+    server.sql_profiler.reset()
+    yield server.sql_profiler
+    server.sql_profiler.reset()
+
+
+@pytest.mark.parametrize("sql,expected", [
+    ("SELECT * FROM patients\n    WHERE id = ?", "SELECT * FROM patients WHERE id = ?"),
+    ("SELECT 'it''s', 42, 1.5 FROM t", "SELECT ?, ?, ? FROM t"),
+    ("SELECT id FROM users WHERE id IN (?, ?,?)", "SELECT id FROM users WHERE id IN (...)"),
+    ("SELECT * FROM idx_2024", "SELECT * FROM idx_2024"),
+])
+def test_normalize_sql(sql, expected):
+    assert server.normalize_sql(sql) == expected
+
+
+def test_parameters_are_redacted_to_types():
+    assert server.redact_parameters(("0791234567", 3, None)) == "(str, int, NoneType)"
+    assert server.redact_parameters({"phone": "0791234567"}) == "{phone: str}"
+    assert server.redact_parameters(None) == "()"
+
+
+def test_table_drops_coldest_statement_when_full():
+    profiler = server.SQLProfiler(enabled=True, capacity=2)
+    profiler.record("SELECT 1", 0.5, 1)
+    profiler.record("SELECT a FROM t", 0.1, 1)
+    profiler.record("SELECT b FROM t", 0.2, 1)
+    assert [entry["statement"] for entry in profiler.top(10)] == ["SELECT ?", "SELECT b FROM t"]
+
+
+def test_slow_queries_are_logged_with_plan(client, seeded, profiler, caplog):
+    with caplog.at_level(logging.WARNING, logger="server"):
+        client.get(f"/api/patients/{seeded['patient']['id']}")
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert slow
+    patient_lookup = next(message for message in slow if "FROM patients p" in message)
+    assert "params=(int)" in patient_lookup
+    assert "SEARCH p USING INTEGER PRIMARY KEY" in patient_lookup
+    assert "Seed Patient" not in "\n".join(slow)
+
+
+def test_profile_endpoint_ranks_statements(client, seeded, profiler):
+    client.get("/api/patients")
+    response = client.get("/api/admin/sql-profile", params={"limit": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["enabled"] is True
+    totals = [entry["total_ms"] for entry in body["statements"]]
+    assert totals and totals == sorted(totals, reverse=True) and len(totals) <= 5
+    assert all(entry["calls"] >= 1 and entry["slow_calls"] >= 1 for entry in body["statements"])
+
+    assert client.delete("/api/admin/sql-profile").status_code == 200
+    assert client.get("/api/admin/sql-profile").json()["statements"] == []
+
+
+def test_profiler_is_off_by_default(client):
+    server.sql_profiler.reset()
+    client.get("/api/patients")
+    assert server.sql_profiler.enabled is False
+    assert server.sql_profiler.top(10) == []
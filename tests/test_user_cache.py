@@ -0,0 +1,80 @@
+import contextlib
+import itertools
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+_usernames = (f"cached_user_{index}" for index in itertools.count())
+
+
+@pytest.fixture()
+def staff(client):
+    # A separate logged-in session whose user record is already cached
+    user = client.post("/api/users", json={
+        "username": next(_usernames), "password": "secret", "full_name": "Cached User", "role": "receptionist"
+    }).json()
+    session = TestClient(server.app)
+    assert session.post("/api/auth/login", json={"username": user["username"], "password": "secret"}).status_code == 200
+    assert session.get("/api/auth/me").status_code == 200
+    assert user["id"] in server.user_cache._entries
+    yield user, session
+    client.delete(f"/api/users/{user['id']}")
+
+
+def test_deleted_user_is_locked_out_at_once(client, staff):
+    user, session = staff
+    assert client.delete(f"/api/users/{user['id']}").status_code == 200
+    assert session.get("/api/auth/me").status_code == 401
+
+
+def test_update_user_is_seen_at_once(client, staff):
+    user, session = staff
+    client.put(f"/api/users/{user['id']}", json={"full_name": "Renamed User", "session_duration_hours": 2})
+    me = session.get("/api/auth/me").json()
+    assert (me["full_name"], me["session_duration_hours"]) == ("Renamed User", 2)
+
+
+def test_change_password_is_seen_at_once(staff):
+    _, session = staff
+    assert session.get("/api/auth/me").json()["is_first_login"] is True
+    assert session.post("/api/auth/change-password", json={"new_password": "changed"}).status_code == 200
+    assert session.get("/api/auth/me").json()["is_first_login"] is False
+
+
+def test_cache_stats_count_hits_and_misses(client, staff):
+    user, session = staff
+    server.user_cache.pop(user["id"])
+    before = client.get("/api/admin/cache/stats").json()["users"]
+    session.get("/api/auth/me")
+    session.get("/api/auth/me")
+    after = client.get("/api/admin/cache/stats").json()["users"]
+    # One miss and one hit for the staff session, one hit for the admin's stats request
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+    assert after["maxsize"] == server.USER_CACHE_SIZE
+    assert after["ttl_seconds"] == server.USER_CACHE_TTL_SECONDS
+
+
+def test_invalidation_during_a_miss_is_not_undone(client, staff, monkeypatch):
+    user, _ = staff
+    server.user_cache.pop(user["id"])
+    reader = server.db_pool.reader
+
+    @contextlib.asynccontextmanager
+    async def reader_racing_an_update():
+        async with reader() as db:
+            # An update lands after the miss but before the read finishes
+            server.user_cache.pop(user["id"])
+            yield db
+
+    monkeypatch.setattr(server.db_pool, "reader", reader_racing_an_update)
+    request = types.SimpleNamespace(session={"user_id": user["id"]})
+    assert client.portal.call(server.get_current_user, request)["id"] == user["id"]
+    assert user["id"] not in server.user_cache._entries
+
+    monkeypatch.setattr(server.db_pool, "reader", reader)
+    client.portal.call(server.get_current_user, request)
+    assert user["id"] in server.user_cache._entries
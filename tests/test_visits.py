@@ -0,0 +1,57 @@
+def _visit_count(client, patient_id):
+    return len(client.get("/api/visits", params={"patient_id": patient_id}).json())
+
+
+def _balance(client, patient_id):
+    return client.get(f"/api/patients/{patient_id}").json()["balance_jod"]
+
+
+def test_bulk_create_visits(client, seeded):
+    patient = client.post("/api/patients", json={"name": "Bulk Patient", "phone": "0790000002"}).json()
+    procedure = seeded["procedure"]
+    payload = [
+        {"patient_id": patient["id"], "doctor_id": seeded["doctor"]["id"],
+         "procedures": [{"procedure_id": procedure["id"], "quantity": quantity}]}
+        for quantity in (1, 2, 3)
+    ]
+
+    response = client.post("/api/visits/bulk", json=payload)
+    assert response.status_code == 200, response.text
+    visits = response.json()
+    assert [visit["total_cost_jod"] for visit in visits] == [40.0, 80.0, 120.0]
+    assert all(visit["patient_name"] == "Bulk Patient" for visit in visits)
+    assert _visit_count(client, patient["id"]) == 3
+    assert _balance(client, patient["id"]) == 240.0
+
+
+def test_unknown_procedure_rolls_back_whole_batch(client, seeded):
+    patient_id = seeded["patient"]["id"]
+    before_count = _visit_count(client, patient_id)
+    before_balance = _balance(client, patient_id)
+    payload = [
+        {"patient_id": patient_id, "doctor_id": seeded["doctor"]["id"],
+         "procedures": [{"procedure_id": seeded["procedure"]["id"]}]},
+        {"patient_id": patient_id, "doctor_id": seeded["doctor"]["id"],
+         "procedures": [{"procedure_id": 999999}]},
+    ]
+
+    response = client.post("/api/visits/bulk", json=payload)
+    assert response.status_code == 400
+    assert "999999" in response.json()["detail"]
+    assert _visit_count(client, patient_id) == before_count
+    assert _balance(client, patient_id) == before_balance
+
+
+def test_create_visit_rejects_unknown_patient(client, seeded):
+    response = client.post("/api/visits", json={
+        "patient_id": 999999, "doctor_id": seeded["doctor"]["id"], "procedures": []
+    })
+    assert response.status_code == 400
+
+
+def test_create_visit_rejects_bad_quantity(client, seeded):
+    response = client.post("/api/visits", json={
+        "patient_id": seeded["patient"]["id"], "doctor_id": seeded["doctor"]["id"],
+        "procedures": [{"procedure_id": seeded["procedure"]["id"], "quantity": 0}]
+    })
+    assert response.status_code == 400